@@ -0,0 +1,66 @@
+"""
+Auth dependency benchmark.
+
+Measures the per-request cost of ``Auth.get_authenticated_user`` with the
+verified-JWT cache disabled and enabled. The database and Redis round trips
+are replaced with in-process stubs so that only the token handling is timed.
+
+Usage::
+
+    python -m benchmarks.bench_auth_dependency [requests]
+"""
+
+import asyncio
+import pickle
+import sys
+import time
+from unittest.mock import patch
+
+from src.database.models import User, Role
+from src.services.auth import Auth
+from src.services.token_cache import TokenCache
+
+
+class StubRedis:
+    def __init__(self, user: User):
+        self._user = pickle.dumps(user)
+
+    async def get(self, key):
+        return self._user
+
+
+async def not_blacklisted(token, db):
+    return False
+
+
+async def run(auth: Auth, token: str, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        await auth.get_authenticated_user(token, None)
+    return (time.perf_counter() - start) / requests
+
+
+async def main(requests: int) -> None:
+    user = User(id=1, username="benchmark", email="bench@example.com", role=Role.user)
+
+    results = {}
+    for label, maxsize in (("without cache", 0), ("with cache", 4096)):
+        auth = Auth()
+        auth.token_cache = TokenCache(maxsize=maxsize)
+        auth._redis_cache = StubRedis(user)
+        token = await auth.create_access_token({"email": user.email}, 60)
+
+        with patch(
+            "src.services.auth.repository_users.is_blacklisted_token", not_blacklisted
+        ), patch("src.services.auth.logger.disabled", True):
+            await run(auth, token, 100)
+            results[label] = await run(auth, token, requests)
+
+    for label, seconds in results.items():
+        print(f"{label:>14}: {seconds * 1e6:8.1f} us/request")
+    speedup = results["without cache"] / results["with cache"]
+    print(f"{'speedup':>14}: {speedup:8.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
@@ -0,0 +1,108 @@
+"""
+Chat fan-out benchmark.
+
+Connects simulated local websocket clients to a chat room and broadcasts a burst
+of messages, once with the old serial send loop and once through ``ChatHub``.
+A small share of the clients are slow, as on a bad network. For each strategy
+it reports how long the sender is blocked per message and how long it takes
+until every healthy client has received the whole burst.
+
+Usage::
+
+    python -m benchmarks.bench_chat_fanout [clients ...]
+"""
+
+import asyncio
+import sys
+import time
+from unittest.mock import patch
+
+from src.services.chat import ChatHub
+
+MESSAGES = 20
+SLOW_SHARE = 100  # one client in SLOW_SHARE is slow
+SLOW_DELAY = 0.01
+
+
+class SimulatedWebSocket:
+    def __init__(self, delay: float, expected: int, done: asyncio.Event, pending: list):
+        self.delay = delay
+        self.expected = expected
+        self.received = 0
+        self.done = done
+        self.pending = pending
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        else:
+            await asyncio.sleep(0)
+        self.received += 1
+        if not self.delay and self.received == self.expected:
+            self.pending[0] -= 1
+            if not self.pending[0]:
+                self.done.set()
+
+    async def close(self, code=1000):
+        pass
+
+
+def make_clients(clients: int, done: asyncio.Event) -> list[SimulatedWebSocket]:
+    healthy = clients - clients // SLOW_SHARE
+    pending = [healthy]
+    return [
+        SimulatedWebSocket(
+            SLOW_DELAY if i % SLOW_SHARE == SLOW_SHARE - 1 else 0, MESSAGES, done, pending
+        )
+        for i in range(clients)
+    ]
+
+
+async def serial_loop(clients: int) -> tuple[float, float]:
+    done = asyncio.Event()
+    active_connections = make_clients(clients, done)
+
+    start = time.perf_counter()
+    blocked = 0.0
+    for i in range(MESSAGES):
+        before = time.perf_counter()
+        for connection in active_connections:
+            await connection.send_text(str(i))
+        blocked += time.perf_counter() - before
+    await done.wait()
+    return blocked / MESSAGES, time.perf_counter() - start
+
+
+async def chat_hub(clients: int) -> tuple[float, float]:
+    done = asyncio.Event()
+    hub = ChatHub(queue_size=MESSAGES, send_timeout=5)
+    for websocket in make_clients(clients, done):
+        await hub.connect(websocket)
+
+    start = time.perf_counter()
+    blocked = 0.0
+    for i in range(MESSAGES):
+        before = time.perf_counter()
+        hub.publish(str(i))
+        blocked += time.perf_counter() - before
+    await done.wait()
+    elapsed = time.perf_counter() - start
+    await hub.stop()
+    return blocked / MESSAGES, elapsed
+
+
+async def main(sizes: list[int]) -> None:
+    print(f"{'clients':>8} {'strategy':>12} {'sender blocked/msg':>20} {'burst delivered':>16}")
+    for clients in sizes:
+        for label, strategy in (("serial loop", serial_loop), ("chat hub", chat_hub)):
+            blocked, elapsed = await strategy(clients)
+            print(f"{clients:>8} {label:>12} {blocked * 1e3:>17.3f} ms {elapsed:>14.3f} s")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 5_000, 10_000]
+    with patch("src.services.chat.logger.disabled", True):
+        asyncio.run(main(sizes))
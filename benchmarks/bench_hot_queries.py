@@ -0,0 +1,168 @@
+"""
+Hot query benchmark.
+
+Seeds the configured database (``SQLALCHEMY_DATABASE_URL``) with a gallery of
+realistic volumes: users, their photos, comments, ratings and tags, and times the
+per-photo and per-user lookups of the repositories. Run it before and after the
+``index hot query paths`` migration to compare sequential scans with index scans.
+
+Usage::
+
+    python -m benchmarks.bench_hot_queries [users] [--cleanup]
+"""
+
+import asyncio
+import sys
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from src.database.connect_db import sessionmanager
+from src.database.models import User
+from src.repository import comments as repository_comments
+from src.repository import photos as repository_photos
+from src.repository import ratings as repository_ratings
+from src.repository import search as repository_search
+from src.repository import users as repository_users
+
+SEED_PREFIX = "bench_"
+PHOTOS_PER_USER = 20
+COMMENTS_PER_PHOTO = 3
+RATINGS_PER_PHOTO = 3
+TAGS_PER_PHOTO = 2
+TAGS = 1000
+
+SEED = [
+    "INSERT INTO users (username, email, password, role, confirmed, is_active, created_at, updated_at) "
+    "SELECT :prefix || g, :prefix || g || '@example.com', 'x', 'user', true, true, now(), now() "
+    "FROM generate_series(1, :users) AS g",
+    "INSERT INTO photos (url, description, user_id, created_at, cloud_public_id) "
+    "SELECT 'https://example.com/' || u.id || '/' || g || '.jpg', 'benchmark photo ' || g, "
+    "u.id, now() - g * interval '1 day', :prefix || u.id || '_' || g "
+    "FROM users AS u CROSS JOIN generate_series(1, :photos) AS g WHERE u.username LIKE :pattern",
+    "INSERT INTO comments (text, created_at, updated_at, user_id, photo_id, update_status) "
+    "SELECT 'benchmark comment ' || g, now(), now(), p.user_id, p.id, false "
+    "FROM photos AS p CROSS JOIN generate_series(1, :comments) AS g "
+    "WHERE p.cloud_public_id LIKE :pattern",
+    "INSERT INTO ratings (user_id, rating, photo_id) "
+    "SELECT (SELECT min(id) FROM users WHERE username LIKE :pattern) + (p.id + g) % :users, "
+    "g % 5 + 1, p.id "
+    "FROM photos AS p CROSS JOIN generate_series(1, :ratings) AS g "
+    "WHERE p.cloud_public_id LIKE :pattern",
+    "INSERT INTO tags (name) SELECT :prefix || g FROM generate_series(1, :tags) AS g",
+    "INSERT INTO photo_m2m_tags (photo_id, tag_id) "
+    "SELECT p.id, t.id FROM photos AS p CROSS JOIN generate_series(1, :tags_per_photo) AS g "
+    "JOIN tags AS t ON t.name = :prefix || ((p.id * g) % :tags + 1) "
+    "WHERE p.cloud_public_id LIKE :pattern",
+]
+
+CLEANUP = [
+    "DELETE FROM photo_m2m_tags WHERE tag_id IN (SELECT id FROM tags WHERE name LIKE :pattern)",
+    "DELETE FROM ratings WHERE photo_id IN (SELECT id FROM photos WHERE cloud_public_id LIKE :pattern)",
+    "DELETE FROM comments WHERE photo_id IN (SELECT id FROM photos WHERE cloud_public_id LIKE :pattern)",
+    "DELETE FROM photos WHERE cloud_public_id LIKE :pattern",
+    "DELETE FROM tags WHERE name LIKE :pattern",
+    "DELETE FROM users WHERE username LIKE :pattern",
+]
+
+
+async def seed(users: int) -> None:
+    params = {
+        "prefix": SEED_PREFIX,
+        "pattern": f"{SEED_PREFIX}%",
+        "users": users,
+        "photos": PHOTOS_PER_USER,
+        "comments": COMMENTS_PER_PHOTO,
+        "ratings": RATINGS_PER_PHOTO,
+        "tags": TAGS,
+        "tags_per_photo": TAGS_PER_PHOTO,
+    }
+    async with sessionmanager.session() as db:
+        seeded = (
+            await db.execute(
+                text("SELECT count(*) FROM users WHERE username LIKE :pattern"), params
+            )
+        ).scalar()
+        if seeded:
+            return
+        print(
+            f"seeding {users} users, {users * PHOTOS_PER_USER} photos, "
+            f"{users * PHOTOS_PER_USER * COMMENTS_PER_PHOTO} comments and ratings ..."
+        )
+        for statement in SEED:
+            await db.execute(text(statement), params)
+        await db.execute(text("ANALYZE"))
+        await db.commit()
+
+
+async def timed(label: str, probe, repeat: int) -> None:
+    async with sessionmanager.session() as db:
+        await probe(db)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            await probe(db)
+        elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:>32}: {elapsed * 1e3:10.2f} ms")
+
+
+async def main(users: int, cleanup: bool) -> None:
+    await seed(users)
+
+    async with sessionmanager.session() as db:
+        user = await repository_users.get_user_by_username(f"{SEED_PREFIX}{users // 2}", db)
+        photo_id = (
+            await db.execute(
+                text("SELECT max(id) FROM photos WHERE user_id = :user_id"),
+                {"user_id": user.id},
+            )
+        ).scalar()
+    owner = User(id=user.id)
+    week = (date.today() - timedelta(days=7), date.today())
+
+    await timed(
+        "photos of a user",
+        lambda db: repository_photos.get_my_photos(0, 20, owner, db),
+        200,
+    )
+    await timed(
+        "tags of a photo",
+        lambda db: repository_photos.get_photo_tags(photo_id, db),
+        200,
+    )
+    await timed(
+        "comments of a photo",
+        lambda db: repository_comments.get_photo_comments(0, 20, photo_id, db),
+        200,
+    )
+    await timed(
+        "comments of a user",
+        lambda db: repository_comments.get_user_comments(0, 20, user.id, db),
+        200,
+    )
+    await timed(
+        "rating of a photo",
+        lambda db: repository_ratings.get_rating(photo_id, db),
+        200,
+    )
+    await timed(
+        "profile counters",
+        lambda db: repository_users.get_user_profile(user.username, db),
+        200,
+    )
+    await timed(
+        "photos of a user this week",
+        lambda db: repository_search.search_admin(user.id, "", 0, 999, *week, db),
+        200,
+    )
+
+    if cleanup:
+        async with sessionmanager.session() as db:
+            for statement in CLEANUP:
+                await db.execute(text(statement), {"pattern": f"{SEED_PREFIX}%"})
+            await db.commit()
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    asyncio.run(main(int(args[0]) if args else 10_000, "--cleanup" in sys.argv))
@@ -0,0 +1,105 @@
+"""
+JSON response benchmark.
+
+Requests ``/api/photos/get_all`` with ``limit=100`` from two minimal
+applications: one with the previous response path (``response_model``
+validation and the default ``JSONResponse``), and one mounting the photos
+router, which serializes trusted rows with orjson behind the compression
+middleware. The database and the authentication are replaced with in-process
+stubs so that only the response path is timed. It reports the time per request
+and the size of the body for each accepted encoding.
+
+Usage::
+
+    python -m benchmarks.bench_json_responses [requests]
+"""
+
+import asyncio
+import sys
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+
+from src.database.connect_db import get_db
+from src.database.models import Photo, Role, User
+from src.routes.photos import router as photos_router
+from src.schemas import PhotosDb
+from src.services.auth import auth_service
+from src.services.compression import CompressionMiddleware
+
+LIMIT = 100
+
+
+def make_photos() -> list[Photo]:
+    return [
+        Photo(
+            id=id,
+            url=f"https://res.cloudinary.com/demo/image/upload/v1/photos/{id}.jpg",
+            description=f"Photo number {id} of the benchmark gallery",
+            user_id=id % 10 + 1,
+            created_at=datetime(2023, 10, 1, 12, 0, id % 60),
+        )
+        for id in range(1, LIMIT + 1)
+    ]
+
+
+def validated_app(photos: list[Photo]) -> FastAPI:
+    previous = FastAPI()
+
+    @previous.get("/api/photos/get_all", response_model=list[PhotosDb])
+    async def get_all_photos(skip: int = 0, limit: int = 10):
+        return photos[skip : skip + limit]
+
+    return previous
+
+
+def trusted_app(user: User) -> FastAPI:
+    current = FastAPI(default_response_class=ORJSONResponse)
+    current.add_middleware(CompressionMiddleware)
+    current.include_router(photos_router, prefix="/api")
+    current.dependency_overrides[auth_service.get_principal] = lambda: user
+    current.dependency_overrides[get_db] = lambda: None
+    return current
+
+
+async def run(target: FastAPI, requests: int, encoding: str) -> tuple[float, int]:
+    headers = {"Accept-Encoding": encoding}
+    url = f"/api/photos/get_all?limit={LIMIT}"
+    async with httpx.AsyncClient(app=target, base_url="http://bench") as client:
+        for _ in range(50):
+            await client.get(url, headers=headers)
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = await client.get(url, headers=headers)
+        elapsed = (time.perf_counter() - start) / requests
+    return elapsed, int(response.headers["content-length"])
+
+
+async def main(requests: int) -> None:
+    photos = make_photos()
+    user = User(id=1, username="benchmark", email="bench@example.com", role=Role.user)
+
+    async def get_photos(skip, limit, db):
+        return photos[skip : skip + limit]
+
+    targets = {
+        "response_model": validated_app(photos),
+        "trusted orjson": trusted_app(user),
+    }
+
+    with patch("src.routes.photos.repository_photos.get_photos", get_photos):
+        for encoding in ("identity", "gzip", "br"):
+            for label, target in targets.items():
+                seconds, size = await run(target, requests, encoding)
+                print(
+                    f"{label:>15} {encoding:>8}: "
+                    f"{seconds * 1e6:8.1f} us/request {size:8d} bytes"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
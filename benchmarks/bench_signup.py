@@ -0,0 +1,97 @@
+"""
+Signup benchmark.
+
+Seeds the ``users`` table of the configured database (``SQLALCHEMY_DATABASE_URL``)
+with synthetic accounts and times the database work done by signup: the old
+full-table load used to detect the first user against the EXISTS probe, and the
+old pair of email/username lookups against the combined uniqueness probe.
+Password hashing is left out, since it does not depend on the table size.
+
+Usage::
+
+    python -m benchmarks.bench_signup [users] [--cleanup]
+"""
+
+import asyncio
+import sys
+import time
+
+from sqlalchemy import text, select
+
+from src.database.connect_db import sessionmanager
+from src.database.models import User
+from src.repository import users as repository_users
+
+SEED_PREFIX = "bench_"
+
+
+async def seed(users: int) -> None:
+    async with sessionmanager.session() as db:
+        seeded = (
+            await db.execute(
+                text("SELECT count(*) FROM users WHERE username LIKE :prefix"),
+                {"prefix": f"{SEED_PREFIX}%"},
+            )
+        ).scalar()
+        if seeded >= users:
+            return
+        print(f"seeding {users - seeded} users ...")
+        await db.execute(
+            text(
+                "INSERT INTO users (username, email, password, role, confirmed, is_active, created_at, updated_at) "
+                "SELECT :prefix || g, :prefix || g || '@example.com', 'x', 'user', true, true, now(), now() "
+                "FROM generate_series(:start, :stop) AS g"
+            ),
+            {"prefix": SEED_PREFIX, "start": seeded + 1, "stop": users},
+        )
+        await db.commit()
+
+
+async def timed(label: str, probe, repeat: int) -> None:
+    async with sessionmanager.session() as db:
+        await probe(db)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            await probe(db)
+        elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:>32}: {elapsed * 1e3:10.2f} ms")
+
+
+async def legacy_first_user_check(db) -> None:
+    result = await db.execute(select(User))
+    len(result.scalars().all())
+
+
+async def exists_first_user_check(db) -> None:
+    await db.execute(select(select(User.id).exists()))
+
+
+async def legacy_uniqueness_check(db) -> None:
+    await repository_users.get_user_by_email("new_user@example.com", db)
+    await repository_users.get_user_by_username("new_user", db)
+
+
+async def combined_uniqueness_check(db) -> None:
+    await repository_users.check_credentials_taken("new_user@example.com", "new_user", db)
+
+
+async def main(users: int, cleanup: bool) -> None:
+    await seed(users)
+
+    await timed("select(User) first-user check", legacy_first_user_check, 3)
+    await timed("EXISTS first-user check", exists_first_user_check, 200)
+    await timed("two uniqueness lookups", legacy_uniqueness_check, 200)
+    await timed("combined uniqueness probe", combined_uniqueness_check, 200)
+
+    if cleanup:
+        async with sessionmanager.session() as db:
+            await db.execute(
+                text("DELETE FROM users WHERE username LIKE :prefix"),
+                {"prefix": f"{SEED_PREFIX}%"},
+            )
+            await db.commit()
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    asyncio.run(main(int(args[0]) if args else 1_000_000, "--cleanup" in sys.argv))
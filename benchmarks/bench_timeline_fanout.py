@@ -0,0 +1,142 @@
+"""
+Home timeline benchmark.
+
+Seeds the configured database (``SQLALCHEMY_DATABASE_URL``) with one user followed
+by many others, and uses the configured Redis. It times the fan-out of one new
+photo to the timelines of every follower, then the reads of a page of a
+follower's home feed:
+
+* fanned out on write: the page is read from the timeline only, and
+* fanned out on read: the followed user counts as a celebrity and their latest
+  photos are merged from the database.
+
+Both reads should stay flat as the number of followers grows.
+
+Usage::
+
+    python -m benchmarks.bench_timeline_fanout [followers] [--cleanup]
+"""
+
+import asyncio
+import sys
+import time
+
+from sqlalchemy import text
+
+from src.database.connect_db import sessionmanager
+from src.services.timelines import HomeTimelines, TimelineFanout
+
+SEED_PREFIX = "bench_follower_"
+STAR = "bench_star"
+STAR_PHOTOS = 50
+PAGE_SIZE = 20
+
+SEED = [
+    "INSERT INTO users (username, email, password, role, confirmed, is_active, created_at, updated_at) "
+    "VALUES (:star, :star || '@example.com', 'x', 'user', true, true, now(), now())",
+    "INSERT INTO users (username, email, password, role, confirmed, is_active, created_at, updated_at) "
+    "SELECT :prefix || g, :prefix || g || '@example.com', 'x', 'user', true, true, now(), now() "
+    "FROM generate_series(1, :followers) AS g",
+    "INSERT INTO follows (follower_id, followed_id, created_at) "
+    "SELECT u.id, s.id, now() FROM users AS u, users AS s "
+    "WHERE u.username LIKE :pattern AND s.username = :star",
+    "UPDATE users SET followers_count = :followers WHERE username = :star",
+    "UPDATE users SET following_count = 1 WHERE username LIKE :pattern",
+    "INSERT INTO photos (url, description, user_id, created_at, cloud_public_id) "
+    "SELECT 'https://example.com/star/' || g || '.jpg', 'benchmark photo ' || g, s.id, "
+    "now() - g * interval '1 hour', :star || '_' || g "
+    "FROM users AS s CROSS JOIN generate_series(1, :photos) AS g WHERE s.username = :star",
+]
+
+CLEANUP = [
+    "DELETE FROM follows WHERE followed_id IN (SELECT id FROM users WHERE username = :star)",
+    "DELETE FROM photos WHERE user_id IN (SELECT id FROM users WHERE username = :star)",
+    "DELETE FROM users WHERE username LIKE :pattern OR username = :star",
+]
+
+
+def params(followers: int = 0) -> dict:
+    return {
+        "prefix": SEED_PREFIX,
+        "pattern": f"{SEED_PREFIX}%",
+        "star": STAR,
+        "followers": followers,
+        "photos": STAR_PHOTOS,
+    }
+
+
+async def seed(followers: int) -> tuple[int, int]:
+    async with sessionmanager.session() as db:
+        seeded = (
+            await db.execute(text("SELECT count(*) FROM users WHERE username = :star"), params())
+        ).scalar()
+        if not seeded:
+            print(f"seeding {followers} followers ...")
+            for statement in SEED:
+                await db.execute(text(statement), params(followers))
+            await db.execute(text("ANALYZE"))
+            await db.commit()
+
+        star_id = (
+            await db.execute(text("SELECT id FROM users WHERE username = :star"), params())
+        ).scalar()
+        follower_id = (
+            await db.execute(
+                text("SELECT min(follower_id) FROM follows WHERE followed_id = :star_id"),
+                {"star_id": star_id},
+            )
+        ).scalar()
+        return star_id, follower_id
+
+
+async def timed_reads(label: str, timelines: HomeTimelines, user_id: int, repeat: int) -> None:
+    async with sessionmanager.session() as db:
+        await timelines.read(user_id, None, PAGE_SIZE, db)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            photo_ids, cursor = await timelines.read(user_id, None, PAGE_SIZE, db)
+            await timelines.read(user_id, cursor, PAGE_SIZE, db)
+        elapsed = (time.perf_counter() - start) / repeat / 2
+    print(f"{label:>32}: {elapsed * 1e3:10.2f} ms per page of {len(photo_ids)}")
+
+
+async def main(followers: int, cleanup: bool) -> None:
+    star_id, follower_id = await seed(followers)
+
+    # Everybody is fanned out to, however many followers
+    pushed = HomeTimelines(namespace="bench:timeline", celebrity_followers=followers + 1)
+    fanout = TimelineFanout(pushed)
+    async with sessionmanager.session() as db:
+        photos = (
+            await db.execute(
+                text("SELECT id, created_at FROM photos WHERE user_id = :star_id ORDER BY id"),
+                {"star_id": star_id},
+            )
+        ).all()
+
+    start = time.perf_counter()
+    fanned = await fanout.fan_out(star_id, photos[0].id, photos[0].created_at.timestamp())
+    elapsed = time.perf_counter() - start
+    print(f"{'fan-out of one photo':>32}: {elapsed:10.2f} s to {fanned} timelines")
+
+    for photo in photos[1:]:
+        await pushed.add_photos(follower_id, [photo])
+    await timed_reads("feed fanned out on write", pushed, follower_id, 200)
+
+    pulled = HomeTimelines(namespace="bench:timeline:empty", celebrity_followers=followers)
+    await timed_reads("feed fanned out on read", pulled, follower_id, 200)
+
+    redis = await pushed.redis_cache
+    async for key in redis.scan_iter(match="bench:timeline:*", count=10_000):
+        await redis.delete(key)
+
+    if cleanup:
+        async with sessionmanager.session() as db:
+            for statement in CLEANUP:
+                await db.execute(text(statement), params())
+            await db.commit()
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    asyncio.run(main(int(args[0]) if args else 100_000, "--cleanup" in sys.argv))
@@ -1,10 +1,11 @@
+import json
+
 import uvicorn
 from datetime import datetime
 
-from fastapi.templating import Jinja2Templates
-
 from fastapi import FastAPI, HTTPException, Depends, Request, status
-from fastapi.staticfiles import StaticFiles
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi_limiter import FastAPILimiter
 
@@ -14,7 +15,11 @@ from sqlalchemy import text
 from src.conf.messages import DB_CONFIG_ERROR, DB_CONNECT_ERROR
 
 
-from src.database.connect_db import get_db
+from src.database.connect_db import (
+    get_db,
+    sessionmanager,
+    ReadYourWritesMiddleware,
+)
 
 from src.routes.auth import router as auth_router
 from src.routes.users import router as users_router
@@ -23,14 +28,37 @@ from src.routes.photos import router as photos_router
 from src.routes.comments import router as comments_router
 from src.routes.search import router as search_router
 
-from src.views.dashboard import router as dashboard_views_router
+from src.views.dashboard import router as dashboard_views_router, route_list
 from src.views.auth import router as auth_views_router
 from src.views.users import router as user_views_router
 from src.views.photos import router as photo_views_router
 from src.views.chat import router as chat_router
 
 
-from src.conf.config import init_async_redis
+from src.conf.config import init_async_redis, settings
+from src.conf.constants import (
+    BLACKLIST_PURGE_INTERVAL,
+    COUNTERS_RECONCILE_INTERVAL,
+    DB_POOL_REPORT_INTERVAL,
+    LEADERBOARD_REBUILD_INTERVAL,
+    RATING_FLUSH_INTERVAL,
+)
+from src.services.jobs import (
+    start_periodic,
+    purge_blacklist,
+    reconcile_counters,
+    report_pool_status,
+    flush_ratings,
+    rebuild_leaderboards,
+)
+from src.services.email_worker import create_email_worker
+from src.services.timelines import timeline_fanout
+from src.services.chat import chat_hub
+from src.services.photo_rooms import photo_rooms
+from src.services.page_cache import page_cache
+from src.services.templating import templates, preload_templates
+from src.services.static_assets import static_assets
+from src.services.compression import CompressionMiddleware
 
 
 current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -38,6 +66,7 @@ current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 app = FastAPI(
     debug=True,
     title="Snapshot Exchange",
+    default_response_class=ORJSONResponse,
 )
 
 # Настройка CORS
@@ -48,16 +77,42 @@ app.add_middleware(
     allow_headers=["*"],
     allow_credentials=True,
 )
+app.add_middleware(CompressionMiddleware)
+if sessionmanager.has_replicas:
+    app.add_middleware(ReadYourWritesMiddleware)
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
-
-templates = Jinja2Templates(directory="templates")
-
+app.mount("/static", static_assets, name="static")
 
 @app.on_event("startup")
 async def startup():
     redis_cache = await init_async_redis()
     await FastAPILimiter.init(redis_cache)
+    static_assets.build()
+    preload_templates(templates)
+    app.state.jobs = [
+        start_periodic(purge_blacklist, BLACKLIST_PURGE_INTERVAL, exclusive=True),
+        start_periodic(report_pool_status, DB_POOL_REPORT_INTERVAL),
+        start_periodic(reconcile_counters, COUNTERS_RECONCILE_INTERVAL, exclusive=True),
+        start_periodic(rebuild_leaderboards, LEADERBOARD_REBUILD_INTERVAL, exclusive=True),
+    ]
+    if settings.rating_write_behind:
+        app.state.jobs.append(start_periodic(flush_ratings, RATING_FLUSH_INTERVAL))
+    app.state.email_worker = create_email_worker()
+    app.state.email_worker.start()
+    timeline_fanout.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    for job in app.state.jobs:
+        job.cancel()
+    if settings.rating_write_behind:
+        await flush_ratings()
+    await app.state.email_worker.stop()
+    await timeline_fanout.stop()
+    await chat_hub.stop()
+    await photo_rooms.stop()
+    await sessionmanager.close()
 
 
 @app.get(
@@ -126,18 +181,14 @@ async def healthchecker(session: AsyncSession = Depends(get_db)):
 
 
 @app.get("/list", tags=["Root"])
-def get_all_urls_from_request(request: Request) -> list[dict]:
-    routes = [
-        {
-            "path": str(request.base_url)[:-1] + route.path,
-            "name": route.name,
-            "method": route.methods,
-            "description": route.description,
-        }
-        for route in request.app.routes
-        if hasattr(route, "description") and route.description is not None
-    ]
-    return routes
+async def get_all_urls_from_request(request: Request) -> list[dict]:
+    async def render():
+        return json.dumps(jsonable_encoder(route_list(request)))
+
+    page = await page_cache.get(
+        ("get_all_urls_from_request", str(request.base_url)), render, "application/json"
+    )
+    return page.response(request)
 
 
 app.include_router(auth_router, prefix="/api")
@@ -0,0 +1,74 @@
+"""index hot query paths
+
+Revision ID: 4b8d2e6f9a13
+Revises: c7e2a9f41b3d
+Create Date: 2026-10-18 16:40:12.527031
+
+"""
+from contextlib import nullcontext
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b8d2e6f9a13'
+down_revision: Union[str, None] = 'c7e2a9f41b3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_photos_user_id', 'photos', ['user_id']),
+    ('ix_photos_created_at', 'photos', ['created_at']),
+    ('ix_comments_photo_id', 'comments', ['photo_id']),
+    ('ix_comments_user_id', 'comments', ['user_id']),
+    ('ix_ratings_photo_id', 'ratings', ['photo_id']),
+    ('ix_photo_m2m_tags_photo_id_tag_id', 'photo_m2m_tags', ['photo_id', 'tag_id']),
+    ('ix_photo_m2m_tags_tag_id', 'photo_m2m_tags', ['tag_id']),
+    ('ix_Qr_codes_photo_id', 'Qr_codes', ['photo_id']),
+]
+RATINGS_UNIQUE = 'uq_ratings_user_id_photo_id'
+
+
+def postgresql() -> bool:
+    return op.get_context().dialect.name == 'postgresql'
+
+
+def outside_transaction():
+    # CREATE INDEX CONCURRENTLY does not lock the tables for writes, but cannot
+    # run inside a transaction. If it fails, PostgreSQL leaves an invalid index
+    # behind, which must be dropped before running the migration again.
+    if postgresql():
+        return op.get_context().autocommit_block()
+    return nullcontext()
+
+
+def upgrade() -> None:
+    # Keep the first rating of a user for a photo, so the pair can be made unique
+    op.execute(
+        'DELETE FROM ratings WHERE id NOT IN '
+        '(SELECT min(id) FROM ratings GROUP BY user_id, photo_id)'
+    )
+
+    with outside_transaction():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+        op.create_index(
+            RATINGS_UNIQUE, 'ratings', ['user_id', 'photo_id'], unique=True, postgresql_concurrently=True
+        )
+
+    if postgresql():
+        # Turning the index into a constraint only updates the catalog
+        op.execute(f'ALTER TABLE ratings ADD CONSTRAINT {RATINGS_UNIQUE} UNIQUE USING INDEX {RATINGS_UNIQUE}')
+
+
+def downgrade() -> None:
+    if postgresql():
+        op.drop_constraint(RATINGS_UNIQUE, 'ratings', type_='unique')
+    else:
+        op.drop_index(RATINGS_UNIQUE, table_name='ratings')
+
+    with outside_transaction():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,65 @@
+"""add follows
+
+Revision ID: 9d5f3b7c1e64
+Revises: e3a7c15d8b42
+Create Date: 2026-10-18 21:14:08.402917
+
+"""
+from contextlib import nullcontext
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d5f3b7c1e64'
+down_revision: Union[str, None] = 'e3a7c15d8b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNTERS = ['followers_count', 'following_count']
+PHOTOS_BY_USER = 'ix_photos_user_id_created_at'
+
+
+def outside_transaction():
+    # See 4b8d2e6f9a13: CREATE INDEX CONCURRENTLY cannot run in a transaction
+    if op.get_context().dialect.name == 'postgresql':
+        return op.get_context().autocommit_block()
+    return nullcontext()
+
+
+def upgrade() -> None:
+    op.create_table(
+        'follows',
+        sa.Column('follower_id', sa.Integer(), nullable=False),
+        sa.Column('followed_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['follower_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['followed_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('follower_id', 'followed_id'),
+    )
+    # Followers of a user are read in follower_id order when fanning out
+    op.create_index(
+        'ix_follows_followed_id_follower_id', 'follows', ['followed_id', 'follower_id'], unique=False
+    )
+
+    # Nobody follows anybody yet, so the constant default is exact
+    for name in COUNTERS:
+        op.add_column('users', sa.Column(name, sa.Integer(), server_default='0', nullable=False))
+
+    with outside_transaction():
+        op.create_index(
+            PHOTOS_BY_USER, 'photos', ['user_id', 'created_at'], unique=False, postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with outside_transaction():
+        op.drop_index(PHOTOS_BY_USER, table_name='photos', postgresql_concurrently=True)
+
+    for name in reversed(COUNTERS):
+        op.drop_column('users', name)
+
+    op.drop_index('ix_follows_followed_id_follower_id', table_name='follows')
+    op.drop_table('follows')
@@ -0,0 +1,92 @@
+"""compact blacklist tokens
+
+Revision ID: c7e2a9f41b3d
+Revises: 01e60cf45289
+Create Date: 2026-10-18 10:12:45.318204
+
+"""
+import hashlib
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from jose import JWTError, jwt
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e2a9f41b3d'
+down_revision: Union[str, None] = '01e60cf45289'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+ACCESS_TOKEN_LIFE_TIME = timedelta(minutes=60)
+
+blacklist_tokens = sa.table(
+    'blacklist_tokens',
+    sa.column('id', sa.Integer),
+    sa.column('token', sa.String),
+    sa.column('token_digest', sa.LargeBinary),
+    sa.column('expires_at', sa.DateTime),
+    sa.column('blacklisted_on', sa.DateTime),
+)
+
+
+def expiration(token: str, blacklisted_on: datetime | None) -> datetime:
+    try:
+        exp = jwt.get_unverified_claims(token).get('exp')
+    except JWTError:
+        exp = None
+    if exp is not None:
+        return datetime.utcfromtimestamp(exp)
+    return (blacklisted_on or datetime.utcnow()) + ACCESS_TOKEN_LIFE_TIME
+
+
+def upgrade() -> None:
+    op.add_column('blacklist_tokens', sa.Column('token_digest', sa.LargeBinary(length=32), nullable=True))
+    op.add_column('blacklist_tokens', sa.Column('expires_at', sa.DateTime(), nullable=True))
+
+    # Backfill digests and expiration times of existing tokens
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(blacklist_tokens.c.id, blacklist_tokens.c.token, blacklist_tokens.c.blacklisted_on)
+            .where(blacklist_tokens.c.id > last_id)
+            .order_by(blacklist_tokens.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            blacklist_tokens.update()
+            .where(blacklist_tokens.c.id == sa.bindparam('_id'))
+            .values(token_digest=sa.bindparam('_digest'), expires_at=sa.bindparam('_expires_at')),
+            [
+                {
+                    '_id': row.id,
+                    '_digest': hashlib.sha256(row.token.encode()).digest(),
+                    '_expires_at': expiration(row.token, row.blacklisted_on),
+                }
+                for row in rows
+            ],
+        )
+        last_id = rows[-1].id
+
+    op.alter_column('blacklist_tokens', 'token_digest', nullable=False)
+    op.alter_column('blacklist_tokens', 'expires_at', nullable=False)
+    op.create_unique_constraint(op.f('uq_blacklist_tokens_token_digest'), 'blacklist_tokens', ['token_digest'])
+    op.create_index(op.f('ix_blacklist_tokens_expires_at'), 'blacklist_tokens', ['expires_at'], unique=False)
+    op.drop_column('blacklist_tokens', 'token')
+
+
+def downgrade() -> None:
+    # Raw tokens cannot be restored from their digests, so the blacklist is emptied
+    op.execute(blacklist_tokens.delete())
+    op.add_column('blacklist_tokens', sa.Column('token', sa.String(length=500), nullable=False))
+    op.create_unique_constraint(op.f('blacklist_tokens_token_key'), 'blacklist_tokens', ['token'])
+    op.drop_index(op.f('ix_blacklist_tokens_expires_at'), table_name='blacklist_tokens')
+    op.drop_constraint(op.f('uq_blacklist_tokens_token_digest'), 'blacklist_tokens', type_='unique')
+    op.drop_column('blacklist_tokens', 'expires_at')
+    op.drop_column('blacklist_tokens', 'token_digest')
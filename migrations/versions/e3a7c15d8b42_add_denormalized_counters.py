@@ -0,0 +1,67 @@
+"""add denormalized counters
+
+Revision ID: e3a7c15d8b42
+Revises: 4b8d2e6f9a13
+Create Date: 2026-10-18 18:05:37.160284
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a7c15d8b42'
+down_revision: Union[str, None] = '4b8d2e6f9a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNTERS = {
+    'users': ['photos_count', 'comments_count'],
+    'photos': ['comments_count', 'ratings_count', 'ratings_sum'],
+}
+
+users = sa.table('users', sa.column('id', sa.Integer), *(sa.column(name, sa.Integer) for name in COUNTERS['users']))
+photos = sa.table(
+    'photos',
+    sa.column('id', sa.Integer),
+    sa.column('user_id', sa.Integer),
+    *(sa.column(name, sa.Integer) for name in COUNTERS['photos']),
+)
+comments = sa.table('comments', sa.column('user_id', sa.Integer), sa.column('photo_id', sa.Integer))
+ratings = sa.table('ratings', sa.column('photo_id', sa.Integer), sa.column('rating', sa.Integer))
+
+
+def count(table, where):
+    return sa.select(sa.func.count()).select_from(table).where(where).scalar_subquery()
+
+
+def upgrade() -> None:
+    # A constant default fills the existing rows without rewriting the tables
+    for table, names in COUNTERS.items():
+        for name in names:
+            op.add_column(table, sa.Column(name, sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill the counters of the existing rows
+    op.execute(
+        users.update().values(
+            photos_count=count(photos, photos.c.user_id == users.c.id),
+            comments_count=count(comments, comments.c.user_id == users.c.id),
+        )
+    )
+    op.execute(
+        photos.update().values(
+            comments_count=count(comments, comments.c.photo_id == photos.c.id),
+            ratings_count=count(ratings, ratings.c.photo_id == photos.c.id),
+            ratings_sum=sa.select(sa.func.coalesce(sa.func.sum(ratings.c.rating), sa.literal_column('0')))
+            .where(ratings.c.photo_id == photos.c.id)
+            .scalar_subquery(),
+        )
+    )
+
+
+def downgrade() -> None:
+    for table, names in COUNTERS.items():
+        for name in reversed(names):
+            op.drop_column(table, name)
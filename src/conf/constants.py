@@ -1,2 +1,42 @@
 TOKEN_LIFE_TIME = 60 # token life time im minutes
 COOKIE_KEY_NAME = 'access_token'
+REFRESH_TOKEN_LIFE_TIME = 7 * 24 * 60 * 60 # refresh token life time in seconds
+BLACKLIST_PURGE_INTERVAL = 60 * 60 # interval between purges of expired blacklisted tokens in seconds
+BLACKLIST_PURGE_BATCH_SIZE = 1000 # number of expired blacklisted tokens deleted per transaction
+EMAIL_SMTP_POOL_SIZE = 4 # number of SMTP connections kept open by the email worker
+EMAIL_BATCH_SIZE = 50 # number of queued emails delivered concurrently by the email worker
+EMAIL_MAX_ATTEMPTS = 5 # number of delivery attempts before an email is dropped
+EMAIL_CLAIM_MIN_IDLE = 300 # seconds an email stays unacknowledged before another worker delivers it
+CHAT_QUEUE_SIZE = 100 # number of messages waiting for a chat client before it is dropped
+CHAT_SEND_TIMEOUT = 5 # maximum time of a single send to a chat client in seconds
+CHAT_TICK = 0.01 # time during which chat messages are collected into one broker batch in seconds
+CHAT_BATCH_SIZE = 500 # maximum number of chat messages published in one broker batch
+CHAT_INBOX_SIZE = 10 * CHAT_BATCH_SIZE # number of chat messages waiting to be published before new ones are dropped
+CHAT_HISTORY_SIZE = 1000 # number of chat messages kept in the history of a room
+CHAT_HISTORY_ON_CONNECT = 50 # number of recent chat messages sent to a client when it connects
+PHOTO_ROOMS_PER_CLIENT = 100 # maximum number of photos watched through one websocket
+PAGE_CACHE_SIZE = 64 # maximum number of pre-rendered pages kept in memory
+FRAGMENT_CACHE_TTL = 24 * 60 * 60 # lifetime of a rendered photo card in seconds
+GALLERY_BATCH_SIZE = 20 # number of photo cards rendered and streamed at once
+COMPRESSION_MINIMUM_SIZE = 1024 # smallest response body compressed in bytes
+COMPRESSION_GZIP_LEVEL = 6 # gzip level of compressed responses
+COMPRESSION_BROTLI_QUALITY = 4 # brotli quality of compressed responses
+DB_POOL_REPORT_INTERVAL = 5 * 60 # interval between reports of the database pool statistics in seconds
+DB_STICKY_COOKIE_NAME = 'db_sticky' # cookie sending the reads of a client to the primary database after its writes
+DB_HOLD_REPORT_ROUTES = 10 # number of routes holding database connections the longest that are reported
+COUNTERS_RECONCILE_INTERVAL = 6 * 60 * 60 # interval between corrections of drifted user and photo counters in seconds
+RATING_FLUSH_INTERVAL = 0.25 # interval between bulk inserts of the buffered rating votes in seconds
+RATING_BATCH_STALE_AFTER = 60 # seconds a taken batch of rating votes waits for its flush before another flush takes it
+LEADERBOARD_PRIOR_MEAN = 3 # rating a photo without votes is ranked with on the top-rated leaderboard
+LEADERBOARD_PRIOR_WEIGHT = 5 # number of votes at the prior mean added to each photo on the top-rated leaderboard
+LEADERBOARD_TRENDING_HALF_LIFE = 12 * 60 * 60 # age after which a photo needs twice the ratings and comments to trend in seconds
+LEADERBOARD_REBUILD_INTERVAL = 60 * 60 # interval between rebuilds of the photo leaderboards from the database in seconds
+LEADERBOARD_REBUILD_BATCH_SIZE = 1000 # number of photos scored per batch of a leaderboard rebuild
+LEADERBOARD_PAGE_SIZE = 100 # maximum number of photos in a page of a leaderboard
+TIMELINE_SIZE = 800 # number of photos kept in the home timeline of a user
+TIMELINE_CELEBRITY_FOLLOWERS = 10_000 # number of followers from which new photos are read by the followers instead of fanned out
+TIMELINE_FANOUT_BATCH_SIZE = 1000 # number of follower timelines updated per Redis round trip
+TIMELINE_FANOUT_MAX_ATTEMPTS = 5 # number of fan-out attempts of a photo before it is dead-lettered
+TIMELINE_FANOUT_WORKER_LEASE = 60 # seconds without a heartbeat after which the photos of a fan-out worker are queued again
+TIMELINE_FOLLOW_BACKFILL = 20 # number of recent photos added to a timeline on follow
+TIMELINE_PAGE_SIZE = 100 # maximum number of photos in a page of a home timeline
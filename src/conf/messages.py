@@ -38,6 +38,12 @@ USER_CHANGE_ROLE_TO = "User role changed to"
 USER_IS_LOGOUT = "Successfully logged out!"
 USER_EXISTS = "User with this name aready exists."
 SELF_ACTIVATION = "You can't ban/activate yourself"
+USER_NOT_FOUND = "There is no user with this username"
+FOLLOW_YOURSELF = "You can't follow yourself"
+USER_FOLLOWED = "You now follow this user"
+USER_ALREADY_FOLLOWED = "You already follow this user"
+USER_UNFOLLOWED = "You no longer follow this user"
+USER_NOT_FOLLOWED = "You don't follow this user"
 TOO_MANY_HASHTAGS = "Too many hashtags! Maximum 5."
 NO_POST_ID = "No post with this ID."
 COMMENT_NOT_FOUND = "Comment not found or not available."
@@ -63,6 +69,7 @@ PASWORD_RESET_SUCCESS = "Password reset successfully"
 NO_PHOTO_BY_ID = "There is no photo with this ID"
 TOO_MANY_TAGS = "You can't add more than 5 tags to a photo."
 LONG_DESCRIPTION = "Description is too long. Maximum length is 500 characters."
+BAD_CURSOR = "The page cursor is not valid"
 
 ### Search messages ###
 
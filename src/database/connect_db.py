@@ -1,6 +1,13 @@
 import contextlib
-from typing import AsyncIterator
+import itertools
+import time
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Sequence
 
+from fastapi import Request
+from sqlalchemy import event, exc
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
@@ -8,41 +15,468 @@ from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
     create_async_engine,
 )
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, Session, SessionTransaction
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from uvicorn.config import logger
 
 from src.conf.config import settings
+from src.conf.constants import DB_STICKY_COOKIE_NAME
 
 
 class Base(AsyncAttrs, DeclarativeBase):
     pass
 
 
+@dataclass
+class PoolStats:
+    """
+    Checkout statistics of a connection pool.
+
+    :param int checkouts: The number of connections handed out.
+    :param int timeouts: The number of checkouts that gave up after ``pool_timeout``.
+    :param float wait_time: The total time spent waiting for a connection, in seconds.
+    :param float max_wait: The longest wait for a connection, in seconds.
+    """
+
+    checkouts: int = 0
+    timeouts: int = 0
+    wait_time: float = 0.0
+    max_wait: float = 0.0
+
+    def record(self, waited: float, timed_out: bool = False) -> None:
+        if timed_out:
+            self.timeouts += 1
+        else:
+            self.checkouts += 1
+        self.wait_time += waited
+        self.max_wait = max(self.max_wait, waited)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool measuring how long checkouts wait for a free connection.
+    """
+
+    def __init__(self, *args, stats: PoolStats | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = stats or PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return connection
+
+    def recreate(self) -> "TimedQueuePool":
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def engine_options(
+    url: str,
+    pool_size: int = settings.db_pool_size,
+    max_overflow: int = settings.db_max_overflow,
+    pool_timeout: float = settings.db_pool_timeout,
+    pool_recycle: int = settings.db_pool_recycle,
+    pool_pre_ping: bool = settings.db_pool_pre_ping,
+    statement_cache_size: int = settings.db_statement_cache_size,
+    statement_timeout: int = settings.db_statement_timeout,
+) -> dict:
+    """
+    Build the options of the database engine of one worker process.
+
+    Each worker has its own pool, so a deployment opens up to
+    ``workers * (pool_size + max_overflow)`` connections, which must stay
+    below ``max_connections`` of Postgres. SQLite keeps its own pool.
+
+    :param str url: The database URL.
+    :param int pool_size: The number of connections kept open.
+    :param int max_overflow: The number of extra connections opened under load.
+    :param float pool_timeout: The longest wait for a free connection, in seconds.
+    :param int pool_recycle: The age after which a connection is replaced, in seconds.
+    :param bool pool_pre_ping: Whether connections are tested before each checkout.
+    :param int statement_cache_size: The number of prepared statements cached by asyncpg per connection.
+    :param int statement_timeout: The longest run of a statement, in milliseconds, or 0 for no limit.
+    :return: The keyword arguments of ``create_async_engine``.
+    :rtype: dict
+    """
+
+    url = make_url(url)
+    options = {"pool_pre_ping": pool_pre_ping}
+    if url.get_backend_name() != "sqlite":
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=pool_recycle,
+        )
+    if url.get_driver_name() == "asyncpg":
+        server_settings = {}
+        if statement_timeout:
+            server_settings["statement_timeout"] = str(statement_timeout)
+        options["connect_args"] = {
+            "statement_cache_size": statement_cache_size,
+            "server_settings": server_settings,
+        }
+    return options
+
+
+class TrackedSession(Session):
+    """
+    Session class of the manager, so its events leave other sessions alone.
+    """
+
+
+@dataclass
+class HoldStats:
+    """
+    Connection hold time of the sessions of one route.
+
+    :param int transactions: The number of transactions, i.e. connection checkouts.
+    :param float total: The total time connections were held, in seconds.
+    :param float max: The longest time a connection was held, in seconds.
+    """
+
+    transactions: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def record(self, held: float) -> None:
+        self.transactions += 1
+        self.total += held
+        self.max = max(self.max, held)
+
+
+class ConnectionHoldTimer:
+    """
+    Measure how long sessions hold a pooled connection, per route.
+
+    A session checks out a connection when its transaction begins, on the
+    first statement, and returns it when the transaction ends with a commit,
+    a rollback or the closing of the session. The route of a session is read
+    from ``session.info["route"]``, set by :func:`get_db`; sessions opened
+    outside requests count as ``background``.
+    """
+
+    def __init__(self):
+        self.routes: dict[str, HoldStats] = {}
+        event.listen(TrackedSession, "after_begin", self._begin)
+        event.listen(TrackedSession, "after_transaction_end", self._end)
+
+    def _begin(self, session: Session, transaction: SessionTransaction, connection):
+        session.info.setdefault("held_since", time.perf_counter())
+
+    def _end(self, session: Session, transaction: SessionTransaction):
+        if transaction.parent is not None:
+            return
+        since = session.info.pop("held_since", None)
+        if since is not None:
+            route = session.info.get("route", "background")
+            self.routes.setdefault(route, HoldStats()).record(
+                time.perf_counter() - since
+            )
+
+    def report(self, limit: int | None = None) -> dict[str, dict]:
+        """
+        Report the hold times of the routes holding connections the longest.
+
+        :param int | None limit: The number of routes reported, or None for all.
+        :return: The transactions, total, mean and maximum hold time of each route.
+        :rtype: dict[str, dict]
+        """
+
+        routes = sorted(self.routes.items(), key=lambda item: -item[1].total)
+        return {
+            route: {**asdict(stats), "mean": stats.total / stats.transactions}
+            for route, stats in routes[:limit]
+        }
+
+
+connection_hold_timer = ConnectionHoldTimer()
+
+
+def pool_status(engine: AsyncEngine) -> dict:
+    """
+    Report the state and the checkout statistics of the pool of an engine.
+
+    :param AsyncEngine engine: The database engine.
+    :return: The open, checked out and overflow connections, and the
+        checkout statistics, or an empty dict for pools without them.
+    :rtype: dict
+    """
+
+    pool = engine.pool
+    if not isinstance(pool, TimedQueuePool):
+        return {}
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        **asdict(pool.stats),
+    }
+
+
+@dataclass
+class Replica:
+    """
+    A read replica of the database.
+
+    :param AsyncEngine engine: The engine of the replica.
+    :param async_sessionmaker session_maker: The session factory of the replica.
+    :param float down_until: The monotonic time until which the replica is skipped.
+    """
+
+    engine: AsyncEngine
+    session_maker: async_sessionmaker
+    down_until: float = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return self.down_until <= time.monotonic()
+
+
 class DatabaseSessionManager:
-    def __init__(self, url: str):
-        self._engine: AsyncEngine | None = create_async_engine(url)
-        self._session_maker: async_sessionmaker | None = async_sessionmaker(
-            autocommit=False, autoflush=False, expire_on_commit=False, bind=self._engine
+    def __init__(
+        self,
+        url: str,
+        replica_urls: Sequence[str] = (),
+        retry_after: float = settings.db_replica_retry_after,
+        **options,
+    ):
+        self._engine: AsyncEngine | None = create_async_engine(
+            url, **(engine_options(url) | options)
         )
+        self._session_maker: async_sessionmaker | None = self._maker(self._engine)
+        self._replicas: list[Replica] = []
+        for replica_url in replica_urls:
+            engine = create_async_engine(
+                replica_url, **(engine_options(replica_url) | options)
+            )
+            self._replicas.append(Replica(engine, self._maker(engine)))
+        self._turn = itertools.count()
+        self.retry_after = retry_after
+
+    @staticmethod
+    def _maker(engine: AsyncEngine) -> async_sessionmaker:
+        return async_sessionmaker(
+            autocommit=False,
+            autoflush=False,
+            expire_on_commit=False,
+            bind=engine,
+            sync_session_class=TrackedSession,
+        )
+
+    @property
+    def has_replicas(self) -> bool:
+        return bool(self._replicas)
 
     @contextlib.asynccontextmanager
     async def session(self) -> AsyncIterator[AsyncSession]:
+        """
+        Open a session on the primary.
+
+        The session checks out a connection on its first statement, not when it
+        is opened. If the block raises, the transaction is rolled back and the
+        error propagates.
+
+        :return: The session.
+        :rtype: AsyncSession
+        """
+
+        if self._session_maker is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+        async with self._use(self._session_maker()) as session:
+            yield session
+
+    @contextlib.asynccontextmanager
+    async def read_session(self) -> AsyncIterator[AsyncSession]:
+        """
+        Open a session for reads on a replica, or on the primary if none is up.
+
+        Replicas take turns. Unlike :meth:`session`, a session connects before
+        it is handed out, which is how a replica that cannot be reached is
+        found; it is then skipped for ``retry_after`` seconds.
+        The replicas may lag behind the primary, so callers that must see
+        their own writes use :meth:`session` instead.
+
+        **Example Usage:**
+
+        .. code-block:: python
+
+            async with sessionmanager.read_session() as db:
+                photos = await repository_photos.get_photos(0, 10, db)
+
+        :return: The session.
+        :rtype: AsyncSession
+        """
+
         if self._session_maker is None:
             raise Exception("DatabaseSessionManager is not initialized")
-        session = self._session_maker()
+        session = await self._replica_session() or self._session_maker()
+        async with self._use(session) as session:
+            yield session
+
+    async def _replica_session(self) -> AsyncSession | None:
+        count = len(self._replicas)
+        if not count:
+            return None
+        start = next(self._turn)
+        for offset in range(count):
+            replica = self._replicas[(start + offset) % count]
+            if not replica.healthy:
+                continue
+            session = replica.session_maker()
+            try:
+                await session.connection()
+                return session
+            except (exc.DBAPIError, OSError) as err:
+                await session.close()
+                replica.down_until = time.monotonic() + self.retry_after
+                logger.warning(f"Database replica {replica.engine.url} is down: {err}")
+        return None
+
+    @staticmethod
+    @contextlib.asynccontextmanager
+    async def _use(session: AsyncSession) -> AsyncIterator[AsyncSession]:
         try:
             yield session
-        except Exception as err:
-            print(err)
+        except Exception:
             await session.rollback()
+            raise
         finally:
             await session.close()
 
+    def pool_status(self) -> dict:
+        """
+        Report the state and the checkout statistics of the connection pools.
 
-sessionmanager = DatabaseSessionManager(settings.sqlalchemy_database_url)
+        :return: The status of the primary pool, with the status and the
+            health of each replica under ``replicas`` if there are any.
+        :rtype: dict
+        """
+
+        if self._engine is None:
+            return {}
+        status = pool_status(self._engine)
+        if self._replicas:
+            status["replicas"] = [
+                {"healthy": replica.healthy, **pool_status(replica.engine)}
+                for replica in self._replicas
+            ]
+        return status
+
+    async def close(self) -> None:
+        """
+        Close every pooled connection. The manager cannot be used afterwards.
+
+        :return: None
+        """
+
+        if self._engine is None:
+            return
+        await self._engine.dispose()
+        for replica in self._replicas:
+            await replica.engine.dispose()
+        self._engine = None
+        self._session_maker = None
+        self._replicas = []
+
+
+sessionmanager = DatabaseSessionManager(
+    settings.sqlalchemy_database_url, settings.db_replica_urls
+)
+
+
+def dialect_insert(session: AsyncSession):
+    """
+    Get the INSERT construct of the dialect of a session, which renders
+    ``ON CONFLICT`` clauses.
+
+    PostgreSQL serves the application, SQLite the tests.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        insert = dialect_insert(db)
+        await db.execute(insert(follows).values(...).on_conflict_do_nothing())
+
+    :param AsyncSession session: The database session.
+    :return: The ``insert`` function of the dialect.
+    """
+
+    bind = session.bind
+    if bind is not None and bind.dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+
+def route_name(request: Request | None) -> str:
+    endpoint = request.scope.get("endpoint") if request is not None else None
+    if endpoint is None:
+        return "background"
+    return f"{endpoint.__module__}.{endpoint.__name__}"
 
 
 # Dependency
-async def get_db():
+async def get_db(request: Request = None):
+    # No connection is checked out until the route runs its first statement,
+    # so routes answering from a cache or returning early leave the pool alone
     async with sessionmanager.session() as session:
+        session.info["route"] = route_name(request)
         yield session
 
+
+# Dependency of read-only routes
+async def get_read_db(request: Request):
+    if request.cookies.get(DB_STICKY_COOKIE_NAME):
+        # The client wrote recently, and a replica may not have its write yet
+        session = sessionmanager.session()
+    else:
+        session = sessionmanager.read_session()
+    async with session as session:
+        session.info["route"] = route_name(request)
+        yield session
+
+
+class ReadYourWritesMiddleware:
+    """
+    Send the reads of a client to the primary for a while after its writes.
+
+    A successful request with an unsafe method sets a short-lived cookie, and
+    :func:`get_read_db` skips the replicas while the client holds it. The
+    cookie follows the client across worker processes.
+
+    :param app: The wrapped application.
+    :param float window: The lifetime of the cookie, in seconds.
+    """
+
+    SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+    def __init__(self, app: ASGIApp, window: float = settings.db_sticky_window):
+        self.app = app
+        self.cookie = (
+            f"{DB_STICKY_COOKIE_NAME}=1; Max-Age={int(window)}; Path=/; "
+            "HttpOnly; SameSite=lax"
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in self.SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                MutableHeaders(scope=message).append("set-cookie", self.cookie)
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
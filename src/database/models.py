@@ -6,10 +6,13 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
+    LargeBinary,
     String,
     Table,
     Text,
+    UniqueConstraint,
     func,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -45,7 +48,17 @@ photo_m2m_tags = Table(
     "photo_m2m_tags",
     Base.metadata,
     Column("photo_id", Integer, ForeignKey("photos.id")),
-    Column("tag_id", Integer, ForeignKey("tags.id")),
+    Column("tag_id", Integer, ForeignKey("tags.id"), index=True),
+    Index("ix_photo_m2m_tags_photo_id_tag_id", "photo_id", "tag_id"),
+)
+
+follows = Table(
+    "follows",
+    Base.metadata,
+    Column("follower_id", Integer, ForeignKey("users.id"), primary_key=True),
+    Column("followed_id", Integer, ForeignKey("users.id"), primary_key=True),
+    Column("created_at", DateTime, default=func.now()),
+    Index("ix_follows_followed_id_follower_id", "followed_id", "follower_id"),
 )
 
 
@@ -93,6 +106,10 @@ class User(Base):
     :param confirmed: Indicates whether the user's email is confirmed.
     :param is_active: Indicates whether the user's account is active.
     :param description: A brief description or bio of the user.
+    :param photos_count: The number of photos uploaded by the user (denormalized).
+    :param comments_count: The number of comments left by the user (denormalized).
+    :param followers_count: The number of users following the user (denormalized).
+    :param following_count: The number of users the user follows (denormalized).
     :param ratings: Relationship to user ratings.
     :param photos: Relationship to user's uploaded photos.
 
@@ -114,6 +131,10 @@ class User(Base):
     confirmed: Mapped[bool] = mapped_column(Boolean, default=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     description: Mapped[str] = mapped_column(String(500), nullable=True, unique=False)
+    photos_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    comments_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    followers_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    following_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 
     ratings: Mapped["Rating"] = relationship("Rating", back_populates="user")
     photos: Mapped[list["Photo"]] = relationship("Photo", back_populates="user")
@@ -129,9 +150,12 @@ class Photo(Base):
     :param id: The unique identifier for the photo (primary key).
     :param url: The URL of the photo.
     :param description: A brief description of the photo.
-    :param user_id: The user ID of the owner of the photo.
-    :param created_at: The timestamp when the photo was created.
+    :param user_id: The user ID of the owner of the photo (indexed, also with created_at).
+    :param created_at: The timestamp when the photo was created (indexed).
     :param cloud_public_id: The public ID of the photo in the cloud storage.
+    :param comments_count: The number of comments on the photo (denormalized).
+    :param ratings_count: The number of ratings of the photo (denormalized).
+    :param ratings_sum: The sum of the ratings of the photo (denormalized).
     :param ratings: Relationship to photo ratings.
     :param tags: Relationship to tags associated with the photo.
     :param QR: Relationship to QR codes associated with the photo.
@@ -141,13 +165,21 @@ class Photo(Base):
     """
 
     __tablename__ = "photos"
+    __table_args__ = (
+        Index("ix_photos_user_id_created_at", "user_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     url: Mapped[str] = mapped_column(String(255), nullable=False)
     description: Mapped[str] = mapped_column(String(500), nullable=True)
-    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"))
-    created_at: Mapped[date] = mapped_column("created_at", DateTime, default=func.now())
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), index=True)
+    created_at: Mapped[date] = mapped_column(
+        "created_at", DateTime, default=func.now(), index=True
+    )
     cloud_public_id: Mapped[str] = mapped_column(String, nullable=False)
+    comments_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    ratings_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    ratings_sum: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 
     ratings: Mapped["Rating"] = relationship(
         "Rating", back_populates="photo", cascade="all, delete-orphan"
@@ -164,6 +196,16 @@ class Photo(Base):
         "Comment", back_populates="photo", cascade="all, delete-orphan"
     )
 
+    @property
+    def avg_rating(self) -> float:
+        """
+        The average rating of the photo, or 0 if it has no ratings.
+        """
+
+        if not self.ratings_count:
+            return 0
+        return self.ratings_sum / self.ratings_count
+
 
 class Rating(Base):
 
@@ -171,22 +213,26 @@ class Rating(Base):
     Rating Model
 
     This SQLAlchemy model represents a rating given by a user to a photo in the database.
+    A user rates a photo at most once.
 
     :param id: The unique identifier for the rating (primary key).
-    :param user_id: The user ID of the user who gave the rating.
+    :param user_id: The user ID of the user who gave the rating (unique with photo_id).
     :param rating: The numerical rating value.
-    :param photo_id: The photo ID of the photo that received the rating.
+    :param photo_id: The photo ID of the photo that received the rating (indexed).
     :param user: Relationship to the user who gave the rating.
     :param photo: Relationship to the photo that received the rating.
 
     """
 
     __tablename__ = "ratings"
+    __table_args__ = (
+        UniqueConstraint("user_id", "photo_id", name="uq_ratings_user_id_photo_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"))
     rating: Mapped[int] = mapped_column(Integer)
-    photo_id: Mapped[int] = mapped_column(Integer, ForeignKey("photos.id"))
+    photo_id: Mapped[int] = mapped_column(Integer, ForeignKey("photos.id"), index=True)
 
     user: Mapped["User"] = relationship("User", back_populates="ratings")
     photo: Mapped[int] = relationship("Photo", back_populates="ratings")
@@ -200,7 +246,7 @@ class QR_code(Base):
 
     :param int id: The unique identifier for the QR code (primary key).
     :param str url: The URL or identifier of the QR code.
-    :param int photo_id: The ID of the associated photo (foreign key).
+    :param int photo_id: The ID of the associated photo (foreign key, indexed).
 
     **Example Usage:**
 
@@ -218,7 +264,7 @@ class QR_code(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     url: Mapped[str] = mapped_column(String(255), nullable=False)
 
-    photo_id: Mapped[int] = mapped_column(Integer, ForeignKey("photos.id"))
+    photo_id: Mapped[int] = mapped_column(Integer, ForeignKey("photos.id"), index=True)
     photo: Mapped["Photo"] = relationship("Photo", back_populates="QR")
 
 
@@ -227,9 +273,12 @@ class BlacklistToken(Base):
     BlacklistToken Model
 
     This model represents a blacklisted token in the system, which is used to prevent token reuse.
+    Tokens are stored as a fixed-width SHA-256 digest together with their expiration time,
+    so expired entries can be purged.
 
     :param int id: The unique identifier for the blacklisted token (primary key).
-    :param str token: The token string that has been blacklisted (unique and not nullable).
+    :param bytes token_digest: The SHA-256 digest of the blacklisted token (unique and not nullable).
+    :param datetime expires_at: The UTC expiration time of the token, after which the entry can be purged (indexed).
     :param datetime blacklisted_on: The date and time when the token was blacklisted (default is the current time).
 
     **Example Usage:**
@@ -237,7 +286,8 @@ class BlacklistToken(Base):
     .. code-block:: python
 
         blacklisted_token = BlacklistToken(
-            token="your_token_string_here"
+            token_digest=token_digest("your_token_string_here"),
+            expires_at=datetime(2023, 9, 30, 12, 0),
         )
 
     """
@@ -245,7 +295,10 @@ class BlacklistToken(Base):
     __tablename__ = "blacklist_tokens"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    token: Mapped[str] = mapped_column(String(500), unique=True, nullable=False)
+    token_digest: Mapped[bytes] = mapped_column(
+        LargeBinary(32), unique=True, nullable=False
+    )
+    expires_at: Mapped[date] = mapped_column(DateTime, nullable=False, index=True)
     blacklisted_on: Mapped[date] = mapped_column(DateTime, default=func.now())
 
 
@@ -284,8 +337,8 @@ class Comment(Base):
     :param str text: The text content of the comment (required).
     :param datetime created_at: The timestamp when the comment was created (automatically generated).
     :param datetime updated_at: The timestamp when the comment was last updated (automatically generated).
-    :param int user_id: The user identifier associated with the comment (foreign key to 'users.id').
-    :param int photo_id: The photo identifier associated with the comment (foreign key to 'photos.id', can be None).
+    :param int user_id: The user identifier associated with the comment (foreign key to 'users.id', indexed).
+    :param int photo_id: The photo identifier associated with the comment (foreign key to 'photos.id', can be None, indexed).
     :param bool update_status: A boolean flag indicating if the comment has been updated (default is False).
 
     :type user: User
@@ -311,9 +364,12 @@ class Comment(Base):
     updated_at: Mapped[date] = mapped_column(
         "updated_at", DateTime, default=func.now(), onupdate=func.now()
     )
-    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"))
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), index=True)
     photo_id: Mapped[int] = mapped_column(
-        "photo_id", ForeignKey("photos.id", ondelete="CASCADE"), default=None
+        "photo_id",
+        ForeignKey("photos.id", ondelete="CASCADE"),
+        default=None,
+        index=True,
     )
     update_status: Mapped[bool] = mapped_column(Boolean, default=False)
 
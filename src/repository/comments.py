@@ -1,12 +1,14 @@
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.models import Comment
+from src.database.models import Comment, Photo, User
+from src.repository.counters import add_to_counters
 
 
 async def create_comment(content: str, user: str, photos_id: int, db: AsyncSession):
     """
-    Creates a new comment and stores it in the database.
+    Creates a new comment and stores it in the database, counting it for
+    the user and the photo.
 
     :param content: str: Text of the comment.
     :param user: str: The user who left the comment.
@@ -19,6 +21,8 @@ async def create_comment(content: str, user: str, photos_id: int, db: AsyncSessi
     comment = Comment(text=content, user=user, photo_id=photos_id)
     try:
         db.add(comment)
+        await add_to_counters(User, user.id, db, comments_count=1)
+        await add_to_counters(Photo, photos_id, db, comments_count=1)
         await db.commit()
         await db.refresh(comment)
         return comment
@@ -44,9 +48,11 @@ async def get_comment(id: int, db: AsyncSession):
         return comment
 
 
-async def update_comment(text: str, id: int, db: AsyncSession):
+async def update_comment(
+    text: str, id: int, db: AsyncSession, user_id: int | None = None
+):
     """
-    Update a comment
+    Update a comment in a single UPDATE ... RETURNING statement.
 
     :param text: The text for updating the comment
     :type content: str
@@ -54,27 +60,30 @@ async def update_comment(text: str, id: int, db: AsyncSession):
     :type id: int
     :param db: The database session.
     :type db: AsyncSession
-    :return: The updated comment object.
-    :rtype: Comment
+    :param user_id: The ID of the author the comment must have, or None for any author.
+    :type user_id: int | None
+    :return: The updated comment object, or None if there is no such comment.
+    :rtype: Comment | None
     """
 
-    comment = await db.get(Comment, id)
-    if comment:
-        try:
-            comment.text = text
-            comment.update_status = True
-            await db.commit()
-            await db.refresh(comment)
-            return comment
-        except Exception as e:
-            await db.rollback()
-            raise e
-    return None
+    query = update(Comment).where(Comment.id == id)
+    if user_id is not None:
+        query = query.where(Comment.user_id == user_id)
+    try:
+        result = await db.execute(
+            query.values(text=text, update_status=True).returning(Comment)
+        )
+        comment = result.scalar_one_or_none()
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise e
+    return comment
 
 
 async def delete_comment(id: int, db: AsyncSession):
     """
-    Delete a comment
+    Delete a comment, and remove it from the counts of its user and photo.
 
     :param id: The ID of the comment to update
     :type comment_id: int
@@ -88,6 +97,9 @@ async def delete_comment(id: int, db: AsyncSession):
     if comment:
         try:
             await db.delete(comment)
+            await add_to_counters(User, comment.user_id, db, comments_count=-1)
+            if comment.photo_id is not None:
+                await add_to_counters(Photo, comment.photo_id, db, comments_count=-1)
             await db.commit()
             return comment
         except Exception as e:
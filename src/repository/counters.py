@@ -0,0 +1,128 @@
+from sqlalchemy import case, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import Base, Comment, Photo, Rating, User, follows
+
+
+async def add_to_counters(
+    model: type[Base], id: int, db: AsyncSession, **deltas: int
+) -> None:
+    """
+    Add to the denormalized counters of one row.
+
+    The counters are incremented in SQL, in the transaction of the write that
+    changes them, so concurrent writes never lose an update. The change is
+    committed together with the write.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        db.add(comment)
+        await add_to_counters(Photo, photo_id, db, comments_count=1)
+        await db.commit()
+
+    :param model: The model of the row: User or Photo.
+    :param int id: The ID of the row.
+    :param AsyncSession db: An asynchronous database session.
+    :param deltas: The amount added to each counter column.
+    :return: None
+    """
+
+    await db.execute(
+        update(model)
+        .where(model.id == id)
+        .values({name: getattr(model, name) + delta for name, delta in deltas.items()})
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def add_to_follow_counters(
+    follower_id: int, followed_id: int, delta: int, db: AsyncSession
+) -> None:
+    """
+    Add to the following counter of a follower and the followers counter of the followed user.
+
+    Both rows are updated by one statement, which locks them in ID order: two
+    users following each other at the same time never deadlock.
+
+    :param int follower_id: The ID of the follower.
+    :param int followed_id: The ID of the followed user.
+    :param int delta: 1 for a follow, -1 for an unfollow.
+    :param AsyncSession db: An asynchronous database session.
+    :return: None
+    """
+
+    await db.execute(
+        update(User)
+        .where(User.id.in_([follower_id, followed_id]))
+        .values(
+            following_count=User.following_count
+            + case((User.id == follower_id, delta), else_=0),
+            followers_count=User.followers_count
+            + case((User.id == followed_id, delta), else_=0),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def reconcile_counters(db: AsyncSession) -> int:
+    """
+    Recount the denormalized counters of users and photos, and correct the drifted ones.
+
+    Each table is corrected by one bulk UPDATE, which only rewrites the rows
+    whose counters differ from the recount.
+
+    :param AsyncSession db: An asynchronous database session.
+    :return: The number of corrected rows.
+    :rtype: int
+    """
+
+    user_counts = {
+        "photos_count": select(func.count())
+        .where(Photo.user_id == User.id)
+        .scalar_subquery(),
+        "comments_count": select(func.count())
+        .where(Comment.user_id == User.id)
+        .scalar_subquery(),
+        "followers_count": select(func.count())
+        .where(follows.c.followed_id == User.id)
+        .scalar_subquery(),
+        "following_count": select(func.count())
+        .where(follows.c.follower_id == User.id)
+        .scalar_subquery(),
+    }
+    photo_counts = {
+        "comments_count": select(func.count())
+        .where(Comment.photo_id == Photo.id)
+        .scalar_subquery(),
+        "ratings_count": select(func.count())
+        .where(Rating.photo_id == Photo.id)
+        .scalar_subquery(),
+        "ratings_sum": select(func.coalesce(func.sum(Rating.rating), 0))
+        .where(Rating.photo_id == Photo.id)
+        .scalar_subquery(),
+    }
+
+    corrected = 0
+    try:
+        for model, counts in ((User, user_counts), (Photo, photo_counts)):
+            result = await db.execute(
+                update(model)
+                .where(
+                    or_(
+                        *(
+                            getattr(model, name).is_distinct_from(count)
+                            for name, count in counts.items()
+                        )
+                    )
+                )
+                .values(counts)
+                .execution_options(synchronize_session=False)
+            )
+            corrected += result.rowcount
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise e
+    return corrected
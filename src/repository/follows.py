@@ -0,0 +1,207 @@
+from datetime import datetime
+
+from fastapi import HTTPException, status
+from sqlalchemy import Integer, delete, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.conf.messages import FOLLOW_YOURSELF, USER_NOT_FOUND
+from src.database.connect_db import dialect_insert
+from src.database.models import Photo, User, follows
+from src.repository.counters import add_to_follow_counters
+
+
+async def follow_user(follower: User, username: str, db: AsyncSession) -> int | None:
+    """
+    Make a user follow another one.
+
+    The follow is inserted by a single statement, which looks the followed user
+    up by username in SQL and skips an existing follow. The user is only
+    looked up again when nothing was inserted, to tell why.
+
+    :param follower: The user who follows.
+    :type follower: User
+    :param username: The username of the user to follow.
+    :type username: str
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The ID of the followed user, or None if they were already followed.
+    :rtype: int | None
+    :raises HTTPException 404: If there is no user with this username.
+    :raises HTTPException 400: If the user tries to follow themselves.
+    """
+
+    followed = select(literal(follower.id, Integer), User.id).where(
+        User.username == username, User.id != follower.id
+    )
+    try:
+        result = await db.execute(
+            dialect_insert(db)(follows)
+            .from_select(["follower_id", "followed_id"], followed)
+            .on_conflict_do_nothing(index_elements=["follower_id", "followed_id"])
+            .returning(follows.c.followed_id)
+        )
+        followed_id = result.scalar_one_or_none()
+        if followed_id is not None:
+            await add_to_follow_counters(follower.id, followed_id, 1, db)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+    if followed_id is None:
+        # Nothing was inserted, the user is looked up to tell why
+        result = await db.execute(select(User.id).where(User.username == username))
+        user_id = result.scalar_one_or_none()
+        if user_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=USER_NOT_FOUND
+            )
+        if user_id == follower.id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=FOLLOW_YOURSELF
+            )
+    return followed_id
+
+
+async def unfollow_user(follower: User, username: str, db: AsyncSession) -> int | None:
+    """
+    Make a user stop following another one.
+
+    :param follower: The user who follows.
+    :type follower: User
+    :param username: The username of the followed user.
+    :type username: str
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The ID of the unfollowed user, or None if they were not followed.
+    :rtype: int | None
+    """
+
+    followed_ids = select(User.id).where(User.username == username).scalar_subquery()
+    try:
+        result = await db.execute(
+            delete(follows)
+            .where(
+                follows.c.follower_id == follower.id,
+                follows.c.followed_id == followed_ids,
+            )
+            .returning(follows.c.followed_id)
+        )
+        followed_id = result.scalar_one_or_none()
+        if followed_id is not None:
+            await add_to_follow_counters(follower.id, followed_id, -1, db)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise e
+    return followed_id
+
+
+async def get_followers_count(user_id: int, db: AsyncSession) -> int:
+    """
+    Retrieve the number of followers of a user from its counter.
+
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The number of followers, 0 if the user does not exist.
+    :rtype: int
+    """
+
+    result = await db.execute(select(User.followers_count).where(User.id == user_id))
+    return result.scalar_one_or_none() or 0
+
+
+async def get_follower_ids(
+    user_id: int, after_id: int, limit: int, db: AsyncSession
+) -> list[int]:
+    """
+    Retrieve a batch of the followers of a user, in ID order.
+
+    Batches are paged by follower ID along the (followed_id, follower_id)
+    index, so each batch costs the same however many followers came before.
+
+    :param user_id: The ID of the followed user.
+    :type user_id: int
+    :param after_id: The ID of the last follower of the previous batch, or 0.
+    :type after_id: int
+    :param limit: The size of the batch.
+    :type limit: int
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The IDs of the followers.
+    :rtype: list[int]
+    """
+
+    result = await db.execute(
+        select(follows.c.follower_id)
+        .where(follows.c.followed_id == user_id, follows.c.follower_id > after_id)
+        .order_by(follows.c.follower_id)
+        .limit(limit)
+    )
+    return list(result.scalars())
+
+
+async def get_followed_celebrity_ids(
+    user_id: int, min_followers: int, db: AsyncSession
+) -> list[int]:
+    """
+    Retrieve the users followed by a user who have at least ``min_followers`` followers.
+
+    Their photos are not fanned out to the timelines of their followers, and are
+    read from the database along with the timeline instead.
+
+    :param user_id: The ID of the follower.
+    :type user_id: int
+    :param min_followers: The number of followers from which a user is a celebrity.
+    :type min_followers: int
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The IDs of the followed celebrities.
+    :rtype: list[int]
+    """
+
+    result = await db.execute(
+        select(User.id)
+        .join(follows, follows.c.followed_id == User.id)
+        .where(follows.c.follower_id == user_id, User.followers_count >= min_followers)
+    )
+    return list(result.scalars())
+
+
+async def get_recent_photos(
+    user_ids: list[int],
+    before: datetime | None,
+    limit: int,
+    db: AsyncSession,
+    since: datetime | None = None,
+) -> list:
+    """
+    Retrieve the most recent photos of some users.
+
+    :param user_ids: The IDs of the owners of the photos.
+    :type user_ids: list[int]
+    :param before: Only photos created before this time are returned, or None for the latest.
+    :type before: datetime | None
+    :param limit: The maximum number of photos.
+    :type limit: int
+    :param db: The database session.
+    :type db: AsyncSession
+    :param since: Only photos created at or after this time are returned, or None for all.
+    :type since: datetime | None
+    :return: The id and created_at rows of the photos, latest first.
+    :rtype: list
+    """
+
+    if not user_ids:
+        return []
+    query = select(Photo.id, Photo.created_at).where(Photo.user_id.in_(user_ids))
+    if before is not None:
+        query = query.where(Photo.created_at < before)
+    if since is not None:
+        query = query.where(Photo.created_at >= since)
+    result = await db.execute(
+        query.order_by(Photo.created_at.desc(), Photo.id.desc()).limit(limit)
+    )
+    return result.all()
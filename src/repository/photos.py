@@ -6,7 +6,7 @@ import uuid
 
 import cloudinary
 import cloudinary.uploader
-from sqlalchemy import select
+from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -15,7 +15,7 @@ from src.conf.config import init_cloudinary
 from src.database.models import User, Role, Rating, Photo, QR_code, Tag, Comment
 
 from src.services.photos import validate_crop_mode
-from src.repository import ratings as repository_rating
+from src.repository.counters import add_to_counters
 
 
 async def get_or_create_tag(tag_name: str, db: AsyncSession) -> Tag:
@@ -195,6 +195,7 @@ async def upload_photo(
     )
     try:
         db.add(new_photo)
+        await add_to_counters(User, current_user.id, db, photos_count=1)
         await db.commit()
         await db.refresh(new_photo)
     except Exception as e:
@@ -240,6 +241,76 @@ async def get_photos(skip: int, limit: int, db: AsyncSession) -> list[Photo]:
     return photos
 
 
+async def get_photos_by_ids(photo_ids: list[int], db: AsyncSession) -> list[Photo]:
+    """
+    Retrieve photos by their IDs, in the order of the IDs.
+
+    IDs of photos that no longer exist are skipped.
+
+    :param photo_ids: list[int]: The IDs of the photos, e.g. a page of a leaderboard
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The photos
+    """
+    if not photo_ids:
+        return []
+    result = await db.execute(select(Photo).where(Photo.id.in_(photo_ids)))
+    photos = {photo.id: photo for photo in result.scalars()}
+    return [photos[id] for id in photo_ids if id in photos]
+
+
+async def get_photo_ids_shown_with_user(user_id: int, db: AsyncSession) -> list[int]:
+    """
+    Retrieve the IDs of the photos whose cards show a user, i.e. owned or commented by the user.
+
+    :param user_id: int: The ID of the user
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The IDs of the photos
+    """
+    owned = select(Photo.id).where(Photo.user_id == user_id)
+    commented = select(Comment.photo_id).where(Comment.user_id == user_id)
+    result = await db.execute(owned.union(commented))
+    return list(result.scalars())
+
+
+SCORE_COLUMNS = (
+    Photo.id,
+    Photo.created_at,
+    Photo.ratings_count,
+    Photo.ratings_sum,
+    Photo.comments_count,
+)
+
+
+async def get_score_counters(photo_ids: list[int], db: AsyncSession) -> list:
+    """
+    Retrieve the counters the leaderboard scores of photos are computed from.
+
+    :param photo_ids: list[int]: The IDs of the photos
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The id, created_at, ratings_count, ratings_sum and comments_count rows
+    """
+    result = await db.execute(select(*SCORE_COLUMNS).where(Photo.id.in_(photo_ids)))
+    return result.all()
+
+
+async def get_score_counters_batch(after_id: int, limit: int, db: AsyncSession) -> list:
+    """
+    Retrieve the leaderboard score counters of the photos following an ID.
+
+    Photos are paged by primary key, so each batch is an index range scan
+    however far the rebuild has gone.
+
+    :param after_id: int: The ID of the last photo of the previous batch, or 0
+    :param limit: int: The size of the batch
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The id, created_at, ratings_count, ratings_sum and comments_count rows
+    """
+    result = await db.execute(
+        select(*SCORE_COLUMNS).where(Photo.id > after_id).order_by(Photo.id).limit(limit)
+    )
+    return result.all()
+
+
 async def get_photo_info(photo: Photo, db: AsyncSession):
     photo = await db.execute(
         select(Photo)
@@ -253,8 +324,6 @@ async def get_photo_info(photo: Photo, db: AsyncSession):
     )
     photo = photo.scalar_one()
 
-    ratings = await repository_rating.get_rating(photos_id=photo.id, db=db)
-
     formatted_created_at = photo.created_at.strftime("%Y-%m-%d %H:%M:%S")
 
     qr_code = await get_URL_QR(photo.id, db)
@@ -268,7 +337,9 @@ async def get_photo_info(photo: Photo, db: AsyncSession):
         "created_at": formatted_created_at,
         "comments": [comment for comment in photo.comments],
         "tags": [tag.name for tag in photo.tags],
-        "rating": ratings,
+        "rating": int(photo.avg_rating),
+        "comments_count": photo.comments_count,
+        "ratings_count": photo.ratings_count,
     }
 
 
@@ -293,33 +364,34 @@ async def update_photo(
     """
     Update the description of a photo owned by the current user.
 
+    The ownership check and the change are one UPDATE ... RETURNING statement.
+
     :param current_user: User: The user who owns the photo
     :param photo_id: int: The ID of the photo to be updated
     :param description: str: The new description for the photo
     :param db: AsyncSession: Pass the database session to the function
-    :return: A dictionary containing the updated photo's URL and description
+    :return: The updated photo, or None if the user owns no photo with this ID
     """
-    query_result = await db.execute(
-        select(Photo)
-        .where(Photo.user_id == current_user.id)
-        .where(Photo.id == photo_id)
-    )
-    photo = query_result.scalar()
-
-    if photo:
-        photo.description = description
-        try:
-            await db.commit()
-            await db.refresh(photo)
-            return photo
-        except Exception as e:
-            await db.rollback()
-            raise e
+    try:
+        result = await db.execute(
+            update(Photo)
+            .where(Photo.user_id == current_user.id)
+            .where(Photo.id == photo_id)
+            .values(description=description)
+            .returning(Photo)
+        )
+        photo = result.scalar_one_or_none()
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise e
+    return photo
 
 
 async def remove_photo(photo_id: int, user: User, db: AsyncSession) -> bool:
     """
-    Remove a photo from cloud storage and the database.
+    Remove a photo from cloud storage and the database, and remove it and its
+    comments from the counts of their users.
 
     :param photo_id: The ID of the photo to remove.
     :type photo_id: int
@@ -344,6 +416,15 @@ async def remove_photo(photo_id: int, user: User, db: AsyncSession) -> bool:
         cloudinary.uploader.destroy(photo.cloud_public_id)
 
         try:
+            # Uncounting the comments deleted with the photo
+            commenters = await db.execute(
+                select(Comment.user_id, func.count())
+                .where(Comment.photo_id == photo_id)
+                .group_by(Comment.user_id)
+            )
+            for user_id, comments in commenters.all():
+                await add_to_counters(User, user_id, db, comments_count=-comments)
+            await add_to_counters(User, photo.user_id, db, photos_count=-1)
             # Deleting linked ratings
             await db.execute(
                 Rating.__table__.delete().where(Rating.photo_id == photo_id)
@@ -1,15 +1,66 @@
-from sqlalchemy import select
+from sqlalchemy import Integer, bindparam, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 
 from src.conf.messages import YOUR_PHOTO, ALREADY_LIKE, NO_PHOTO_BY_ID
+from src.database.connect_db import dialect_insert
 from src.database.models import User, Rating, Photo
+from src.repository.counters import add_to_counters
+
+
+def insert_votes(db: AsyncSession):
+    """
+    Build the INSERT of rating votes given as ``rating``, ``user_id`` and
+    ``photo_id`` parameters.
+
+    The vote is selected from its photo, so a vote on a missing photo or on the
+    voter's own photo inserts nothing, and a second vote of a user on a photo is
+    skipped by the unique (user_id, photo_id) constraint. The statement can be
+    executed with a list of votes to insert them in bulk.
+
+    :param db: The database session, whose dialect renders the ON CONFLICT clause.
+    :type db: AsyncSession
+    :return: The INSERT ... SELECT ... ON CONFLICT DO NOTHING statement.
+    :rtype: Insert
+    """
+
+    insert = dialect_insert(db)
+    user_id = bindparam("user_id", type_=Integer)
+    vote = select(
+        bindparam("rating", type_=Integer), user_id, Photo.id
+    ).where(Photo.id == bindparam("photo_id", type_=Integer), Photo.user_id != user_id)
+    return (
+        insert(Rating.__table__)
+        .from_select(["rating", "user_id", "photo_id"], vote)
+        .on_conflict_do_nothing(index_elements=["user_id", "photo_id"])
+    )
+
+
+def check_rating_value(rating: int) -> None:
+    """
+    Check that a rating is in the range (0; 5].
+
+    :param rating: The rating value.
+    :type rating: int
+    :raises HTTPException 400: If the rating is out of range.
+    """
+
+    if not 0 < rating <= 5:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Rating must be in range (0; 5]",
+        )
 
 
 async def create_rating(rating: int, photos_id: int, user: User, db: AsyncSession):
     """
     Create a new rating for a photo in the database.
 
+    The rating is inserted by a single statement, which checks in SQL that the
+    photo exists, that it is not the user's own photo and that the user has not
+    rated it yet. The photo is only looked up when nothing was inserted, to tell
+    why.
+
     :param rating: The rating value.
     :type rating: str
     :param photos_id: The ID of the photo to rate.
@@ -22,51 +73,136 @@ async def create_rating(rating: int, photos_id: int, user: User, db: AsyncSessio
     :rtype: Rating
     """
 
-    if not 0 < rating <= 5:
+    check_rating_value(rating)
+
+    try:
+        result = await db.execute(
+            insert_votes(db).returning(Rating.__table__.c.id),
+            {"rating": rating, "user_id": user.id, "photo_id": photos_id},
+        )
+        rating_id = result.scalar_one_or_none()
+        if rating_id is not None:
+            await add_to_counters(
+                Photo, photos_id, db, ratings_count=1, ratings_sum=rating
+            )
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+    if rating_id is None:
+        # Nothing was inserted, the photo is looked up to tell why
+        result = await db.execute(select(Photo.user_id).filter(Photo.id == photos_id))
+        owner_id = result.scalar_one_or_none()
+        if owner_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=NO_PHOTO_BY_ID
+            )
+        if owner_id == user.id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=YOUR_PHOTO
+            )
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Rating must be in range (0; 5]",
+            status_code=status.HTTP_400_BAD_REQUEST, detail=ALREADY_LIKE
         )
 
-    query = select(Photo).filter(Photo.id == photos_id)
+    return Rating(id=rating_id, rating=rating, user_id=user.id, photo_id=photos_id)
 
-    result = await db.execute(query)
-    photo = result.scalar_one_or_none()
 
-    if photo is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail=NO_PHOTO_BY_ID
-        )
+async def check_vote(photos_id: int, user: User, db: AsyncSession) -> None:
+    """
+    Check that a user may rate a photo, without inserting the rating.
 
-    if photo.user_id == user.id:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=YOUR_PHOTO)
+    The photo owner and the user's stored rating of the photo are read by a
+    single statement, so a vote buffered in write-behind mode is refused with
+    the same errors as one inserted by :func:`create_rating`.
 
-    query = select(Rating).filter(
-        Rating.user_id == user.id,
-        Rating.photo_id == photos_id,
-    )
-    result = await db.execute(query)
-    exsist_photo = result.scalar_one_or_none()
+    :param photos_id: The ID of the photo to rate.
+    :type photos_id: int
+    :param user: The user who is rating the photo.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :raises HTTPException 404: If the photo does not exist.
+    :raises HTTPException 400: If it is the user's own photo or the user has
+        already rated it.
+    """
 
-    if exsist_photo is not None:
+    result = await db.execute(
+        select(Photo.user_id, Rating.id)
+        .outerjoin(
+            Rating, (Rating.photo_id == Photo.id) & (Rating.user_id == user.id)
+        )
+        .filter(Photo.id == photos_id)
+    )
+    vote = result.one_or_none()
+    if vote is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=NO_PHOTO_BY_ID
+        )
+    owner_id, rating_id = vote
+    if owner_id == user.id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=YOUR_PHOTO
+        )
+    if rating_id is not None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=ALREADY_LIKE
         )
 
-    new_rating = Rating(rating=rating, user_id=user.id, photo_id=photos_id)
+
+async def insert_ratings(votes: list[dict], db: AsyncSession) -> set[int]:
+    """
+    Insert rating votes in bulk.
+
+    Invalid votes (missing photo, own photo, already rated) are skipped. The
+    rating counters of the voted photos are then recounted, so flushing the same
+    votes twice leaves them exact.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        votes = [{"rating": 5, "user_id": 2, "photo_id": 1}]
+        photo_ids = await insert_ratings(votes, db)
+
+    :param votes: The votes, as ``rating``, ``user_id`` and ``photo_id`` dicts.
+    :type votes: list[dict]
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The IDs of the voted photos.
+    :rtype: set[int]
+    """
+
+    photo_ids = {vote["photo_id"] for vote in votes}
+    if not votes:
+        return photo_ids
+
     try:
-        await db.add(new_rating)
+        await db.execute(insert_votes(db), votes)
+        await db.execute(
+            update(Photo)
+            .where(Photo.id.in_(photo_ids))
+            .values(
+                ratings_count=select(func.count())
+                .where(Rating.photo_id == Photo.id)
+                .scalar_subquery(),
+                ratings_sum=select(func.coalesce(func.sum(Rating.rating), 0))
+                .where(Rating.photo_id == Photo.id)
+                .scalar_subquery(),
+            )
+            .execution_options(synchronize_session=False)
+        )
         await db.commit()
-        await db.refresh(new_rating)
     except Exception as e:
+        await db.rollback()
         raise e
-
-    return new_rating
+    return photo_ids
 
 
 async def get_rating(photos_id: int, db: AsyncSession):
     """
-    Calculate and retrieve the average rating for a photo.
+    Retrieve the average rating for a photo, from its rating counters.
 
     :param photos_id: The ID of the photo for which to calculate the rating.
     :type photos_id: str
@@ -75,18 +211,16 @@ async def get_rating(photos_id: int, db: AsyncSession):
     :return: The average rating for the photo.
     :rtype: float
     """
-    query = select(Rating).filter(Rating.photo_id == photos_id)
+    query = select(Photo.ratings_count, Photo.ratings_sum).filter(
+        Photo.id == photos_id
+    )
 
     result = await db.execute(query)
-    all_ratings = result.scalars().all()
-    count_ratings = len(all_ratings)
-    if count_ratings == 0:
+    counters = result.one_or_none()
+    if counters is None or not counters.ratings_count:
         return 0
-    res = 0
-    for i in all_ratings:
-        res += i.rating
 
-    average_rating = res / count_ratings
+    average_rating = counters.ratings_sum / counters.ratings_count
 
     return int(average_rating)
 
@@ -133,6 +267,13 @@ async def delete_all_ratings(photos_id: int, user_id: int, db: AsyncSession):
     if rating_to_delete:
         try:
             await db.delete(rating_to_delete)
+            await add_to_counters(
+                Photo,
+                photos_id,
+                db,
+                ratings_count=-1,
+                ratings_sum=-rating_to_delete.rating,
+            )
             await db.commit()
             return {"message": "Rating delete"}
         except Exception as e:
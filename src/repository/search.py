@@ -1,6 +1,6 @@
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, time, timedelta
 
-from sqlalchemy import select, and_, cast, Date
+from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -12,6 +12,27 @@ from src.database.models import (
 )
 
 
+def created_between(start_data: date, end_data: date) -> tuple:
+    """
+    Filter photos created within a date range, both days included.
+
+    The bounds are compared with ``created_at`` itself rather than with its date,
+    so the index on ``photos.created_at`` serves the range.
+
+    :param start_data: The first day of the range.
+    :type start_data: Date
+    :param end_data: The last day of the range.
+    :type end_data: Date
+    :return: The conditions of the range.
+    :rtype: tuple
+    """
+
+    return (
+        Photo.created_at >= datetime.combine(start_data, time.min),
+        Photo.created_at < datetime.combine(end_data + timedelta(days=1), time.min),
+    )
+
+
 async def search_by_tag(
     tag: str,
     rating_low: float,
@@ -54,10 +75,7 @@ async def search_by_tag(
         start_data != datetime.now().date() - timedelta(days=365 * 60)
         or end_data != datetime.now().date()
     ):
-        query = query.filter(
-            cast(Photo.created_at, Date) >= start_data,
-            cast(Photo.created_at, Date) <= end_data,
-        )
+        query = query.filter(*created_between(start_data, end_data))
     photos_with_tag = await db.execute(query)
     photos = photos_with_tag.scalars().all()
     return photos
@@ -102,10 +120,7 @@ async def search_by_description(
         start_data != (datetime.now().date() - timedelta(days=365 * 60))
         or end_data != datetime.now().date()
     ):
-        query = query.filter(
-            cast(Photo.created_at, Date) >= start_data,
-            cast(Photo.created_at, Date) <= end_data,
-        )
+        query = query.filter(*created_between(start_data, end_data))
 
     photos_by_description = await db.execute(query)
     photos = photos_by_description.scalars().all()
@@ -185,10 +200,7 @@ async def search_admin(
         start_data != (datetime.now().date() - timedelta(days=365 * 60))
         or end_data != datetime.now().date()
     ):
-        query = query.filter(
-            cast(Photo.created_at, Date) >= start_data,
-            cast(Photo.created_at, Date) <= end_data,
-        )
+        query = query.filter(*created_between(start_data, end_data))
 
     photos_by_user = await db.execute(query)
     photos = photos_by_user.scalars().all()
@@ -1,27 +1,36 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
+from jose import JWTError, jwt
 from libgravatar import Gravatar
 import cloudinary
 import cloudinary.uploader
-from sqlalchemy import func, select
+from sqlalchemy import delete, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.exc import NoResultFound
 
 from src.conf.config import init_cloudinary
-from src.database.models import User, Role, BlacklistToken, Photo, Comment
+from src.conf.constants import TOKEN_LIFE_TIME, BLACKLIST_PURGE_BATCH_SIZE
+from src.database.models import User, Role, BlacklistToken
 from src.schemas import UserSchema, UserProfileSchema
+from src.services.token_cache import token_digest
 
 
 async def create_user(body: UserSchema, db: AsyncSession) -> User:
     """
     Create a new user in the database.
 
+    The first registered user becomes an administrator. Whether the table is empty is
+    checked with a single EXISTS probe, so the cost of signup does not depend on the
+    number of users. Uniqueness of the email and username is enforced by the unique
+    constraints of the table.
+
     :param body: The user data.
     :type body: UserSchema
     :param db: The database session.
     :type db: AsyncSession
     :return: The created user object.
     :rtype: User
+    :raises IntegrityError: If a user with the same email or username already exists.
     """
     try:
         g = Gravatar(body.email)
@@ -32,10 +41,10 @@ async def create_user(body: UserSchema, db: AsyncSession) -> User:
     new_user = User(**body.model_dump())
     new_user.role = Role.user
 
-    users_result = await db.execute(select(User))
-    users_count = len(users_result.scalars().all())
+    users_result = await db.execute(select(select(User.id).exists()))
+    has_users = users_result.scalar()
 
-    if not users_count:
+    if not has_users:
         new_user.role = Role.admin
 
     try:
@@ -48,6 +57,32 @@ async def create_user(body: UserSchema, db: AsyncSession) -> User:
         raise e
 
 
+async def check_credentials_taken(
+    email: str, username: str, db: AsyncSession
+) -> tuple[bool, bool]:
+    """
+    Check whether an email or a username is already registered.
+
+    Both values are checked with one query that returns at most two rows.
+
+    :param str email: The email to check.
+    :param str username: The username to check.
+    :param AsyncSession db: An asynchronous database session.
+    :return: Whether the email is taken and whether the username is taken.
+    :rtype: tuple[bool, bool]
+    """
+
+    result = await db.execute(
+        select(User.email, User.username)
+        .filter(or_(User.email == email, User.username == username))
+        .limit(2)
+    )
+    rows = result.all()
+    email_taken = any(row.email == email for row in rows)
+    username_taken = any(row.username == username for row in rows)
+    return email_taken, username_taken
+
+
 async def edit_my_profile(
     file, new_description, new_username, user: User, db: AsyncSession
 ) -> User:
@@ -118,16 +153,6 @@ async def get_user_profile(username: str, db: AsyncSession) -> User:
     user = result.scalar_one_or_none()
 
     if user:
-        # Count number of photos of user with username
-        photos_query = select(func.count()).where(Photo.user_id == user.id)
-        photos_result = await db.execute(photos_query)
-        photos_count = photos_result.scalar()
-
-        # Count number of comments  of user with username
-        comments_query = select(func.count()).where(Comment.user_id == user.id)
-        comments_result = await db.execute(comments_query)
-        comments_count = comments_result.scalar()
-
         user_profile = UserProfileSchema(
             id=user.id,
             role=user.role,
@@ -136,8 +161,10 @@ async def get_user_profile(username: str, db: AsyncSession) -> User:
             avatar=user.avatar,
             created_at=user.created_at.strftime("%Y-%m-%d %H:%M:%S"),
             is_active=user.is_active,
-            photos_count=photos_count,
-            comments_count=comments_count,
+            photos_count=user.photos_count,
+            comments_count=user.comments_count,
+            followers_count=user.followers_count,
+            following_count=user.following_count,
         )
         return user_profile
     return None
@@ -159,28 +186,6 @@ async def get_user_by_email(email: str, db: AsyncSession) -> User:
         return None
 
 
-async def get_user_by_reset_token(reset_token: str, db: AsyncSession) -> User | None:
-    """
-    Retrieve a user by their reset token.
-
-    This function queries the database to retrieve a user based on their reset token.
-
-    :param reset_token: str: The reset token associated with the user.
-    :param db: AsyncSession: The asynchronous database session.
-    :return: The user if found, or None if not found.
-    :rtype: User | None
-    """
-
-    try:
-        result = await db.execute(
-            select(User).filter(User.refresh_token == reset_token)
-        )
-        user = result.scalar_one_or_none()
-        return user
-    except NoResultFound:
-        return None
-
-
 async def get_user_by_user_id(user_id: int, db: AsyncSession) -> User | None:
     """
     Get User by User ID
@@ -217,79 +222,103 @@ async def get_user_by_username(username: str, db: AsyncSession) -> User | None:
         return None
 
 
-async def update_token(user: User, token: str | None, db: AsyncSession) -> None:
+async def update_user_by_email(
+    email: str, db: AsyncSession, *conditions, **values
+) -> bool:
     """
-    The update_token function updates the refresh token for a user.
+    Update the user with an email, if it matches the conditions.
+
+    The check and the change are one UPDATE ... RETURNING statement, so the
+    user is neither loaded first nor refreshed afterwards, and concurrent
+    requests cannot both pass the check.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        banned = await update_user_by_email(
+            email, db, User.is_active.is_(True), is_active=False
+        )
 
-    :param user: User: Identify the user that is being updated
-    :param token: str | None: Store the token in the database
-    :param db: Session: Create a database session
-    :return: None, but the return type is specified as str | none
+    :param str email: The email of the user.
+    :param AsyncSession db: An asynchronous database session.
+    :param conditions: The conditions the user must match.
+    :param values: The new values of the columns.
+    :return: Whether the user was updated.
+    :rtype: bool
     """
-    user.refresh_token = token
+
     try:
+        result = await db.execute(
+            update(User)
+            .where(User.email == email, *conditions)
+            .values(**values)
+            .returning(User.id)
+            .execution_options(synchronize_session=False)
+        )
+        updated = result.scalar_one_or_none() is not None
         await db.commit()
     except Exception as e:
         await db.rollback()
         raise e
+    return updated
 
 
-async def confirm_email(email: str, db: AsyncSession) -> None:
+async def confirm_email(email: str, db: AsyncSession) -> bool:
     """
     The confirmed_email function sets the confirmed field of a user to True.
 
     :param email: str: Get the email of the user that is trying to confirm their account
     :param db: Session: Pass the database session to the function
-    :return: None
+    :return: Whether the email was confirmed, False if there is no such user or it was already confirmed
     """
-    user = await get_user_by_email(email, db)
-    user.confirmed = True
-    try:
-        await db.commit()
-    except Exception as e:
-        await db.rollback()
-        raise e
+
+    return await update_user_by_email(
+        email, db, User.confirmed.is_not(True), confirmed=True
+    )
 
 
-async def ban_user(email: str, db: AsyncSession) -> None:
+async def ban_user(
+    email: str, db: AsyncSession, except_user_id: int | None = None
+) -> bool:
     """
     The ban_user function takes in an email and a database session.
-    It then finds the user with that email, sets their is_active field to False,
+    It then sets the is_active field of the active user with that email to False,
     and commits the change to the database.
 
     :param email: str: Identify the user to be banned
     :param db: Session: Pass in the database session
-    :return: None, because we don't need to return anything
+    :param except_user_id: int | None: The ID of a user who must not be banned, e.g. the administrator banning
+    :return: Whether the user was banned, False if there is no such active user
     """
-    user = await get_user_by_email(email, db)
-    user.is_active = False
-    try:
-        await db.commit()
-    except Exception as e:
-        await db.rollback()
-        raise e
+
+    conditions = [User.is_active.is_(True)]
+    if except_user_id is not None:
+        conditions.append(User.id != except_user_id)
+    return await update_user_by_email(email, db, *conditions, is_active=False)
 
 
-async def activate_user(email: str, db: AsyncSession) -> None:
+async def activate_user(
+    email: str, db: AsyncSession, except_user_id: int | None = None
+) -> bool:
     """
     Activates a user account by setting their 'is_active' status to True.
 
     :param str email: The email address of the user to activate.
     :param AsyncSession db: The asynchronous database session.
+    :param int | None except_user_id: The ID of a user who must not be activated, e.g. the administrator activating.
 
-    :return: None
-    :rtype: None
+    :return: Whether the user was activated, False if there is no such inactive user.
+    :rtype: bool
     """
-    user = await get_user_by_email(email, db)
-    user.is_active = True
-    try:
-        await db.commit()
-    except Exception as e:
-        await db.rollback()
-        raise e
+
+    conditions = [User.is_active.is_not(True)]
+    if except_user_id is not None:
+        conditions.append(User.id != except_user_id)
+    return await update_user_by_email(email, db, *conditions, is_active=True)
 
 
-async def make_user_role(email: str, role: Role, db: AsyncSession) -> None:
+async def make_user_role(email: str, role: Role, db: AsyncSession) -> bool:
     """
     The make_user_role function takes in an email and a role, and then updates the user's role to that new one.
     Args:
@@ -299,30 +328,54 @@ async def make_user_role(email: str, role: Role, db: AsyncSession) -> None:
     :param email: str: Get the user by email
     :param role: Role: Set the role of the user
     :param db: Session: Pass the database session to the function
-    :return: None
+    :return: Whether the role was changed, False if there is no such user or it already has the role
     """
-    
-    user = await get_user_by_email(email, db)
-    user.role = role
-    try:
-        await db.commit()
-    except Exception as e:
-        await db.rollback()
-        raise e
+
+    return await update_user_by_email(
+        email, db, User.role.is_distinct_from(role), role=role
+    )
 
 
 #### BLACKLIST #####
 
 
+def get_token_expiration(token: str) -> datetime:
+    """
+    Get the UTC expiration time of a token.
+
+    The signature is not verified here: the expiration time is only used to decide
+    when a blacklist entry can be purged. Tokens without a readable ``exp`` claim
+    are kept for the lifetime of an access token.
+
+    :param str token: The encoded JWT.
+    :return: The expiration time of the token.
+    :rtype: datetime
+    """
+
+    try:
+        exp = jwt.get_unverified_claims(token).get("exp")
+    except JWTError:
+        exp = None
+    if exp is None:
+        return datetime.utcnow() + timedelta(minutes=TOKEN_LIFE_TIME)
+    return datetime.utcfromtimestamp(exp)
+
+
 async def add_to_blacklist(token: str, db: AsyncSession) -> None:
     """
     **Adds a token to the blacklist.**
 
+    Only the digest of the token and its expiration time are stored.
+
     :param token: str: Pass the token to be blacklisted
     :param db: AsyncSession: Create a new session with the database
     :return: None
     """
-    blacklist_token = BlacklistToken(token=token, blacklisted_on=datetime.now())
+    blacklist_token = BlacklistToken(
+        token_digest=token_digest(token),
+        expires_at=get_token_expiration(token),
+        blacklisted_on=datetime.now(),
+    )
 
     try:
         db.add(blacklist_token)
@@ -344,13 +397,51 @@ async def is_blacklisted_token(token: str, db: AsyncSession) -> bool:
     :return: True if the token is blacklisted, False otherwise.
     :rtype: bool
     """
-    
+
     result = await db.execute(
-        select(BlacklistToken).filter(BlacklistToken.token == token)
+        select(BlacklistToken.id)
+        .filter(BlacklistToken.token_digest == token_digest(token))
+        .limit(1)
     )
 
-    blacklist_token = result.scalar_one_or_none()
+    return result.scalar_one_or_none() is not None
+
+
+async def purge_expired_blacklist(
+    db: AsyncSession, batch_size: int = BLACKLIST_PURGE_BATCH_SIZE
+) -> int:
+    """
+    Delete blacklisted tokens that have already expired.
+
+    Rows are deleted in chunks of ``batch_size``, each in its own short transaction,
+    so the purge never holds locks on a large part of the table. Rows locked by a
+    concurrent purge are skipped.
 
-    if blacklist_token:
-        return True
-    return False
+    :param AsyncSession db: An asynchronous database session.
+    :param int batch_size: The maximum number of rows deleted per transaction.
+    :return: The number of deleted rows.
+    :rtype: int
+    """
+
+    deleted = 0
+    while True:
+        expired = (
+            select(BlacklistToken.id)
+            .filter(BlacklistToken.expires_at < datetime.utcnow())
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        try:
+            result = await db.execute(
+                delete(BlacklistToken)
+                .where(BlacklistToken.id.in_(expired.scalar_subquery()))
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            raise e
+
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
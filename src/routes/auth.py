@@ -6,10 +6,10 @@ from fastapi import (
     Depends,
     status,
     Security,
-    BackgroundTasks,
     Request,
 )
 
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import (
     OAuth2PasswordRequestForm,
     HTTPAuthorizationCredentials,
@@ -17,8 +17,13 @@ from fastapi.security import (
 )
 
 
+### Import from JOSE ###
+
+from jose import JWTError
+
 ### Import from SQLAlchemy ###
 
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 ### Import from Pydentic ###
@@ -29,6 +34,7 @@ from pydantic import EmailStr
 
 
 from src.conf.messages import (
+    ALREADY_EXISTS,
     ALREADY_EXISTS_EMAIL,
     ALREADY_EXISTS_USERNAME,
     EMAIL_ALREADY_CONFIRMED,
@@ -66,6 +72,7 @@ from src.schemas import (
 
 from src.services.email import send_email, reset_password_by_email
 from src.services.auth import auth_service
+from src.services.refresh_tokens import refresh_token_store
 
 ### Import from Repository ###
 
@@ -84,7 +91,6 @@ security = HTTPBearer()
 )
 async def signup(
     body: UserSchema,
-    background_tasks: BackgroundTasks,
     request: Request,
     db: AsyncSession = Depends(get_db),
 ):
@@ -100,8 +106,6 @@ async def signup(
 
     :param body: UserSchema: New user data.
 
-    :param background_tasks: BackgroundTasks: Tasks to be performed in the background.
-
     :param request: Request: Inquiry.
 
     :param session: AsyncSession: Database Session.
@@ -112,8 +116,9 @@ async def signup(
 
     """
 
-    exist_user_email = await repository_users.get_user_by_email(body.email, db)
-    exist_user_username = await repository_users.get_user_by_username(body.username, db)
+    exist_user_email, exist_user_username = await repository_users.check_credentials_taken(
+        body.email, body.username, db
+    )
 
     if exist_user_email:
         raise HTTPException(
@@ -125,11 +130,13 @@ async def signup(
             status_code=status.HTTP_409_CONFLICT, detail=ALREADY_EXISTS_USERNAME
         )
 
-    body.password = auth_service.get_password_hash(body.password)
-    new_user = await repository_users.create_user(body, db)
-    background_tasks.add_task(
-        send_email, new_user.email, new_user.username, request.base_url
-    )
+    body.password = await run_in_threadpool(auth_service.get_password_hash, body.password)
+    try:
+        new_user = await repository_users.create_user(body, db)
+    except IntegrityError:
+        # A concurrent signup took the email or username after the check above
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=ALREADY_EXISTS)
+    await send_email(new_user.email, new_user.username, request.base_url)
     return {"user": new_user, "detail": SUCCESS_CREATE_USER}
 
 
@@ -175,7 +182,9 @@ async def login(
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail=USER_NOT_ACTIVE
         )
-    if not auth_service.verify_password(body.password, user.password):
+    if not await run_in_threadpool(
+        auth_service.verify_password, body.password, user.password
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_PASSWORD
         )
@@ -184,8 +193,7 @@ async def login(
     access_token = await auth_service.create_access_token(
         data={"email": user.email}, expires_delta=TOKEN_LIFE_TIME
     )
-    refresh_token = await auth_service.create_refresh_token(data={"email": user.email})
-    await repository_users.update_token(user, refresh_token, db)
+    refresh_token = await refresh_token_store.issue(user.email)
 
     # response.set_cookie(key=COOKIE_KEY_NAME, value=access_token, httponly=True)
 
@@ -204,6 +212,7 @@ async def logout(
     **Log out user and add the token to the blacklist.**
 
     This route allows the user to log out and their access token will be added to the blacklist.
+    All refresh tokens of the user are revoked.
 
     Level of Access:
 
@@ -222,7 +231,15 @@ async def logout(
 
     token = credentials.credentials
 
+    try:
+        email = auth_service.decode_access_token(token).get("email")
+    except JWTError:
+        email = None
+
     await repository_users.add_to_blacklist(token, db)
+    auth_service.forget_token(token)
+    if email:
+        await refresh_token_store.revoke(email)
     return {"message": USER_IS_LOGOUT}
 
 
@@ -230,42 +247,44 @@ async def logout(
 async def refresh_token(
     credentials: HTTPAuthorizationCredentials = Security(security),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(auth_service.get_authenticated_user),
 ):
     """
     Updates the user's access token.
 
-    This route allows the user's access token to be refreshed if a valid refresh token is present.
+    This route exchanges a valid refresh token for a new access token and the next refresh token of the same rotation family.
+    Each refresh token can be used only once: reusing an already rotated token revokes the whole family.
+    The refresh tokens of deleted or banned users are revoked.
 
     Level of Access:
 
-    - Current authorized user
+    - Owner of a valid refresh token
 
-    :param credentials: HTTPAuthorizationCredentials: User authentication data (access token).
-
-    :param db: AsyncSession: Database session.
+    :param credentials: HTTPAuthorizationCredentials: User authentication data (refresh token).
 
-    :param current_user: User: Current authenticated user.
+    :param db: AsyncSession: Database Session.
 
     :return: New access tokens (access_token and refresh_token).
 
     :rtype: TokenSchema
 
-    :raises: HTTPException with code 401 and detail "INVALID_TOKEN" in case of invalid access token.
+    :raises: HTTPException with code 401 and detail "INVALID_TOKEN" in case of invalid, revoked or reused refresh token or deleted user, and with code 403 and detail "USER_NOT_ACTIVE" for a banned user.
     """
 
     token = credentials.credentials
-    email = await auth_service.decode_token(token)
+    email, refresh_token = await refresh_token_store.rotate(token)
+
     user = await repository_users.get_user_by_email(email, db)
-    if user.refresh_token != token:
-        await repository_users.update_token(user, None, db)
+    if user is None or not user.is_active:
+        await refresh_token_store.revoke(email)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
+            )
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
+            status_code=status.HTTP_403_FORBIDDEN, detail=USER_NOT_ACTIVE
         )
 
     access_token = await auth_service.create_access_token(data={"email": email})
-    refresh_token = await auth_service.create_refresh_token(data={"email": email})
-    await repository_users.update_token(user, refresh_token, db)
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
@@ -296,21 +315,21 @@ async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
     """
 
     email = await auth_service.get_email_from_token(token)
+    if await repository_users.confirm_email(email, db):
+        return {"message": EMAIL_CONFIRMED}
+
+    # Nothing was updated, the user is looked up to tell why
     user = await repository_users.get_user_by_email(email, db)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=VERIFICATION_ERROR
         )
-    if user.confirmed:
-        return {"message": EMAIL_ALREADY_CONFIRMED}
-    await repository_users.confirm_email(email, db)
-    return {"message": EMAIL_CONFIRMED}
+    return {"message": EMAIL_ALREADY_CONFIRMED}
 
 
 @router.post("/request_email", response_model=MessageResponseSchema)
 async def request_email(
     body: RequestEmail,
-    background_tasks: BackgroundTasks,
     request: Request,
     db: AsyncSession = Depends(get_db),
 ):
@@ -326,8 +345,6 @@ async def request_email(
 
     :param body: RequestEmail: Form with user's email.
 
-    :param background_tasks: BackgroundTasks: Tasks that are running in the background (sending an email).
-
     :param request: Request: Client request.
 
     :param db: AsyncSession: Database session.
@@ -345,16 +362,13 @@ async def request_email(
         return {"message": EMAIL_CONFIRMED}
 
     if user:
-        background_tasks.add_task(
-            send_email, user.email, user.username, request.base_url
-        )
+        await send_email(user.email, user.username, request.base_url)
     return {"message": CHECK_YOUR_EMAIL}
 
 
 @router.post("/forgot_password", response_model=MessageResponseSchema)
 async def forgot_password(
     email: EmailStr,
-    background_tasks: BackgroundTasks,
     request: Request,
     db: AsyncSession = Depends(get_db),
 ):
@@ -370,8 +384,6 @@ async def forgot_password(
 
     :param email: EmailStr: Email of the user for whom password recovery is requested.
 
-    :param background_tasks: BackgroundTasks: Tasks that are executed in the background (sending an email with instructions).
-
     :param request: Request: Client request.
 
     :param db: AsyncSession: Database session.
@@ -392,9 +404,7 @@ async def forgot_password(
     data = {"email": email}
     reset_token = auth_service.create_email_token(data)
 
-    background_tasks.add_task(
-        reset_password_by_email, email, user.username, reset_token, request.base_url
-    )
+    await reset_password_by_email(email, user.username, reset_token, request.base_url)
 
     return {"message": EMAIL_HAS_BEEN_SEND}
 
@@ -411,6 +421,7 @@ async def reset_password(
     - Any user
 
     This route allows the user to reset their password by providing the correct reset token and a new password.
+    All refresh tokens of the user are revoked.
 
     :param reset_token: str: Password reset token.
 
@@ -428,11 +439,13 @@ async def reset_password(
     email = await auth_service.get_email_from_token(reset_token)
 
     user = await repository_users.get_user_by_email(email, db)
-    user.password = auth_service.get_password_hash(new_password)
+    user.password = await run_in_threadpool(auth_service.get_password_hash, new_password)
 
     try:
         await db.commit()
-        return {"message": PASWORD_RESET_SUCCESS}
     except Exception as e:
         await db.rollback()
         raise e
+
+    await refresh_token_store.revoke(email)
+    return {"message": PASWORD_RESET_SUCCESS}
@@ -4,9 +4,12 @@ from fastapi_limiter.depends import RateLimiter
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.conf.messages import DELETE_SUCCESSFUL, TOO_MANY_REQUESTS
-from src.database.connect_db import get_db
+from src.database.connect_db import get_db, get_read_db
 from src.database.models import User, Role
 from src.services.auth import auth_service
+from src.services.leaderboards import photo_leaderboards
+from src.services.photo_fragments import photo_fragments
+from src.services.photo_rooms import photo_rooms, photo_room, comment_event
 
 
 router = APIRouter(prefix="/comments", tags=["Comments"])
@@ -21,7 +24,7 @@ router = APIRouter(prefix="/comments", tags=["Comments"])
 async def post_comment(
     photo_id: int = Form(...),
     text: str = Form(...),
-    current_user: User = Depends(auth_service.get_authenticated_user),
+    current_user: User = Depends(auth_service.get_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -45,6 +48,13 @@ async def post_comment(
     comment = await reposytory_comments.create_comment(text, current_user, photo_id, db)
 
     if comment:
+        await photo_fragments.bump(photo_id)
+        await photo_leaderboards.refresh([photo_id], db)
+        photo_rooms.notify(
+            photo_room(photo_id),
+            "comment_created",
+            comment_event(comment, current_user.username),
+        )
         return comment
 
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
@@ -58,7 +68,7 @@ async def post_comment(
 async def change_comment(
     comment_id: int = Form(...),
     text: str = Form(...),
-    current_user: User = Depends(auth_service.get_authenticated_user),
+    current_user: User = Depends(auth_service.get_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -80,20 +90,29 @@ async def change_comment(
     :raises HTTPException 403: If the current user is not the author of the comment.
     """
 
-    # Check that the current user is the author of the comment
-    comment_check = await reposytory_comments.get_comment(comment_id, db)
-    if comment_check:
-        if comment_check.user_id != current_user.id:
+    # Only the author of the comment can update it
+    comment = await reposytory_comments.update_comment(
+        text, comment_id, db, user_id=current_user.id
+    )
+    if comment is None:
+        # Nothing was updated, the comment is looked up to tell why
+        if await reposytory_comments.get_comment(comment_id, db):
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
-        comment = await reposytory_comments.update_comment(text, comment_id, db)
-        return comment
-    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+    await photo_fragments.bump(comment.photo_id)
+    photo_rooms.notify(
+        photo_room(comment.photo_id),
+        "comment_updated",
+        comment_event(comment, current_user.username),
+    )
+    return comment
 
 
 @router.delete("/delete")
 async def remove_comment(
     comment_id: int = Form(...),
-    current_user: User = Depends(auth_service.get_authenticated_user),
+    current_user: User = Depends(auth_service.get_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -123,7 +142,11 @@ async def remove_comment(
     ]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
 
+    photo_id = comment.photo_id
     await reposytory_comments.delete_comment(comment_id, db)
+    await photo_fragments.bump(photo_id)
+    await photo_leaderboards.refresh([photo_id], db)
+    photo_rooms.notify(photo_room(photo_id), "comment_deleted", {"id": comment_id})
     return {"detail": DELETE_SUCCESSFUL}
 
 
@@ -132,8 +155,8 @@ async def show_photo_comments(
     photo_id: int,
     limit: int = 0,
     offset: int = 10,
-    current_user: User = Depends(auth_service.get_authenticated_user),
-    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_principal),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Retrieve comments for a specific photo.
@@ -164,8 +187,8 @@ async def show_user_comments(
     user_id: int,
     limit: int = 0,
     offset: int = 10,
-    current_user: User = Depends(auth_service.get_authenticated_user),
-    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_principal),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Retrieve comments for a specific user.
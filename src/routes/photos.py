@@ -4,23 +4,31 @@ from fastapi import (
     File,
     Form,
     HTTPException,
+    Query,
     UploadFile,
     status,
 )
+from fastapi.responses import ORJSONResponse
 
 from fastapi_limiter.depends import RateLimiter
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.database.connect_db import get_db
+from src.database.connect_db import get_db, get_read_db
 from src.repository import photos as repository_photos
 from src.database.models import User, CropMode, BGColor
 from src.schemas import (
     MessageResponseSchema,
 )
 
-from src.schemas import PhotosDb
+from src.schemas import PhotosDb, PhotosPage
 from src.services.auth import auth_service
+from src.services.leaderboards import photo_leaderboards
+from src.services.photo_fragments import photo_fragments
+from src.services.serialization import reader, trusted_response
+from src.services.timelines import home_timelines, timeline_fanout
+from src.conf.constants import LEADERBOARD_PAGE_SIZE, TIMELINE_PAGE_SIZE
 from src.conf.messages import (
+    BAD_CURSOR,
     NOT_FOUND,
     PHOTO_REMOVED,
     NO_PHOTO_BY_ID,
@@ -70,7 +78,7 @@ async def upload_photo(
     ),
     rotation_angle: int
     | None = Form(None, description="The angle for the photo transformation (integer)"),
-    current_user: User = Depends(auth_service.get_authenticated_user),
+    current_user: User = Depends(auth_service.get_principal),
     db: AsyncSession = Depends(get_db),
 ) -> PhotosDb:
     """
@@ -148,6 +156,9 @@ async def upload_photo(
         list_tags,
     )
 
+    await photo_leaderboards.refresh([new_photo.id], db)
+    await timeline_fanout.enqueue(current_user.id, new_photo.id, new_photo.created_at)
+
     response = PhotosDb(
         id=new_photo.id,
         url=new_photo.url,
@@ -167,8 +178,8 @@ async def upload_photo(
 async def get_all_photos(
     skip: int = 0,
     limit: int = 10,
-    current_user: User = Depends(auth_service.get_authenticated_user),
-    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_principal),
+    db: AsyncSession = Depends(get_read_db),
 ) -> list:
     """
     Get All Photos
@@ -222,15 +233,148 @@ async def get_all_photos(
     """
 
     photos = await repository_photos.get_photos(skip, limit, db)
-    return photos
+    return trusted_response(PhotosDb, photos, many=True)
+
+
+def photos_page(photos: list, next_cursor: str | None) -> ORJSONResponse:
+    read = reader(PhotosDb, photos[0]) if photos else None
+    return ORJSONResponse(
+        {"photos": [read(photo) for photo in photos], "next_cursor": next_cursor}
+    )
+
+
+async def leaderboard_page(
+    board: str, cursor: str | None, limit: int, db: AsyncSession
+) -> ORJSONResponse:
+    try:
+        photo_ids, next_cursor = await photo_leaderboards.page(board, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=BAD_CURSOR)
+    photos = await repository_photos.get_photos_by_ids(photo_ids, db)
+    return photos_page(photos, next_cursor)
+
+
+@router.get("/top", response_model=PhotosPage)
+async def get_top_photos(
+    cursor: str | None = None,
+    limit: int = Query(10, ge=1, le=LEADERBOARD_PAGE_SIZE),
+    current_user: User = Depends(auth_service.get_principal),
+    db: AsyncSession = Depends(get_read_db),
+) -> ORJSONResponse:
+    """
+    Get Top-Rated Photos
+
+    This endpoint lists photos by the Bayesian average of their ratings, best first.
+
+    :param cursor: The ``next_cursor`` of the previous page, or None for the first page.
+    :type cursor: str | None
+    :param int limit: The maximum number of photos to retrieve (default is 10).
+    :param current_user: The authenticated user (Dependency).
+    :type current_user: User
+    :param db: The asynchronous database session (Dependency).
+    :type db: AsyncSession
+    :return: A page of photos and the cursor of the next page, or None after the last page.
+    :rtype: PhotosPage
+    :raises HTTPException 400: Bad Request if the cursor is not valid.
+    :raises HTTPException 401: Unauthorized if the user is not authenticated.
+
+    **Example Request:**
+
+    .. code-block:: http
+
+        GET /top?cursor=4.25:17&limit=10 HTTP/1.1
+        Host: yourapi.com
+        Authorization: Bearer your_access_token
+    """
+
+    return await leaderboard_page("top", cursor, limit, db)
+
+
+@router.get("/trending", response_model=PhotosPage)
+async def get_trending_photos(
+    cursor: str | None = None,
+    limit: int = Query(10, ge=1, le=LEADERBOARD_PAGE_SIZE),
+    current_user: User = Depends(auth_service.get_principal),
+    db: AsyncSession = Depends(get_read_db),
+) -> ORJSONResponse:
+    """
+    Get Trending Photos
+
+    This endpoint lists recent photos with the most ratings and comments first.
+
+    :param cursor: The ``next_cursor`` of the previous page, or None for the first page.
+    :type cursor: str | None
+    :param int limit: The maximum number of photos to retrieve (default is 10).
+    :param current_user: The authenticated user (Dependency).
+    :type current_user: User
+    :param db: The asynchronous database session (Dependency).
+    :type db: AsyncSession
+    :return: A page of photos and the cursor of the next page, or None after the last page.
+    :rtype: PhotosPage
+    :raises HTTPException 400: Bad Request if the cursor is not valid.
+    :raises HTTPException 401: Unauthorized if the user is not authenticated.
+
+    **Example Request:**
+
+    .. code-block:: http
+
+        GET /trending?limit=10 HTTP/1.1
+        Host: yourapi.com
+        Authorization: Bearer your_access_token
+    """
+
+    return await leaderboard_page("trending", cursor, limit, db)
+
+
+@router.get("/feed", response_model=PhotosPage)
+async def get_feed(
+    cursor: str | None = None,
+    limit: int = Query(10, ge=1, le=TIMELINE_PAGE_SIZE),
+    current_user: User = Depends(auth_service.get_principal),
+    db: AsyncSession = Depends(get_read_db),
+) -> ORJSONResponse:
+    """
+    Get Home Feed
+
+    This endpoint lists the latest photos of the current user and of the users they follow.
+
+    :param cursor: The ``next_cursor`` of the previous page, or None for the first page.
+    :type cursor: str | None
+    :param int limit: The maximum number of photos to retrieve (default is 10).
+    :param current_user: The authenticated user (Dependency).
+    :type current_user: User
+    :param db: The asynchronous database session (Dependency).
+    :type db: AsyncSession
+    :return: A page of photos and the cursor of the next page, or None after the last page.
+    :rtype: PhotosPage
+    :raises HTTPException 400: Bad Request if the cursor is not valid.
+    :raises HTTPException 401: Unauthorized if the user is not authenticated.
+
+    **Example Request:**
+
+    .. code-block:: http
+
+        GET /feed?cursor=1697040000.123456&limit=10 HTTP/1.1
+        Host: yourapi.com
+        Authorization: Bearer your_access_token
+    """
+
+    try:
+        photo_ids, next_cursor = await home_timelines.read(
+            current_user.id, cursor, limit, db
+        )
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=BAD_CURSOR)
+    photos = await repository_photos.get_photos_by_ids(photo_ids, db)
+    return photos_page(photos, next_cursor)
 
 
 @router.get("/get_my", response_model=list[PhotosDb])
 async def get_my_photos(
     skip: int = 0,
     limit: int = 10,
-    current_user: User = Depends(auth_service.get_authenticated_user),
-    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_principal),
+    db: AsyncSession = Depends(get_read_db),
 ) -> list:
     """
     Get My Photos
@@ -282,7 +426,7 @@ async def get_my_photos(
     """
 
     photos = await repository_photos.get_my_photos(skip, limit, current_user, db)
-    return photos
+    return trusted_response(PhotosDb, photos, many=True)
 
 
 @router.post(
@@ -293,7 +437,7 @@ async def get_my_photos(
 )
 async def make_URL_QR(
     photo_id: int,
-    current_user: User = Depends(auth_service.get_authenticated_user),
+    current_user: User = Depends(auth_service.get_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -353,8 +497,8 @@ async def make_URL_QR(
 )
 async def get_one_photo(
     photo_id: int,
-    current_user: User = Depends(auth_service.get_authenticated_user),
-    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_principal),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Get One Photo by ID
@@ -426,7 +570,7 @@ async def get_one_photo(
 async def patch_update_photo(
     photo_id: int,
     new_photo_description: str,
-    current_user: User = Depends(auth_service.get_authenticated_user),
+    current_user: User = Depends(auth_service.get_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -491,6 +635,7 @@ async def patch_update_photo(
     )
 
     if updated_photo:
+        await photo_fragments.bump(photo_id)
         return updated_photo
 
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=NO_PHOTO_BY_ID)
@@ -499,7 +644,7 @@ async def patch_update_photo(
 @router.delete("/{photo_id}", response_model=MessageResponseSchema, name="delete_photo")
 async def remove_photo(
     photo_id: int,
-    current_user: User = Depends(auth_service.get_authenticated_user),
+    current_user: User = Depends(auth_service.get_principal),
     db: AsyncSession = Depends(get_db),
 ) -> MessageResponseSchema:
     """
@@ -547,4 +692,5 @@ async def remove_photo(
     result = await repository_photos.remove_photo(photo_id, current_user, db)
     if not result:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=NOT_FOUND)
+    await photo_leaderboards.remove(photo_id)
     return {"message": PHOTO_REMOVED}
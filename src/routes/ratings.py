@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.database.connect_db import get_db
+from src.database.connect_db import get_db, get_read_db
 from src.repository import ratings as repository_ratings
 
 from src.database.models import User, Role
@@ -9,11 +10,17 @@ from src.schemas import RatingSchema
 
 
 from src.services.auth import auth_service
+from src.services.leaderboards import photo_leaderboards
+from src.services.photo_fragments import photo_fragments
+from src.services.photo_rooms import photo_rooms, photo_room
+from src.services.rating_buffer import rating_buffer
+from src.conf.config import settings
 
 
 from src.conf.messages import (
     FORBIDDEN,
     DELETE_SUCCESSFUL,
+    ALREADY_LIKE,
 )
 
 
@@ -24,7 +31,7 @@ router = APIRouter(prefix="/ratings", tags=["Ratings"])
 async def created_rating(
     photo_id: int,
     rating: int,
-    current_user: User = Depends(auth_service.get_authenticated_user),
+    current_user: User = Depends(auth_service.get_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -44,15 +51,37 @@ async def created_rating(
     :return: The newly created rating record.
 
     :rtype: RatingSchema
+
+    In write-behind mode (``settings.rating_write_behind``) the vote is checked
+    against the stored photo and ratings, then only buffered, and the response
+    is 202 Accepted; the vote is stored by the next flush.
     """
+    if settings.rating_write_behind:
+        repository_ratings.check_rating_value(rating)
+        await repository_ratings.check_vote(photo_id, current_user, db)
+        if not await rating_buffer.add(photo_id, current_user.id, rating):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=ALREADY_LIKE
+            )
+        return ORJSONResponse(
+            {"user_id": current_user.id, "rating": rating, "photo_id": photo_id},
+            status_code=status.HTTP_202_ACCEPTED,
+        )
+
     new_rating = await repository_ratings.create_rating(
         rating, photo_id, current_user, db
     )
+    await photo_fragments.bump(photo_id)
+    await photo_leaderboards.refresh([photo_id], db)
+    average = await repository_ratings.get_rating(photo_id, db)
+    photo_rooms.notify(
+        photo_room(photo_id), "rating_created", {"rating": rating, "average": average}
+    )
     return new_rating
 
 
 @router.get("/get_rating/")
-async def get_rating(photo_id: int, db: AsyncSession = Depends(get_db)):
+async def get_rating(photo_id: int, db: AsyncSession = Depends(get_read_db)):
     """
     Get the average rating for a photo.
 
@@ -74,8 +103,8 @@ async def get_rating(photo_id: int, db: AsyncSession = Depends(get_db)):
 @router.get("/get_rating_admin/")
 async def get_rating_Admin_Moder(
     photo_id: int,
-    current_user: User = Depends(auth_service.get_authenticated_user),
-    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_principal),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Get all ratings for a photo (Admin/Moderator only).
@@ -105,7 +134,7 @@ async def get_rating_Admin_Moder(
 async def delete_rating_ADmin_Moder(
     photo_id: int,
     user_id: int,
-    current_user: User = Depends(auth_service.get_authenticated_user),
+    current_user: User = Depends(auth_service.get_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -130,4 +159,6 @@ async def delete_rating_ADmin_Moder(
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=FORBIDDEN)
     else:
         await repository_ratings.delete_all_ratings(photo_id, user_id, db)
+        await photo_fragments.bump(photo_id)
+        await photo_leaderboards.refresh([photo_id], db)
         return DELETE_SUCCESSFUL
@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends, Query, Path
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.conf.messages import BAD_DATE_FORMAT
-from src.database.connect_db import get_db
+from src.database.connect_db import get_read_db
 from src.database.models import User
 from src.services.auth import auth_service
 from src.repository.search import search_admin, search_by_description, search_by_tag
@@ -20,8 +20,8 @@ async def search_tag(
     rating_high: float = Query(999),
     start_data: str = Query(datetime.now().date() - timedelta(days=365 * 60)),
     end_data: str = Query(datetime.now().date()),
-    current_user: User = Depends(auth_service.get_authenticated_user),
-    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_principal),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Search photos with "tag" optional filtering by "rating", and "date range".
@@ -69,8 +69,8 @@ async def search_description(
     rating_high: float = Query(999),
     start_data: str = Query(datetime.now().date() - timedelta(days=365 * 60)),
     end_data: str = Query(datetime.now().date()),
-    current_user: User = Depends(auth_service.get_authenticated_user),
-    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_principal),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Search photos with matching in "description" and optional filtering by "rating", and "date range".
@@ -113,8 +113,8 @@ async def admin_search(
     rating_high: float = Query(999),
     start_data: str = Query(str(datetime.now().date() - timedelta(days=365 * 60))),
     end_data: str = Query(str(datetime.now().date())),
-    current_user: User = Depends(auth_service.get_authenticated_user),
-    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_principal),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Search photos for administrators by "user_id" with optional filtering by "tag" or "description",
@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 ### Import from FastAPI ###
 
 from fastapi import (
@@ -36,11 +38,16 @@ from src.conf.messages import (
     USER_CHANGE_ROLE_TO,
     USER_EXISTS,
     SELF_ACTIVATION,
+    USER_FOLLOWED,
+    USER_ALREADY_FOLLOWED,
+    USER_UNFOLLOWED,
+    USER_NOT_FOLLOWED,
 )
+from src.conf.constants import TIMELINE_FOLLOW_BACKFILL
 
 ### Import from Database ###
 
-from src.database.connect_db import get_db
+from src.database.connect_db import get_db, get_read_db
 from src.database.models import User, Role
 
 ### Import from Schemas ###
@@ -54,11 +61,17 @@ from src.schemas import (
 ### Import from Repository ###
 
 from src.repository import users as repository_users
+from src.repository import follows as repository_follows
+from src.repository import photos as repository_photos
 
 ### Import from Services ###
 
 from src.services.roles import Admin_Moder_User, Admin
+from src.services.serialization import trusted_response
 from src.services.auth import auth_service
+from src.services.photo_fragments import photo_fragments
+from src.services.refresh_tokens import refresh_token_store
+from src.services.timelines import home_timelines, timeline_time
 
 
 router = APIRouter(prefix="/users", tags=["Users"])
@@ -66,7 +79,7 @@ router = APIRouter(prefix="/users", tags=["Users"])
 
 @router.get("/get_me", response_model=UserDb)
 async def read_my_profile(
-    current_user: User = Depends(auth_service.get_authenticated_user),
+    current_user: User = Depends(auth_service.get_principal),
 ):
     """
     **Get the profile of the current user.**
@@ -89,7 +102,7 @@ async def edit_my_profile(
     avatar: UploadFile = File(),
     new_username: str = Form(None),
     new_description: str = Form(None),
-    current_user: User = Depends(auth_service.get_authenticated_user),
+    current_user: User = Depends(auth_service.get_principal),
     redis_client: Redis = Depends(init_async_redis),
     db: AsyncSession = Depends(get_db),
 ):
@@ -127,10 +140,18 @@ async def edit_my_profile(
     other_user = await repository_users.get_user_by_username(new_username, db)
 
     if other_user is None:
+        old_username = current_user.username
         updated_user = await repository_users.edit_my_profile(
             avatar, new_description, new_username, current_user, db
         )
 
+        if updated_user.username != old_username:
+            # Gallery cards show the names of the owner and of the commenters
+            photo_ids = await repository_photos.get_photo_ids_shown_with_user(
+                updated_user.id, db
+            )
+            await photo_fragments.bump_many(photo_ids)
+
         return updated_user
 
     raise HTTPException(status_code=400, detail=USER_EXISTS)
@@ -144,8 +165,8 @@ async def edit_my_profile(
 async def get_users(
     skip: int = 0,
     limit: int = 10,
-    current_user: User = Depends(auth_service.get_authenticated_user),
-    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_principal),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     **Get a list of users.**
@@ -170,14 +191,14 @@ async def get_users(
     """
 
     users = await repository_users.get_users(skip, limit, db)
-    return users
+    return trusted_response(UserDb, users, many=True)
 
 
 @router.get("/{username}", response_model=UserProfileSchema)
 async def user_profile(
     username: str,
-    current_user: User = Depends(auth_service.get_authenticated_user),
-    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_principal),
+    db: AsyncSession = Depends(get_read_db),
 ) -> dict | None:
     """
     **Get a user's profile by username.**
@@ -205,11 +226,99 @@ async def user_profile(
 
     if user:
         urer_profile = await repository_users.get_user_profile(user.username, db)
-        return urer_profile
+        return trusted_response(UserProfileSchema, urer_profile)
     else:
         raise HTTPException(status_code=404, detail=NOT_FOUND)
 
 
+@router.post("/{username}/follow", response_model=MessageResponseSchema)
+async def follow_user(
+    username: str,
+    current_user: User = Depends(auth_service.get_principal),
+    db: AsyncSession = Depends(get_db),
+) -> dict:
+    """
+    **Follow a user.**
+
+    The latest photos of the followed user are added to the home timeline of
+    the current user, and their next photos will be too.
+
+    Level of Access:
+
+    - Current authorized user
+
+    :param username: str: The username of the user to follow.
+
+    :param current_user: User: The current authenticated user.
+
+    :param db: AsyncSession: Database session.
+
+    :return: Message about the follow.
+
+    :rtype: dict
+
+    :raises: HTTPException 404 if there is no user with this username, 400 if the user is the current user.
+    """
+
+    followed_id = await repository_follows.follow_user(current_user, username, db)
+    if followed_id is None:
+        return {"message": USER_ALREADY_FOLLOWED}
+
+    photos = await repository_follows.get_recent_photos(
+        [followed_id], None, TIMELINE_FOLLOW_BACKFILL, db
+    )
+    await home_timelines.add_photos(current_user.id, photos)
+    return {"message": USER_FOLLOWED}
+
+
+@router.delete("/{username}/follow", response_model=MessageResponseSchema)
+async def unfollow_user(
+    username: str,
+    current_user: User = Depends(auth_service.get_principal),
+    db: AsyncSession = Depends(get_db),
+) -> dict:
+    """
+    **Stop following a user.**
+
+    Every photo of the user still in the home timeline of the current user is
+    removed from it.
+
+    Level of Access:
+
+    - Current authorized user
+
+    :param username: str: The username of the followed user.
+
+    :param current_user: User: The current authenticated user.
+
+    :param db: AsyncSession: Database session.
+
+    :return: Message about the unfollow.
+
+    :rtype: dict
+    """
+
+    followed_id = await repository_follows.unfollow_user(current_user, username, db)
+    if followed_id is None:
+        return {"message": USER_NOT_FOLLOWED}
+
+    oldest = await home_timelines.oldest(current_user.id)
+    if oldest is not None:
+        # Only photos at least as recent as the oldest one can be in the timeline;
+        # the bound is widened by a microsecond against float rounding
+        photos = await repository_follows.get_recent_photos(
+            [followed_id],
+            None,
+            home_timelines.size,
+            db,
+            since=timeline_time(oldest) - timedelta(microseconds=1),
+        )
+        await home_timelines.remove_photos(
+            current_user.id, [photo.id for photo in photos]
+        )
+    return {"message": USER_UNFOLLOWED}
+
+
 @router.patch(
     "/ban",
     name="ban_user",
@@ -218,13 +327,13 @@ async def user_profile(
 )
 async def ban_user(
     email: EmailStr,
-    current_user: User = Depends(auth_service.get_authenticated_user),
+    current_user: User = Depends(auth_service.get_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """
     **Block a user by email.**
 
-    This route allows to block a user by their email.
+    This route allows to block a user by their email. All refresh tokens of the user are revoked.
 
     Level of Access:
 
@@ -238,6 +347,11 @@ async def ban_user(
     :rtype: dict
     """
 
+    if await repository_users.ban_user(email, db, except_user_id=current_user.id):
+        await refresh_token_store.revoke(email)
+        return {"message": USER_NOT_ACTIVE}
+
+    # Nothing was updated, the user is looked up to tell why
     user = await repository_users.get_user_by_email(email, db)
 
     if not user:
@@ -249,14 +363,9 @@ async def ban_user(
             detail=SELF_ACTIVATION,
         )
 
-    if user.is_active:
-        await repository_users.ban_user(user.email, db)
-
-        return {"message": USER_NOT_ACTIVE}
-    else:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT, detail=USER_ALREADY_NOT_ACTIVE
-        )
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT, detail=USER_ALREADY_NOT_ACTIVE
+    )
 
 
 @router.patch(
@@ -267,7 +376,7 @@ async def ban_user(
 )
 async def activate_user(
     email: EmailStr,
-    current_user: User = Depends(auth_service.get_authenticated_user),
+    current_user: User = Depends(auth_service.get_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -287,25 +396,26 @@ async def activate_user(
     :rtype: dict
     """
 
+    if await repository_users.activate_user(
+        email, db, except_user_id=current_user.id
+    ):
+        return {"message": USER_IS_ACTIVE}
+
+    # Nothing was updated, the user is looked up to tell why
     user = await repository_users.get_user_by_email(email, db)
 
+    if not user:
+        raise HTTPException(status_code=404, detail=INVALID_EMAIL)
+
     if user.id == current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=SELF_ACTIVATION,
         )
 
-    if not user:
-        raise HTTPException(status_code=404, detail=INVALID_EMAIL)
-
-    if not user.is_active:
-        await repository_users.activate_user(user.email, db)
-
-        return {"message": USER_IS_ACTIVE}
-    else:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT, detail=USER_ALREADY_ACTIVE
-        )
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT, detail=USER_ALREADY_ACTIVE
+    )
 
 
 @router.patch(
@@ -345,6 +455,10 @@ async def assign_role(
     key_to_clear = f"user:{email}"
     await redis_client.delete(key_to_clear)
 
+    if await repository_users.make_user_role(email, role, db):
+        return {"message": f"{USER_CHANGE_ROLE_TO} {role.value}"}
+
+    # Nothing was updated, the user is looked up to tell why
     user = await repository_users.get_user_by_email(email, db)
 
     if not user:
@@ -352,8 +466,4 @@ async def assign_role(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_EMAIL
         )
 
-    if role == user.role:
-        return {"message": USER_ROLE_IN_USE}
-    else:
-        await repository_users.make_user_role(email, role, db)
-        return {"message": f"{USER_CHANGE_ROLE_TO} {role.value}"}
+    return {"message": USER_ROLE_IN_USE}
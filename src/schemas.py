@@ -77,6 +77,8 @@ class UserProfileSchema(BaseModel):
     avatar: str | None
     photos_count: int | None
     comments_count: int | None
+    followers_count: int | None
+    following_count: int | None
     is_active: bool | None
     created_at: datetime
 
@@ -142,6 +144,15 @@ class PhotosDb(BaseModel):
     created_at: datetime
 
 
+class PhotosPage(BaseModel):
+    """
+    Schema for a page of a photo leaderboard.
+    """
+
+    photos: list[PhotosDb]
+    next_cursor: str | None
+
+
 class CommentSchema(BaseModel):
     """
     Schema for creating a comment.
@@ -21,6 +21,7 @@ from src.conf.messages import (
 from src.conf.constants import TOKEN_LIFE_TIME, COOKIE_KEY_NAME
 from src.conf.config import init_async_redis
 from src.database.models import User
+from src.services.token_cache import TokenCache
 
 
 class Auth:
@@ -34,6 +35,8 @@ class Auth:
         SECRET_KEY (str): The secret key used for token generation and decoding.
         ALGORITHM (str): The algorithm used for token encoding and decoding.
         oauth2_scheme (OAuth2PasswordBearer): An instance of `OAuth2PasswordBearer` for OAuth2 authentication.
+        optional_oauth2_scheme (OAuth2PasswordBearer): The same scheme, returning None instead of failing when no bearer token is sent.
+        token_cache (TokenCache): An LRU cache of verified access token claims.
 
     Methods:
         verify_password(plain_password, hashed_password): Verify a plain password against a hashed password.
@@ -42,7 +45,11 @@ class Auth:
         create_refresh_token(data, expires_delta=None): Create a refresh token with an optional expiration time.
         create_email_token(data): Create an email verification token with a fixed expiration time.
         decode_token(token): Decode a JWT token and validate its scope.
+        decode_refresh_token(token): Decode a refresh token and return its claims.
+        decode_access_token(token): Verify an access token, using the token cache when possible.
+        forget_token(token): Drop a token from the token cache.
         get_authenticated_user(token, db): Get the authenticated user based on the provided token.
+        get_principal(request, token, db): Get the authenticated user once per request, from a bearer token or the access token cookie.
         get_email_from_token(token): Get the email address from an email verification token.
 
     Example Usage:
@@ -54,17 +61,22 @@ class Auth:
     SECRET_KEY = settings.secret_key
     ALGORITHM = settings.algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+    optional_oauth2_scheme = OAuth2PasswordBearer(
+        tokenUrl="/api/auth/login", auto_error=False
+    )
 
     def __init__(self):
         """
         Initialize a new instance of the `Auth` class.
 
-        This constructor initializes the `Auth` class and sets the `_redis_cache` attribute to `None`.
+        This constructor initializes the `Auth` class, sets the `_redis_cache` attribute to `None`
+        and creates an empty token cache.
 
         :return: None
         """
 
         self._redis_cache = None
+        self.token_cache = TokenCache(maxsize=settings.token_cache_size)
 
     @property
     async def redis_cache(self):
@@ -180,16 +192,30 @@ class Auth:
         This function decodes a JWT token and validates its scope.
 
         :param token: str: The JWT token to decode.
+        :return: The email stored in the decoded token.
+        :rtype: str
+        :raises HTTPException: If the token is invalid.
+        """
+
+        payload = await self.decode_refresh_token(token)
+        return payload["email"]
+
+    async def decode_refresh_token(self, token: str) -> dict:
+        """
+        Decode a refresh token.
+
+        This function decodes a JWT token, validates its scope and returns all of its claims.
+
+        :param token: str: The JWT refresh token to decode.
         :return: The payload of the decoded token.
         :rtype: dict
-        :raises HTTPException: If the token is invalid.
+        :raises HTTPException: If the token is invalid or is not a refresh token.
         """
 
         try:
             payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
             if payload["scope"] == "refresh_token":
-                email = payload["email"]
-                return email
+                return payload
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_SCOPE
             )
@@ -199,6 +225,37 @@ class Auth:
                 detail=NOT_VALIDATE_CREDENTIALS,
             )
 
+    def decode_access_token(self, token: str) -> dict:
+        """
+        Verify an access token and return its claims.
+
+        Verified claims are kept in the token cache until the token expires,
+        so repeated requests with the same token skip signature verification.
+
+        :param token: str: The JWT access token.
+        :return: The payload of the decoded token.
+        :rtype: dict
+        :raises JWTError: If the token is invalid or expired.
+        """
+
+        payload = self.token_cache.get(token)
+        if payload is None:
+            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            self.token_cache.set(token, payload)
+        return payload
+
+    def forget_token(self, token: str) -> None:
+        """
+        Remove a token from the token cache.
+
+        Called when the token is blacklisted, so that it is verified again on the next request.
+
+        :param token: str: The JWT token.
+        :return: None
+        """
+
+        self.token_cache.discard(token)
+
     async def allow_rout(
         self, request: Request, db: AsyncSession = Depends(get_db)
     ) -> User:
@@ -217,15 +274,48 @@ class Auth:
         """
 
         try:
-            token = request.cookies.get(COOKIE_KEY_NAME)
-            user = await self.get_authenticated_user(token, db)
-            return user
+            return await self.get_principal(request, None, db)
         except Exception:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="No access token provided",
             )
 
+    async def get_principal(
+        self,
+        request: Request,
+        token: str | None = Depends(optional_oauth2_scheme),
+        db: AsyncSession = Depends(get_db),
+    ) -> User:
+        """
+        Resolve the authenticated user of the current request.
+
+        The user is authenticated at most once per request: the result is stored in
+        ``request.state.principal`` and shared by role checks, routes and views.
+        The token is taken from the ``Authorization: Bearer`` header and, if it is
+        absent, from the access token cookie.
+
+        :param request: The request object.
+        :type request: Request
+        :param token: The bearer token, if one was sent (Dependency).
+        :type token: str | None
+        :param db: The asynchronous database session (Dependency).
+        :type db: AsyncSession
+        :return: The authenticated user.
+        :rtype: User
+        :raises HTTPException 401: If the token is missing or invalid.
+        """
+
+        principal = getattr(request.state, "principal", None)
+        if isinstance(principal, User):
+            return principal
+
+        if token is None:
+            token = request.cookies.get(COOKIE_KEY_NAME)
+        user = await self.get_authenticated_user(token, db)
+        request.state.principal = user
+        return user
+
     async def get_authenticated_user(
         self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
     ):
@@ -245,9 +335,12 @@ class Auth:
             status_code=status.HTTP_401_UNAUTHORIZED, detail=NOT_VALIDATE_CREDENTIALS
         )
 
+        if not token:
+            raise credentials_exception
+
         try:
             # Decode JWT
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.decode_access_token(token)
             if payload["scope"] == "access_token":
                 email = payload["email"]
                 if email is None:
@@ -0,0 +1,387 @@
+import asyncio
+
+from fastapi import WebSocket, status
+from uvicorn.config import logger
+
+from src.conf.constants import (
+    CHAT_QUEUE_SIZE,
+    CHAT_SEND_TIMEOUT,
+    CHAT_TICK,
+    CHAT_BATCH_SIZE,
+    CHAT_INBOX_SIZE,
+    CHAT_HISTORY_ON_CONNECT,
+)
+from src.services.chat_broker import ChatBroker, InMemoryBroker, RedisBroker
+from src.services.chat_history import ChatHistory, MemoryHistory, RedisHistory
+
+
+class ChatConnection:
+    """
+    Websocket connection of a chat client.
+
+    Outgoing messages wait in a bounded queue drained by a writer task of the
+    connection, so a slow client never blocks the other clients.
+
+    :param WebSocket websocket: The accepted websocket.
+    :param int queue_size: The maximum number of messages waiting to be sent.
+    :param float send_timeout: The maximum time a single send may take, in seconds.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        queue_size: int = CHAT_QUEUE_SIZE,
+        send_timeout: float = CHAT_SEND_TIMEOUT,
+    ):
+        self.websocket = websocket
+        self.send_timeout = send_timeout
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+        self.writer = None
+        self.rooms: set[str] = set()
+
+    def offer(self, message: str) -> bool:
+        """
+        Queue a message for the client without waiting.
+
+        :param str message: The message to send.
+        :return: False if the queue of the client is full.
+        :rtype: bool
+        """
+
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def write(self) -> None:
+        """
+        Send queued messages to the client until it is closed or a send fails or times out.
+
+        :return: None
+        """
+
+        # A cancellation racing with a finished send can be swallowed by wait_for,
+        # so the closed flag is checked as well
+        while not self.closed:
+            message = await self.queue.get()
+            await asyncio.wait_for(
+                self.websocket.send_text(message), timeout=self.send_timeout
+            )
+
+
+class ChatHub:
+    """
+    Chat room broadcasting messages to every connected client.
+
+    :meth:`publish` only puts the message in the bounded inbox of the hub and
+    returns; while the inbox is full, for instance when the broker is down,
+    new messages are dropped. Every tick, a dispatcher task publishes the messages of the inbox to the
+    broker as one batch. A listener task receives the batches published by the
+    hubs of every worker and copies them to the queues of the local connections.
+    Clients whose queue is full or whose send fails are disconnected.
+
+    Published batches are also appended to the history of the room by a separate
+    task, so a slow history write never delays live messages. A new client first
+    receives the latest messages of the history.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        connection = await chat_hub.connect(websocket)
+        try:
+            while True:
+                chat_hub.publish(await websocket.receive_text())
+        except WebSocketDisconnect:
+            pass
+        finally:
+            await chat_hub.disconnect(connection)
+
+    :param ChatBroker broker: The broker shared by the hubs of every worker.
+    :param str channel: The broker channel of the room.
+    :param int queue_size: The maximum number of messages waiting for one client.
+    :param float send_timeout: The maximum time a single send may take, in seconds.
+    :param float tick: How long messages are collected before a batch is published, in seconds.
+    :param int batch_size: The maximum number of messages of a batch.
+    :param int inbox_size: The maximum number of messages waiting to be published.
+    :param ChatHistory history: The history of the room, or None to keep no history.
+    :param int history_on_connect: The number of recent messages sent to a new client.
+    """
+
+    def __init__(
+        self,
+        broker: ChatBroker | None = None,
+        channel: str = "chat:room",
+        queue_size: int = CHAT_QUEUE_SIZE,
+        send_timeout: float = CHAT_SEND_TIMEOUT,
+        tick: float = CHAT_TICK,
+        batch_size: int = CHAT_BATCH_SIZE,
+        inbox_size: int = CHAT_INBOX_SIZE,
+        history: ChatHistory | None = None,
+        history_on_connect: int = CHAT_HISTORY_ON_CONNECT,
+    ):
+        self.broker = broker or InMemoryBroker()
+        self.channel = channel
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.tick = tick
+        self.batch_size = batch_size
+        self.inbox_size = inbox_size
+        self.history = history
+        self.history_on_connect = history_on_connect
+        self.connections: set[ChatConnection] = set()
+        self.inbox = None
+        self.dispatcher = None
+        self.listener = None
+        self.subscribed = None
+        self.history_writer = None
+        self.unsaved = None
+        self._closing = set()
+
+    def start(self) -> None:
+        """
+        Start the tasks of the hub on the running event loop.
+
+        :return: None
+        """
+
+        if (
+            self.dispatcher is None
+            or self.dispatcher.done()
+            or self.dispatcher.get_loop() is not asyncio.get_running_loop()
+        ):
+            self.inbox = asyncio.Queue(maxsize=self.inbox_size)
+            self.subscribed = asyncio.Event()
+            self.listener = asyncio.create_task(self.listen(), name="chat_listener")
+            self.dispatcher = asyncio.create_task(self.dispatch(), name="chat_hub")
+            if self.history is not None:
+                self.unsaved = asyncio.Queue()
+                self.history_writer = asyncio.create_task(
+                    self.write_history(), name="chat_history"
+                )
+
+    async def stop(self) -> None:
+        """
+        Stop the tasks of the hub and disconnect every client.
+
+        :return: None
+        """
+
+        connections = list(self.connections)
+        for connection in connections:
+            await self.disconnect(connection, status.WS_1001_GOING_AWAY)
+        await asyncio.gather(
+            *(connection.writer for connection in connections), return_exceptions=True
+        )
+        for task in (self.dispatcher, self.listener, self.history_writer):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self.dispatcher = self.listener = self.history_writer = None
+
+    async def connect(self, websocket: WebSocket) -> ChatConnection:
+        """
+        Accept a websocket, send it the latest messages and add it to the room.
+
+        :param WebSocket websocket: The websocket to accept.
+        :return: The connection of the client.
+        :rtype: ChatConnection
+        """
+
+        self.start()
+        await websocket.accept()
+        connection = ChatConnection(websocket, self.queue_size, self.send_timeout)
+        if self.history is not None:
+            try:
+                recent = await self.history.recent(self.channel, self.history_on_connect)
+            except Exception as err:
+                logger.error(f"Chat history unavailable: {err}")
+                recent = []
+            for entry in recent[-self.queue_size :]:
+                connection.offer(entry["text"])
+        connection.writer = asyncio.create_task(self.run_writer(connection))
+        self.connections.add(connection)
+        return connection
+
+    async def disconnect(
+        self, connection: ChatConnection, code: int = status.WS_1000_NORMAL_CLOSURE
+    ) -> None:
+        """
+        Remove a client from the room and close its websocket.
+
+        :param ChatConnection connection: The connection to remove.
+        :param int code: The websocket close code sent to the client.
+        :return: None
+        """
+
+        self.remove(connection)
+        if connection.closed:
+            return
+        connection.closed = True
+        if connection.writer is not None and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+        try:
+            await connection.websocket.close(code)
+        except Exception:
+            # The client is already gone
+            pass
+
+    def remove(self, connection: ChatConnection) -> None:
+        """
+        Stop delivering messages to a client.
+
+        :param ChatConnection connection: The connection to remove.
+        :return: None
+        """
+
+        self.connections.discard(connection)
+
+    def publish(self, message: str) -> bool:
+        """
+        Broadcast a message to the room.
+
+        :param str message: The message to broadcast.
+        :return: False if the inbox is full and the message was dropped.
+        :rtype: bool
+        """
+
+        self.start()
+        try:
+            self.inbox.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            logger.warning("Chat message dropped: inbox is full")
+            return False
+
+    def fan_out(self, messages: list[str]) -> None:
+        """
+        Queue a batch of messages for every client of the room.
+
+        :param list[str] messages: The messages to queue.
+        :return: None
+        """
+
+        self.deliver(self.connections, messages)
+
+    def deliver(self, connections, messages: list[str]) -> None:
+        """
+        Queue a batch of messages for some clients, dropping slow clients.
+
+        :param connections: The connections to queue the messages for.
+        :param list[str] messages: The messages to queue.
+        :return: None
+        """
+
+        for connection in list(connections):
+            if not all(connection.offer(message) for message in messages):
+                logger.warning("Chat client dropped: outbound queue is full")
+                self.remove(connection)
+                task = asyncio.create_task(
+                    self.disconnect(connection, status.WS_1013_TRY_AGAIN_LATER)
+                )
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+
+    async def dispatch(self) -> None:
+        """
+        Publish the messages of the inbox to the broker, one batch per tick.
+
+        :return: None
+        """
+
+        await self.subscribed.wait()
+        while True:
+            batch = [await self.inbox.get()]
+            await asyncio.sleep(self.tick)
+            while len(batch) < self.batch_size and not self.inbox.empty():
+                batch.append(self.inbox.get_nowait())
+            try:
+                await self.broker.publish(self.channel, batch)
+            except Exception as err:
+                logger.error(f"Chat batch of {len(batch)} messages lost: {err}")
+                continue
+            if self.unsaved is not None:
+                self.unsaved.put_nowait(batch)
+
+    async def write_history(self) -> None:
+        """
+        Append published batches to the history, merging the batches that piled up.
+
+        :return: None
+        """
+
+        while True:
+            messages = list(await self.unsaved.get())
+            while not self.unsaved.empty():
+                messages.extend(self.unsaved.get_nowait())
+            try:
+                await self.history.append(self.channel, messages)
+            except Exception as err:
+                logger.error(f"Chat history write of {len(messages)} messages failed: {err}")
+
+    async def history_page(self, before_id: str | None, limit: int) -> list[dict]:
+        """
+        Get a page of the history of the room.
+
+        :param str | None before_id: The id of the oldest message already known, or None for the latest messages.
+        :param int limit: The maximum number of messages.
+        :return: The entries, oldest first.
+        :rtype: list[dict]
+        """
+
+        if self.history is None:
+            return []
+        if before_id is None:
+            return await self.history.recent(self.channel, limit)
+        return await self.history.before(self.channel, before_id, limit)
+
+    async def listen(self) -> None:
+        """
+        Copy the batches published to the room channel to the queues of the clients.
+
+        The subscription is renewed if the broker connection fails.
+
+        :return: None
+        """
+
+        while True:
+            try:
+                subscription = await self.broker.subscribe(self.channel)
+            except Exception as err:
+                logger.error(f"Chat subscription failed: {err}")
+                await asyncio.sleep(1)
+                continue
+            self.subscribed.set()
+            try:
+                while True:
+                    self.fan_out(await subscription.get())
+            except Exception as err:
+                logger.error(f"Chat subscription lost: {err}")
+            finally:
+                try:
+                    await subscription.close()
+                except Exception:
+                    pass
+
+    async def run_writer(self, connection: ChatConnection) -> None:
+        """
+        Run the writer of a connection and drop the client when it fails.
+
+        :param ChatConnection connection: The connection to serve.
+        :return: None
+        """
+
+        try:
+            await connection.write()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            await self.disconnect(connection, status.WS_1011_INTERNAL_ERROR)
+
+
+chat_hub = ChatHub(RedisBroker(), history=RedisHistory())
@@ -0,0 +1,148 @@
+import asyncio
+import json
+
+from src.conf.config import init_async_redis
+
+
+class Subscription:
+    """
+    Subscription of a chat hub to a broker channel.
+
+    Messages are delivered in batches, in the order they were published.
+    """
+
+    async def get(self) -> list[str]:
+        """
+        Wait for the next batch of messages.
+
+        :return: The messages of the batch.
+        :rtype: list[str]
+        """
+
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        """
+        Stop receiving messages.
+
+        :return: None
+        """
+
+        raise NotImplementedError
+
+
+class ChatBroker:
+    """
+    Message broker connecting the chat hubs of every worker process.
+    """
+
+    async def publish(self, channel: str, messages: list[str]) -> None:
+        """
+        Publish a batch of messages to every subscriber of a channel.
+
+        :param str channel: The channel name.
+        :param list[str] messages: The messages of the batch.
+        :return: None
+        """
+
+        raise NotImplementedError
+
+    async def subscribe(self, channel: str) -> Subscription:
+        """
+        Subscribe to a channel.
+
+        The subscription is active when the method returns.
+
+        :param str channel: The channel name.
+        :return: The subscription.
+        :rtype: Subscription
+        """
+
+        raise NotImplementedError
+
+
+class InMemorySubscription(Subscription):
+    def __init__(self, broker: "InMemoryBroker", channel: str):
+        self.broker = broker
+        self.channel = channel
+        self.queue = asyncio.Queue()
+
+    async def get(self) -> list[str]:
+        return await self.queue.get()
+
+    async def close(self) -> None:
+        self.broker.subscribers[self.channel].discard(self)
+
+
+class InMemoryBroker(ChatBroker):
+    """
+    Broker delivering messages within the current process.
+
+    Used in tests and when the application runs in a single worker.
+    """
+
+    def __init__(self):
+        self.subscribers: dict[str, set[InMemorySubscription]] = {}
+
+    async def publish(self, channel: str, messages: list[str]) -> None:
+        for subscription in list(self.subscribers.get(channel, ())):
+            subscription.queue.put_nowait(list(messages))
+
+    async def subscribe(self, channel: str) -> Subscription:
+        subscription = InMemorySubscription(self, channel)
+        self.subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+
+class RedisSubscription(Subscription):
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    async def get(self) -> list[str]:
+        while True:
+            message = await self.pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=None
+            )
+            if message is not None and message["type"] == "message":
+                return json.loads(message["data"])
+
+    async def close(self) -> None:
+        try:
+            await self.pubsub.unsubscribe()
+        finally:
+            await self.pubsub.close()
+
+
+class RedisBroker(ChatBroker):
+    """
+    Broker relaying messages between worker processes through Redis pub/sub.
+
+    Each batch is published as one JSON array, so a tick of a busy room costs a
+    single Redis command.
+    """
+
+    def __init__(self):
+        self._redis_cache = None
+
+    @property
+    async def redis_cache(self):
+        """
+        Get the Redis client used by the broker.
+
+        :return: The Redis client.
+        :rtype: redis.asyncio.Redis
+        """
+
+        if self._redis_cache is None:
+            self._redis_cache = await init_async_redis()
+        return self._redis_cache
+
+    async def publish(self, channel: str, messages: list[str]) -> None:
+        redis = await self.redis_cache
+        await redis.publish(channel, json.dumps(messages))
+
+    async def subscribe(self, channel: str) -> Subscription:
+        redis = await self.redis_cache
+        pubsub = redis.pubsub()
+        await pubsub.subscribe(channel)
+        return RedisSubscription(pubsub)
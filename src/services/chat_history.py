@@ -0,0 +1,155 @@
+from collections import deque
+from itertools import count
+
+from src.conf.config import init_async_redis
+from src.conf.constants import CHAT_HISTORY_SIZE
+
+
+class ChatHistory:
+    """
+    Bounded history of the messages of chat rooms.
+
+    Entries are dictionaries with the ``id`` and the ``text`` of a message. Ids
+    increase with time, so older entries are paged with the id of the oldest
+    entry already known.
+    """
+
+    async def append(self, room: str, messages: list[str]) -> None:
+        """
+        Append a batch of messages to the history of a room.
+
+        :param str room: The room name.
+        :param list[str] messages: The messages, oldest first.
+        :return: None
+        """
+
+        raise NotImplementedError
+
+    async def recent(self, room: str, limit: int) -> list[dict]:
+        """
+        Get the latest messages of a room.
+
+        :param str room: The room name.
+        :param int limit: The maximum number of messages.
+        :return: The entries, oldest first.
+        :rtype: list[dict]
+        """
+
+        raise NotImplementedError
+
+    async def before(self, room: str, before_id: str, limit: int) -> list[dict]:
+        """
+        Get the messages of a room older than a given message.
+
+        :param str room: The room name.
+        :param str before_id: The id of the message to page from.
+        :param int limit: The maximum number of messages.
+        :return: The entries, oldest first.
+        :rtype: list[dict]
+        """
+
+        raise NotImplementedError
+
+
+class MemoryHistory(ChatHistory):
+    """
+    History kept in a ring buffer of the current process.
+
+    Used in tests and when the application runs in a single worker.
+
+    :param int maxlen: The number of messages kept per room.
+    """
+
+    def __init__(self, maxlen: int = CHAT_HISTORY_SIZE):
+        self.maxlen = maxlen
+        self.rooms: dict[str, deque] = {}
+        self._ids = count(1)
+
+    async def append(self, room: str, messages: list[str]) -> None:
+        entries = self.rooms.setdefault(room, deque(maxlen=self.maxlen))
+        entries.extend({"id": str(next(self._ids)), "text": text} for text in messages)
+
+    async def recent(self, room: str, limit: int) -> list[dict]:
+        entries = self.rooms.get(room, ())
+        return list(entries)[-limit:] if limit > 0 else []
+
+    async def before(self, room: str, before_id: str, limit: int) -> list[dict]:
+        if not before_id.isdigit():
+            return []
+        older = [
+            entry
+            for entry in self.rooms.get(room, ())
+            if int(entry["id"]) < int(before_id)
+        ]
+        return older[-limit:] if limit > 0 else []
+
+
+class RedisHistory(ChatHistory):
+    """
+    History kept in a capped Redis stream per room.
+
+    Ids are the ids of the stream entries.
+
+    :param int maxlen: The approximate number of messages kept per room.
+    """
+
+    def __init__(self, maxlen: int = CHAT_HISTORY_SIZE):
+        self.maxlen = maxlen
+        self._redis_cache = None
+
+    @property
+    async def redis_cache(self):
+        """
+        Get the Redis client used by the history.
+
+        :return: The Redis client.
+        :rtype: redis.asyncio.Redis
+        """
+
+        if self._redis_cache is None:
+            self._redis_cache = await init_async_redis()
+        return self._redis_cache
+
+    @staticmethod
+    def stream_key(room: str) -> str:
+        return f"{room}:history"
+
+    @staticmethod
+    def entries(response) -> list[dict]:
+        # XREVRANGE returns the newest entry first
+        return [
+            {"id": _decode(entry_id), "text": _decode(fields.get(b"text", b""))}
+            for entry_id, fields in reversed(response)
+        ]
+
+    async def append(self, room: str, messages: list[str]) -> None:
+        redis = await self.redis_cache
+        async with redis.pipeline(transaction=False) as pipe:
+            for text in messages:
+                pipe.xadd(
+                    self.stream_key(room),
+                    {"text": text},
+                    maxlen=self.maxlen,
+                    approximate=True,
+                )
+            await pipe.execute()
+
+    async def recent(self, room: str, limit: int) -> list[dict]:
+        if limit <= 0:
+            return []
+        redis = await self.redis_cache
+        response = await redis.xrevrange(self.stream_key(room), count=limit)
+        return self.entries(response)
+
+    async def before(self, room: str, before_id: str, limit: int) -> list[dict]:
+        if limit <= 0:
+            return []
+        redis = await self.redis_cache
+        response = await redis.xrevrange(
+            self.stream_key(room), max=f"({before_id}", count=limit
+        )
+        return self.entries(response)
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
@@ -0,0 +1,139 @@
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.conf.constants import (
+    COMPRESSION_BROTLI_QUALITY,
+    COMPRESSION_GZIP_LEVEL,
+    COMPRESSION_MINIMUM_SIZE,
+)
+from src.services.static_assets import accepted_encodings, brotli
+
+
+class GzipEncoder:
+    coding = "gzip"
+
+    def __init__(self, level: int = COMPRESSION_GZIP_LEVEL):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    coding = "br"
+
+    def __init__(self, quality: int = COMPRESSION_BROTLI_QUALITY):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli or gzip, as negotiated with the client.
+
+    Responses smaller than ``minimum_size`` and responses already encoded,
+    e.g. precompressed static files, are sent as they are. Streamed responses
+    are compressed chunk by chunk and flushed after each one, so the client
+    can render every chunk as soon as it is sent.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    :param app: The wrapped application.
+    :param int minimum_size: The smallest body compressed, in bytes.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    def encoder(self, scope: Scope):
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in accepted:
+            return BrotliEncoder()
+        if "gzip" in accepted:
+            return GzipEncoder()
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        encoder = self.encoder(scope) if scope["type"] == "http" else None
+        if encoder is None:
+            await self.app(scope, receive, send)
+            return
+        responder = CompressionResponder(send, encoder, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    def __init__(self, send: Send, encoder, minimum_size: int):
+        self._send = send
+        self.encoder = encoder
+        self.minimum_size = minimum_size
+        self.start_message: Message | None = None
+        self.started = False
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Headers are held back until the first body shows its size
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not self.started:
+            self.started = True
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if "content-encoding" in headers or (
+                len(body) < self.minimum_size and not more_body
+            ):
+                self.passthrough = True
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+
+            headers["Content-Encoding"] = self.encoder.coding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+                body = self.encoder.compress(body) + self.encoder.flush()
+            else:
+                body = self.encoder.compress(body) + self.encoder.finish()
+                headers["Content-Length"] = str(len(body))
+            await self._send(self.start_message)
+            await self._send(
+                {"type": "http.response.body", "body": body, "more_body": more_body}
+            )
+            return
+
+        if self.passthrough:
+            await self._send(message)
+            return
+
+        body = self.encoder.compress(body)
+        body += self.encoder.flush() if more_body else self.encoder.finish()
+        await self._send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
@@ -1,11 +1,11 @@
+import json
 from pathlib import Path
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
+from fastapi_mail import ConnectionConfig
 from pydantic import EmailStr
 
 from src.services.auth import auth_service
-from src.conf.config import settings
+from src.conf.config import settings, init_async_redis
 
 conf = ConnectionConfig(
     MAIL_USERNAME=settings.mail_username,
@@ -22,8 +22,202 @@ conf = ConnectionConfig(
 )
 
 
+class EmailOutbox:
+    """
+    Persistent email outbox stored in a Redis stream.
+
+    Handlers only append a message to the stream and return; the messages are
+    rendered and delivered by :class:`src.services.email_worker.EmailWorker`.
+    Deliveries that failed are kept in a sorted set scored by the time of the
+    next attempt until they are due again.
+
+    :param str stream: The Redis stream holding queued messages.
+    :param str group: The consumer group of the delivery workers.
+    :param int maxlen: The approximate maximum length of the stream.
+    """
+
+    def __init__(
+        self,
+        stream: str = "email:outbox",
+        group: str = "email-workers",
+        maxlen: int = 100_000,
+    ):
+        self.stream = stream
+        self.group = group
+        self.retry_key = f"{stream}:retry"
+        self.maxlen = maxlen
+        self._redis_cache = None
+
+    @property
+    async def redis_cache(self):
+        """
+        Get the Redis client used by the outbox.
+
+        :return: The Redis client.
+        :rtype: redis.asyncio.Redis
+        """
+
+        if self._redis_cache is None:
+            self._redis_cache = await init_async_redis()
+        return self._redis_cache
+
+    async def enqueue(
+        self,
+        recipient: str,
+        subject: str,
+        template_name: str,
+        template_body: dict,
+        attempts: int = 0,
+    ) -> str:
+        """
+        Queue a message for delivery.
+
+        :param str recipient: The recipient's email address.
+        :param str subject: The subject of the message.
+        :param str template_name: The template used to render the message body.
+        :param dict template_body: The variables passed to the template.
+        :param int attempts: The number of failed delivery attempts so far.
+        :return: The id of the stream entry.
+        :rtype: str
+        """
+
+        fields = {
+            "recipient": recipient,
+            "subject": subject,
+            "template": template_name,
+            "body": json.dumps(template_body),
+            "attempts": attempts,
+        }
+        redis = await self.redis_cache
+        return await redis.xadd(
+            self.stream, fields, maxlen=self.maxlen, approximate=True
+        )
+
+    async def ensure_group(self) -> None:
+        """
+        Create the consumer group of the stream if it does not exist yet.
+
+        :return: None
+        """
+
+        redis = await self.redis_cache
+        try:
+            await redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except Exception as err:
+            if "BUSYGROUP" not in str(err):
+                raise
+
+    async def read(
+        self, consumer: str, count: int, block: int, pending: bool = False
+    ) -> list[tuple[str, dict]]:
+        """
+        Read a batch of messages for a worker.
+
+        :param str consumer: The name of the worker in the consumer group.
+        :param int count: The maximum number of messages to read.
+        :param int block: How long to wait for new messages, in milliseconds.
+        :param bool pending: Read messages delivered to this worker but never acknowledged.
+        :return: A list of (entry id, fields) pairs.
+        :rtype: list[tuple[str, dict]]
+        """
+
+        redis = await self.redis_cache
+        response = await redis.xreadgroup(
+            self.group,
+            consumer,
+            {self.stream: "0" if pending else ">"},
+            count=count,
+            block=None if pending else block,
+        )
+        if not response:
+            return []
+        # Entries trimmed from the stream while pending come back without fields
+        return [
+            (_decode(entry_id), {_decode(k): _decode(v) for k, v in (fields or {}).items()})
+            for entry_id, fields in response[0][1]
+        ]
+
+    async def claim(
+        self, consumer: str, min_idle_time: int, count: int, start: str = "0-0"
+    ) -> tuple[str, list[tuple[str, dict]]]:
+        """
+        Claim messages left unacknowledged by other workers for too long.
+
+        :param str consumer: The name of the worker claiming the messages.
+        :param int min_idle_time: How long a message must have been pending, in milliseconds.
+        :param int count: The maximum number of messages to claim.
+        :param str start: The id from which the pending messages are scanned.
+        :return: The id to continue the scan from, and a list of (entry id, fields) pairs.
+        :rtype: tuple[str, list[tuple[str, dict]]]
+        """
+
+        redis = await self.redis_cache
+        response = await redis.xautoclaim(
+            self.stream, self.group, consumer, min_idle_time, start_id=start, count=count
+        )
+        return _decode(response[0]), [
+            (_decode(entry_id), {_decode(k): _decode(v) for k, v in (fields or {}).items()})
+            for entry_id, fields in response[1]
+        ]
+
+    async def ack(self, entry_ids: list[str]) -> None:
+        """
+        Acknowledge and remove handled messages.
+
+        :param list[str] entry_ids: The ids of the handled stream entries.
+        :return: None
+        """
+
+        if not entry_ids:
+            return
+        redis = await self.redis_cache
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.xack(self.stream, self.group, *entry_ids)
+            pipe.xdel(self.stream, *entry_ids)
+            await pipe.execute()
+
+    async def schedule_retry(self, fields: dict, due: float) -> None:
+        """
+        Keep a failed message aside until its next attempt is due.
+
+        :param dict fields: The fields of the message, with the updated attempt count.
+        :param float due: The UNIX time of the next attempt.
+        :return: None
+        """
+
+        redis = await self.redis_cache
+        await redis.zadd(self.retry_key, {json.dumps(fields): due})
+
+    async def requeue_due(self, now: float) -> int:
+        """
+        Move messages whose next attempt is due back to the stream.
+
+        :param float now: The current UNIX time.
+        :return: The number of requeued messages.
+        :rtype: int
+        """
+
+        redis = await self.redis_cache
+        due = await redis.zrangebyscore(self.retry_key, "-inf", now)
+        for member in due:
+            # Only the worker that removed the member requeues it
+            if await redis.zrem(self.retry_key, member):
+                fields = json.loads(member)
+                await redis.xadd(
+                    self.stream, fields, maxlen=self.maxlen, approximate=True
+                )
+        return len(due)
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+email_outbox = EmailOutbox()
+
+
 async def send_email(email: EmailStr, username: str, host: str):
-    """The send_email function sends an email to the user with a link to confirm their email address.
+    """The send_email function queues an email to the user with a link to confirm their email address.
 
     The function takes in three arguments:
 
@@ -31,53 +225,45 @@ async def send_email(email: EmailStr, username: str, host: str):
     - username: the username of the user who is registering. This will be displayed in their confirmation message so they know it was sent to them and not someone else.
     - host: this is where we are hosting our application, which will be used as part of our confirmation link.
 
+    The message is delivered later by the email worker, so the caller does not wait for the SMTP server.
+
     :param email: EmailStr: Specify the email address of the recipient
     :param username: str: Pass the username of the user to be sent in the email
     :param host: str: Pass the hostname of your application to the template
-    :return: A coroutine object
+    :return: The id of the queued message
 
     """
 
-    try:
-        token_verification = auth_service.create_email_token({"email": email})
-        message = MessageSchema(
-            subject="Confirm your email ",
-            recipients=[email],
-            template_body={
-                "host": host,
-                "username": username,
-                "token": token_verification,
-            },
-            subtype=MessageType.html,
-        )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="example_email.html")
-    except ConnectionErrors as e:
-        raise e
+    token_verification = auth_service.create_email_token({"email": email})
+    return await email_outbox.enqueue(
+        recipient=email,
+        subject="Confirm your email ",
+        template_name="example_email.html",
+        template_body={
+            "host": str(host),
+            "username": username,
+            "token": token_verification,
+        },
+    )
 
 
 async def reset_password_by_email(
     email: EmailStr, username: str, reset_token: str, host: str
 ):
-    """Send an email to reset a user's password.
+    """Queue an email to reset a user's password.
 
-    This function sends an email to the user with a link to reset their account password.
+    This function queues an email to the user with a link to reset their account password.
 
     :param email: EmailStr: The recipient's email address.
     :param username: str: The username of the user receiving the email.
     :param reset_token: str: The password reset token.
     :param host: str: The hostname of your application for the reset link.
+    :return: The id of the queued message
     """
-    try:
-        message = MessageSchema(
-            subject="Reset account ",
-            recipients=[email],
-            template_body={"host": host, "username": username, "token": reset_token},
-            subtype=MessageType.html,
-        )
 
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="reset_password.html")
-    except ConnectionErrors as e:
-        raise e
+    return await email_outbox.enqueue(
+        recipient=email,
+        subject="Reset account ",
+        template_name="reset_password.html",
+        template_body={"host": str(host), "username": username, "token": reset_token},
+    )
@@ -0,0 +1,385 @@
+import asyncio
+import json
+import os
+import socket
+import time
+from contextlib import asynccontextmanager
+from email.message import EmailMessage
+from email.utils import formataddr
+from pathlib import Path
+
+import aiosmtplib
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from uvicorn.config import logger
+
+from src.conf.constants import (
+    EMAIL_SMTP_POOL_SIZE,
+    EMAIL_BATCH_SIZE,
+    EMAIL_CLAIM_MIN_IDLE,
+    EMAIL_MAX_ATTEMPTS,
+)
+from src.services.email import conf, email_outbox, EmailOutbox
+
+
+class TemplateRenderer:
+    """
+    Renderer of email templates.
+
+    Every template of the folder is compiled once, when the renderer is created.
+
+    :param Path folder: The folder holding the email templates.
+    """
+
+    def __init__(self, folder: Path):
+        self.env = Environment(
+            loader=FileSystemLoader(folder),
+            autoescape=select_autoescape(["html", "xml"]),
+        )
+        self.templates = {
+            name: self.env.get_template(name) for name in self.env.list_templates()
+        }
+
+    def render(self, template_name: str, template_body: dict) -> str:
+        """
+        Render a template.
+
+        :param str template_name: The name of the template.
+        :param dict template_body: The variables passed to the template.
+        :return: The rendered template.
+        :rtype: str
+        """
+
+        template = self.templates.get(template_name)
+        if template is None:
+            template = self.templates[template_name] = self.env.get_template(
+                template_name
+            )
+        return template.render(**template_body)
+
+
+class SMTPPool:
+    """
+    Pool of open SMTP connections.
+
+    Connections are opened on first use and reused for the following messages.
+    A connection that failed is closed and replaced by a new one on the next send.
+
+    :param int size: The maximum number of open connections.
+    :param smtp_options: The options passed to :class:`aiosmtplib.SMTP`.
+    """
+
+    def __init__(self, size: int = EMAIL_SMTP_POOL_SIZE, **smtp_options):
+        self.size = size
+        self.smtp_options = smtp_options
+        self.connections = 0
+        self._clients = asyncio.Queue()
+        for _ in range(size):
+            self._clients.put_nowait(None)
+
+    @classmethod
+    def from_config(cls, config=conf, size: int = EMAIL_SMTP_POOL_SIZE) -> "SMTPPool":
+        """
+        Create a pool from the fastapi-mail connection config.
+
+        :param ConnectionConfig config: The mail connection config.
+        :param int size: The maximum number of open connections.
+        :return: The pool.
+        :rtype: SMTPPool
+        """
+
+        credentials = {}
+        if config.USE_CREDENTIALS:
+            credentials = {
+                "username": config.MAIL_USERNAME,
+                "password": config.MAIL_PASSWORD.get_secret_value(),
+            }
+        return cls(
+            size,
+            hostname=config.MAIL_SERVER,
+            port=config.MAIL_PORT,
+            use_tls=config.MAIL_SSL_TLS,
+            start_tls=config.MAIL_STARTTLS,
+            validate_certs=config.VALIDATE_CERTS,
+            timeout=config.TIMEOUT,
+            **credentials,
+        )
+
+    @asynccontextmanager
+    async def connection(self):
+        """
+        Borrow an open connection from the pool.
+
+        :return: The SMTP client.
+        :rtype: aiosmtplib.SMTP
+        """
+
+        client = await self._clients.get()
+        try:
+            if client is None or not client.is_connected:
+                client = aiosmtplib.SMTP(**self.smtp_options)
+                await client.connect()
+                self.connections += 1
+            yield client
+        except Exception:
+            if client is not None:
+                client.close()
+            client = None
+            raise
+        finally:
+            self._clients.put_nowait(client)
+
+    async def send(self, message: EmailMessage) -> None:
+        """
+        Send a message through a pooled connection.
+
+        :param EmailMessage message: The message to send.
+        :return: None
+        """
+
+        async with self.connection() as client:
+            await client.send_message(message)
+
+    async def close(self) -> None:
+        """
+        Close every open connection of the pool.
+
+        :return: None
+        """
+
+        clients = []
+        while not self._clients.empty():
+            clients.append(self._clients.get_nowait())
+        for client in clients:
+            if client is not None and client.is_connected:
+                try:
+                    await client.quit()
+                except aiosmtplib.SMTPException:
+                    client.close()
+            self._clients.put_nowait(None)
+
+
+class EmailWorker:
+    """
+    Worker delivering the messages of the email outbox.
+
+    Messages are read from the outbox in batches and sent concurrently over the
+    pooled SMTP connections. A failed message is retried with exponential backoff
+    until ``max_attempts`` is reached. Messages left unacknowledged by a previous
+    run of the same worker are delivered first, and messages left unacknowledged
+    by any worker for ``claim_min_idle`` seconds are claimed and delivered again.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        worker = create_email_worker()
+        worker.start()
+        ...
+        await worker.stop()
+
+    :param EmailOutbox outbox: The outbox to drain.
+    :param SMTPPool pool: The SMTP connection pool.
+    :param TemplateRenderer renderer: The email template renderer.
+    :param str consumer: The name of the worker in the outbox consumer group, the host name and process ID by default.
+    :param int batch_size: The maximum number of messages sent concurrently.
+    :param int max_attempts: The number of delivery attempts before a message is dropped.
+    :param float base_delay: The delay before the first retry, in seconds.
+    :param float max_delay: The maximum delay between two retries, in seconds.
+    :param float claim_min_idle: How long a message stays unacknowledged before it is claimed, in seconds.
+    """
+
+    def __init__(
+        self,
+        outbox: EmailOutbox,
+        pool: SMTPPool,
+        renderer: TemplateRenderer,
+        consumer: str | None = None,
+        batch_size: int = EMAIL_BATCH_SIZE,
+        max_attempts: int = EMAIL_MAX_ATTEMPTS,
+        base_delay: float = 2.0,
+        max_delay: float = 300.0,
+        claim_min_idle: float = EMAIL_CLAIM_MIN_IDLE,
+        sender: str = formataddr((conf.MAIL_FROM_NAME, conf.MAIL_FROM)),
+    ):
+        self.outbox = outbox
+        self.pool = pool
+        self.renderer = renderer
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.claim_min_idle = claim_min_idle
+        self.sender = sender
+        self._claim_start = "0-0"
+        self._task = None
+
+    def build_message(self, fields: dict) -> EmailMessage:
+        """
+        Build the email of a queued message.
+
+        :param dict fields: The fields of the queued message.
+        :return: The email ready to be sent.
+        :rtype: EmailMessage
+        """
+
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = fields["recipient"]
+        message["Subject"] = fields["subject"]
+        html = self.renderer.render(fields["template"], json.loads(fields["body"]))
+        message.set_content(html, subtype="html")
+        return message
+
+    def retry_delay(self, attempts: int) -> float:
+        """
+        Get the delay before the next delivery attempt.
+
+        :param int attempts: The number of failed attempts so far.
+        :return: The delay, in seconds.
+        :rtype: float
+        """
+
+        return min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+
+    async def deliver(self, fields: dict) -> bool:
+        """
+        Deliver a queued message, scheduling a retry if it fails.
+
+        :param dict fields: The fields of the queued message.
+        :return: Whether the message was sent.
+        :rtype: bool
+        """
+
+        if not fields:
+            return False
+        try:
+            await self.pool.send(self.build_message(fields))
+            return True
+        except Exception as err:
+            attempts = int(fields.get("attempts", 0)) + 1
+            if attempts >= self.max_attempts:
+                logger.error(
+                    f"Email to {fields['recipient']} dropped after {attempts} attempts: {err}"
+                )
+                return False
+            logger.warning(f"Email to {fields['recipient']} failed, retrying: {err}")
+            await self.outbox.schedule_retry(
+                {**fields, "attempts": attempts},
+                time.time() + self.retry_delay(attempts),
+            )
+            return False
+
+    async def process(self, batch: list[tuple[str, dict]]) -> int:
+        """
+        Deliver a batch of queued messages and acknowledge them.
+
+        Failed messages are acknowledged as well, since their retries are
+        already scheduled.
+
+        :param list[tuple[str, dict]] batch: The (entry id, fields) pairs to deliver.
+        :return: The number of sent messages.
+        :rtype: int
+        """
+
+        if not batch:
+            return 0
+        sent = await asyncio.gather(*(self.deliver(fields) for _, fields in batch))
+        await self.outbox.ack([entry_id for entry_id, _ in batch])
+        return sum(sent)
+
+    async def claim_stale(self) -> int:
+        """
+        Deliver a batch of the messages left unacknowledged by other workers.
+
+        :return: The number of sent messages.
+        :rtype: int
+        """
+
+        self._claim_start, batch = await self.outbox.claim(
+            self.consumer,
+            int(self.claim_min_idle * 1000),
+            self.batch_size,
+            self._claim_start,
+        )
+        return await self.process(batch)
+
+    async def start_up(self) -> None:
+        """
+        Create the consumer group and deliver the messages left pending by this worker.
+
+        :return: None
+        """
+
+        await self.outbox.ensure_group()
+        while batch := await self.outbox.read(
+            self.consumer, self.batch_size, 0, pending=True
+        ):
+            await self.process(batch)
+
+    async def run(self) -> None:
+        """
+        Drain the outbox until the worker is cancelled.
+
+        :return: None
+        """
+
+        started = False
+        while True:
+            try:
+                if not started:
+                    await self.start_up()
+                    started = True
+                await self.outbox.requeue_due(time.time())
+                await self.claim_stale()
+                batch = await self.outbox.read(
+                    self.consumer, self.batch_size, block=1000
+                )
+                await self.process(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                logger.error(f"Email worker failed: {err}")
+                await asyncio.sleep(self.base_delay)
+
+    def start(self) -> asyncio.Task:
+        """
+        Start the worker on the running event loop.
+
+        :return: The task running the worker.
+        :rtype: asyncio.Task
+        """
+
+        self._task = asyncio.create_task(self.run(), name="email_worker")
+        return self._task
+
+    async def stop(self) -> None:
+        """
+        Stop the worker and close its SMTP connections.
+
+        :return: None
+        """
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        await self.pool.close()
+
+
+def create_email_worker() -> EmailWorker:
+    """
+    Create the email worker of the application.
+
+    :return: The worker draining :data:`src.services.email.email_outbox`.
+    :rtype: EmailWorker
+    """
+
+    return EmailWorker(
+        email_outbox,
+        SMTPPool.from_config(conf),
+        TemplateRenderer(conf.TEMPLATE_FOLDER),
+    )
@@ -0,0 +1,227 @@
+import asyncio
+import random
+from typing import Awaitable, Callable
+
+from uvicorn.config import logger
+
+from src.conf.config import init_async_redis
+
+from src.conf.constants import DB_HOLD_REPORT_ROUTES, LEADERBOARD_REBUILD_BATCH_SIZE
+
+from src.database.connect_db import connection_hold_timer, sessionmanager
+from src.repository import counters as repository_counters
+from src.repository import photos as repository_photos
+from src.repository import ratings as repository_ratings
+from src.repository import users as repository_users
+from src.services.leaderboards import photo_leaderboards
+from src.services.photo_fragments import photo_fragments
+from src.services.rating_buffer import rating_buffer
+
+
+class JobLeases:
+    """
+    Redis leases letting a single worker run a job per interval.
+
+    A lease is a key set with ``NX`` that expires by itself, so it is never
+    released: the workers that fail to take it skip the run, and a worker that
+    dies while running the job does not block the next interval.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        if await job_leases.acquire("reconcile_counters", COUNTERS_RECONCILE_INTERVAL):
+            await reconcile_counters()
+
+    :param str namespace: The prefix of the Redis keys.
+    """
+
+    def __init__(self, namespace: str = "job:lease"):
+        self.namespace = namespace
+        self._redis_cache = None
+
+    @property
+    async def redis_cache(self):
+        """
+        Get the Redis client holding the leases.
+
+        :return: The Redis client.
+        :rtype: redis.asyncio.Redis
+        """
+
+        if self._redis_cache is None:
+            self._redis_cache = await init_async_redis()
+        return self._redis_cache
+
+    async def acquire(self, name: str, ttl: float) -> bool:
+        """
+        Take the lease of a job if no worker holds it.
+
+        :param str name: The name of the job.
+        :param float ttl: The lifetime of the lease, in seconds.
+        :return: Whether the lease was taken.
+        :rtype: bool
+        """
+
+        redis = await self.redis_cache
+        return bool(
+            await redis.set(f"{self.namespace}:{name}", 1, nx=True, px=int(ttl * 1000))
+        )
+
+
+job_leases = JobLeases()
+
+
+async def purge_blacklist() -> int:
+    """
+    Purge expired tokens from the blacklist.
+
+    :return: The number of deleted blacklist entries.
+    :rtype: int
+    """
+
+    async with sessionmanager.session() as db:
+        deleted = await repository_users.purge_expired_blacklist(db)
+    if deleted:
+        logger.info(f"--- Purged {deleted} expired blacklisted tokens ---")
+    return deleted
+
+
+async def reconcile_counters() -> int:
+    """
+    Correct the photo, comment, rating and follow counters of users and photos
+    that drifted from the rows they count.
+
+    :return: The number of corrected users and photos.
+    :rtype: int
+    """
+
+    async with sessionmanager.session() as db:
+        corrected = await repository_counters.reconcile_counters(db)
+    if corrected:
+        logger.warning(f"--- Corrected the counters of {corrected} users and photos ---")
+    return corrected
+
+
+async def flush_ratings() -> int:
+    """
+    Insert the rating votes buffered in write-behind mode.
+
+    :return: The number of flushed votes.
+    :rtype: int
+    """
+
+    batch, votes = await rating_buffer.take()
+    if batch is None:
+        return 0
+    async with sessionmanager.session() as db:
+        photo_ids = await repository_ratings.insert_ratings(votes, db)
+        await rating_buffer.done(batch)
+        await photo_leaderboards.refresh(photo_ids, db)
+    await photo_fragments.bump_many(photo_ids)
+    return len(votes)
+
+
+async def rebuild_leaderboards(batch_size: int = LEADERBOARD_REBUILD_BATCH_SIZE) -> int:
+    """
+    Recompute the photo leaderboards from the counters of every photo.
+
+    :param int batch_size: The number of photos scored per batch.
+    :return: The number of scored photos.
+    :rtype: int
+    """
+
+    async with sessionmanager.session() as db:
+
+        async def batches():
+            after_id = 0
+            while rows := await repository_photos.get_score_counters_batch(
+                after_id, batch_size, db
+            ):
+                yield rows
+                after_id = rows[-1].id
+
+        scored = await photo_leaderboards.rebuild(batches(), db)
+    logger.info(f"--- Rebuilt the photo leaderboards of {scored} photos ---")
+    return scored
+
+
+async def report_pool_status() -> dict:
+    """
+    Log the state and the checkout statistics of the database pool, and the
+    routes holding connections the longest.
+
+    :return: The reported pool status.
+    :rtype: dict
+    """
+
+    status = sessionmanager.pool_status()
+    if status:
+        checkouts = status["checkouts"]
+        mean_wait = status["wait_time"] / checkouts if checkouts else 0
+        logger.info(
+            f"--- Database pool: {status['checked_out']}/{status['size']} checked "
+            f"out, {status['overflow']} overflow, {checkouts} checkouts, "
+            f"mean wait {mean_wait * 1e3:.1f} ms, "
+            f"max wait {status['max_wait'] * 1e3:.1f} ms, "
+            f"{status['timeouts']} timeouts ---"
+        )
+    for route, hold in connection_hold_timer.report(DB_HOLD_REPORT_ROUTES).items():
+        logger.info(
+            f"--- Connection hold of {route}: {hold['transactions']} checkouts, "
+            f"mean {hold['mean'] * 1e3:.1f} ms, max {hold['max'] * 1e3:.1f} ms ---"
+        )
+    return status
+
+
+async def run_periodically(
+    job: Callable[[], Awaitable], interval: float, exclusive: bool = False
+) -> None:
+    """
+    Run a job forever, waiting ``interval`` seconds between runs.
+
+    The first run waits a random part of the interval, so the workers started
+    by a deploy do not all run the job at once. An exclusive job only runs in
+    the worker holding its lease, i.e. once per interval across the workers.
+    Errors are logged and do not stop the loop.
+
+    :param job: The coroutine function to run.
+    :param float interval: The pause between two runs, in seconds.
+    :param bool exclusive: Whether a single worker runs the job per interval.
+    :return: None
+    """
+
+    await asyncio.sleep(random.uniform(0, interval))
+    while True:
+        try:
+            if not exclusive or await job_leases.acquire(job.__name__, interval):
+                await job()
+        except Exception as err:
+            logger.error(f"Periodic job {job.__name__} failed: {err}")
+        await asyncio.sleep(interval)
+
+
+def start_periodic(
+    job: Callable[[], Awaitable], interval: float, exclusive: bool = False
+) -> asyncio.Task:
+    """
+    Schedule a job to run periodically on the running event loop.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        task = start_periodic(purge_blacklist, BLACKLIST_PURGE_INTERVAL, exclusive=True)
+        ...
+        task.cancel()
+
+    :param job: The coroutine function to run.
+    :param float interval: The pause between two runs, in seconds.
+    :param bool exclusive: Whether a single worker runs the job per interval.
+    :return: The task running the job.
+    :rtype: asyncio.Task
+    """
+
+    return asyncio.create_task(
+        run_periodically(job, interval, exclusive), name=job.__name__
+    )
@@ -0,0 +1,292 @@
+import math
+import time
+import uuid
+from datetime import datetime
+from typing import AsyncIterable, Iterable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.conf.config import init_async_redis
+from src.conf.constants import (
+    LEADERBOARD_PRIOR_MEAN,
+    LEADERBOARD_PRIOR_WEIGHT,
+    LEADERBOARD_TRENDING_HALF_LIFE,
+)
+from src.repository import photos as repository_photos
+
+BOARDS = ("top", "trending")
+TRENDING_EPOCH = datetime(2023, 1, 1)
+# Photos touched this long before a rebuild started are replayed too, against clock skew
+REPLAY_SLACK = 60
+
+
+class PhotoLeaderboards:
+    """
+    Leaderboards of photos kept in Redis sorted sets.
+
+    * ``top`` ranks photos by the Bayesian average of their ratings: every photo
+      gets ``prior_weight`` extra votes at ``prior_mean``, so a single 5 does not
+      outrank a hundred 4s.
+    * ``trending`` ranks photos by ``log2(1 + ratings + comments)`` plus their
+      creation time in half-lives. A photo ``half_life`` seconds older needs
+      twice the ratings and comments to rank the same. Older photos sink without
+      rescoring, and the scores stay small.
+
+    Both scores are computed from the counters of the photo row, so they are
+    refreshed after each rating and comment write, and can be rebuilt from the
+    database at any time. Refreshed and removed photos are recorded with the
+    time they were touched, so a rebuild replays the writes it raced with.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        await photo_leaderboards.refresh([photo_id], db)  # after the write is committed
+        photo_ids, cursor = await photo_leaderboards.page("top", None, 10)
+
+    :param str namespace: The prefix of the Redis keys.
+    :param float prior_mean: The rating of a photo without votes.
+    :param float prior_weight: The number of votes at ``prior_mean`` added to every photo.
+    :param float half_life: The trending half-life, in seconds.
+    """
+
+    def __init__(
+        self,
+        namespace: str = "leaderboard:photos",
+        prior_mean: float = LEADERBOARD_PRIOR_MEAN,
+        prior_weight: float = LEADERBOARD_PRIOR_WEIGHT,
+        half_life: float = LEADERBOARD_TRENDING_HALF_LIFE,
+    ):
+        self.namespace = namespace
+        self.prior_mean = prior_mean
+        self.prior_weight = prior_weight
+        self.half_life = half_life
+        self._redis_cache = None
+
+    @property
+    async def redis_cache(self):
+        """
+        Get the Redis client holding the leaderboards.
+
+        :return: The Redis client.
+        :rtype: redis.asyncio.Redis
+        """
+
+        if self._redis_cache is None:
+            self._redis_cache = await init_async_redis()
+        return self._redis_cache
+
+    def key(self, board: str) -> str:
+        return f"{self.namespace}:{board}"
+
+    @property
+    def touched_key(self) -> str:
+        return f"{self.namespace}:touched"
+
+    def scores(self, row) -> dict[str, float]:
+        """
+        Compute the scores of a photo.
+
+        :param row: The id, created_at, ratings_count, ratings_sum and comments_count of the photo.
+        :return: The score of the photo on each leaderboard.
+        :rtype: dict[str, float]
+        """
+
+        top = (self.prior_weight * self.prior_mean + row.ratings_sum) / (
+            self.prior_weight + row.ratings_count
+        )
+        age = (row.created_at.replace(tzinfo=None) - TRENDING_EPOCH).total_seconds()
+        trending = math.log2(1 + row.ratings_count + row.comments_count) + age / self.half_life
+        return {"top": top, "trending": trending}
+
+    def mappings(self, rows: Iterable) -> dict[str, dict[int, float]]:
+        """
+        Compute the scores of a batch of photos.
+
+        :param rows: The score counters of the photos.
+        :return: The ``{photo id: score}`` mapping of each leaderboard.
+        :rtype: dict[str, dict[int, float]]
+        """
+
+        mappings = {board: {} for board in BOARDS}
+        for row in rows:
+            for board, score in self.scores(row).items():
+                mappings[board][row.id] = score
+        return mappings
+
+    async def update(self, rows: Iterable) -> None:
+        """
+        Store the scores of photos in a single Redis round trip.
+
+        :param rows: The score counters of the photos.
+        :return: None
+        """
+
+        mappings = self.mappings(rows)
+        if not mappings["top"]:
+            return
+        redis = await self.redis_cache
+        now = time.time()
+        async with redis.pipeline(transaction=False) as pipe:
+            for board, mapping in mappings.items():
+                pipe.zadd(self.key(board), mapping)
+            pipe.zadd(self.touched_key, {photo_id: now for photo_id in mappings["top"]})
+            await pipe.execute()
+
+    async def refresh(self, photo_ids: Iterable[int], db: AsyncSession) -> None:
+        """
+        Rescore photos whose ratings or comments changed.
+
+        :param photo_ids: The IDs of the changed photos.
+        :param AsyncSession db: An asynchronous database session.
+        :return: None
+        """
+
+        await self.update(await repository_photos.get_score_counters(list(photo_ids), db))
+
+    async def remove(self, photo_id: int) -> None:
+        """
+        Remove a deleted photo from the leaderboards.
+
+        :param int photo_id: The ID of the deleted photo.
+        :return: None
+        """
+
+        redis = await self.redis_cache
+        async with redis.pipeline(transaction=False) as pipe:
+            for board in BOARDS:
+                pipe.zrem(self.key(board), photo_id)
+            pipe.zadd(self.touched_key, {photo_id: time.time()})
+            await pipe.execute()
+
+    async def page(
+        self, board: str, cursor: str | None, limit: int
+    ) -> tuple[list[int], str | None]:
+        """
+        Read a page of a leaderboard, best photos first.
+
+        The cursor holds the score and the ID of the last photo of the previous
+        page. The next page starts right after that photo while its score is
+        unchanged. Otherwise it starts below the score of the cursor.
+
+        :param str board: ``top`` or ``trending``.
+        :param cursor: The cursor returned with the previous page, or None for the first page.
+        :param int limit: The maximum number of photos in the page.
+        :return: The IDs of the photos, and the cursor of the next page or None after the last page.
+        :rtype: tuple[list[int], str | None]
+        :raises ValueError: If the cursor is not valid.
+        """
+
+        key = self.key(board)
+        redis = await self.redis_cache
+        if cursor is None:
+            entries = await redis.zrevrange(key, 0, limit - 1, withscores=True)
+        else:
+            score, photo_id = decode_cursor(cursor)
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.zscore(key, photo_id)
+                pipe.zrevrank(key, photo_id)
+                current, rank = await pipe.execute()
+            if current == score and rank is not None:
+                entries = await redis.zrevrange(
+                    key, rank + 1, rank + limit, withscores=True
+                )
+            else:
+                entries = await redis.zrevrangebyscore(
+                    key, f"({score!r}", "-inf", start=0, num=limit, withscores=True
+                )
+
+        photo_ids = [int(member) for member, _ in entries]
+        if len(entries) < limit:
+            return photo_ids, None
+        return photo_ids, encode_cursor(entries[-1][1], photo_ids[-1])
+
+    async def rebuild(
+        self, batches: AsyncIterable[list], db: AsyncSession | None = None
+    ) -> int:
+        """
+        Recompute the leaderboards from batches of score counters.
+
+        Each batch is scored and written in one Redis round trip into sorted sets
+        of this run only. These replace the live ones at once when the last batch
+        is written, so readers never see a partial leaderboard. The photos
+        refreshed or removed while the rebuild ran are then rescored from ``db``,
+        since the swap dropped their scores.
+
+        :param batches: The score counters of every photo, in batches.
+        :param db: An asynchronous database session used to replay the photos touched during the rebuild.
+        :return: The number of scored photos.
+        :rtype: int
+        """
+
+        redis = await self.redis_cache
+        started = time.time() - REPLAY_SLACK
+        run = uuid.uuid4().hex
+        new_keys = {board: f"{self.key(board)}:rebuild:{run}" for board in BOARDS}
+
+        scored = 0
+        try:
+            async for rows in batches:
+                mappings = self.mappings(rows)
+                async with redis.pipeline(transaction=False) as pipe:
+                    for board, mapping in mappings.items():
+                        if mapping:
+                            pipe.zadd(new_keys[board], mapping)
+                    await pipe.execute()
+                scored += len(mappings["top"])
+
+            async with redis.pipeline(transaction=True) as pipe:
+                for board, new_key in new_keys.items():
+                    if scored:
+                        pipe.rename(new_key, self.key(board))
+                    else:
+                        pipe.delete(self.key(board))
+                await pipe.execute()
+        except BaseException:
+            await redis.delete(*new_keys.values())
+            raise
+
+        if db is not None:
+            await self.replay(started, db)
+        return scored
+
+    async def replay(self, since: float, db: AsyncSession) -> None:
+        """
+        Rescore the photos touched since a time, and forget older touches.
+
+        :param float since: The UNIX time from which touched photos are rescored.
+        :param AsyncSession db: An asynchronous database session.
+        :return: None
+        """
+
+        redis = await self.redis_cache
+        photo_ids = [
+            int(member) for member in await redis.zrangebyscore(self.touched_key, since, "+inf")
+        ]
+        await redis.zremrangebyscore(self.touched_key, "-inf", f"({since!r}")
+        if not photo_ids:
+            return
+
+        rows = await repository_photos.get_score_counters(photo_ids, db)
+        await self.update(rows)
+        deleted = set(photo_ids) - {row.id for row in rows}
+        if deleted:
+            async with redis.pipeline(transaction=False) as pipe:
+                for board in BOARDS:
+                    pipe.zrem(self.key(board), *deleted)
+                await pipe.execute()
+
+
+def encode_cursor(score: float, photo_id: int) -> str:
+    return f"{score!r}:{photo_id}"
+
+
+def decode_cursor(cursor: str) -> tuple[float, int]:
+    score, photo_id = cursor.rsplit(":", 1)
+    score = float(score)
+    if not math.isfinite(score):
+        raise ValueError(f"Cursor score out of range: {score}")
+    return score, int(photo_id)
+
+
+photo_leaderboards = PhotoLeaderboards()
@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Awaitable, Callable, Hashable
+
+from fastapi import Request, Response, status
+
+from src.conf.constants import PAGE_CACHE_SIZE
+
+
+@dataclass(frozen=True)
+class CachedPage:
+    """
+    A rendered page with its validators.
+
+    :param bytes body: The encoded page.
+    :param str media_type: The media type of the page.
+    :param str etag: The entity tag of the page.
+    :param int modified: The UNIX time the page was rendered, in whole seconds.
+    """
+
+    body: bytes
+    media_type: str
+    etag: str
+    modified: int
+
+    @property
+    def last_modified(self) -> str:
+        return formatdate(self.modified, usegmt=True)
+
+    def is_fresh(self, request: Request) -> bool:
+        """
+        Check whether the client already holds this version of the page.
+
+        ``If-None-Match`` takes precedence over ``If-Modified-Since``.
+
+        :param Request request: The conditional request.
+        :return: True if the page can be answered with 304 Not Modified.
+        :rtype: bool
+        """
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or self.etag in tags
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return self.modified <= since
+        return False
+
+    def response(self, request: Request) -> Response:
+        """
+        Answer a request with the page, or with 304 if the client copy is fresh.
+
+        :param Request request: The request to answer.
+        :return: The response.
+        :rtype: Response
+        """
+
+        headers = {
+            "ETag": self.etag,
+            "Last-Modified": self.last_modified,
+            "Cache-Control": "no-cache",
+        }
+        if self.is_fresh(request):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(self.body, media_type=self.media_type, headers=headers)
+
+
+class PageCache:
+    """
+    Cache of pages rendered once and served as bytes.
+
+    Pages are rendered lazily, once per key, e.g. per base URL. Concurrent
+    requests for a page being rendered wait for that render. The least recently
+    used pages are evicted beyond ``maxsize`` entries, since keys may come from
+    the ``Host`` header of the client.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        page = await page_cache.get(("dashboard", base_url), render, "text/html")
+        return page.response(request)
+
+    :param int maxsize: The maximum number of cached pages.
+    """
+
+    def __init__(self, maxsize: int = PAGE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._pages: OrderedDict[Hashable, CachedPage] = OrderedDict()
+        self._locks: dict[Hashable, asyncio.Lock] = {}
+
+    async def get(
+        self,
+        key: Hashable,
+        render: Callable[[], Awaitable[str | bytes]],
+        media_type: str = "text/html",
+    ) -> CachedPage:
+        """
+        Get a cached page, rendering it on the first request.
+
+        :param key: The key of the page.
+        :param render: The coroutine function rendering the page.
+        :param str media_type: The media type of the page.
+        :return: The cached page.
+        :rtype: CachedPage
+        """
+
+        page = self._pages.get(key)
+        if page is None:
+            lock = self._locks.setdefault(key, asyncio.Lock())
+            async with lock:
+                page = self._pages.get(key)
+                if page is None:
+                    body = await render()
+                    if isinstance(body, str):
+                        body = body.encode()
+                    page = CachedPage(
+                        body=body,
+                        media_type=media_type,
+                        etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+                        modified=int(time.time()),
+                    )
+                    self._pages[key] = page
+                    while len(self._pages) > self.maxsize:
+                        evicted, _ = self._pages.popitem(last=False)
+                        self._locks.pop(evicted, None)
+            self._locks.pop(key, None)
+        else:
+            self._pages.move_to_end(key)
+        return page
+
+    def clear(self) -> None:
+        """
+        Drop every cached page.
+
+        :return: None
+        """
+
+        self._pages.clear()
+
+
+page_cache = PageCache()
@@ -0,0 +1,127 @@
+from typing import Awaitable, Callable, Sequence
+
+from markupsafe import Markup
+
+from src.conf.config import init_async_redis
+from src.conf.constants import FRAGMENT_CACHE_TTL
+
+
+class FragmentCache:
+    """
+    Cache of rendered HTML fragments, e.g. the cards of the photo gallery.
+
+    Every object has a version counter in Redis, bumped by each write changing
+    its fragment. Fragments are stored under the id of the object, its current
+    version and a variant, so a bump makes the stale fragments unreachable and
+    they expire after ``ttl`` seconds. A page of cards costs two Redis round
+    trips plus one render per changed card.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        await photo_fragments.bump(photo_id)  # after the write is committed
+        cards = await photo_fragments.get_many(keys, render)
+
+    :param str namespace: The prefix of the Redis keys.
+    :param int ttl: The lifetime of a fragment, in seconds.
+    """
+
+    def __init__(self, namespace: str = "fragment:photo", ttl: int = FRAGMENT_CACHE_TTL):
+        self.namespace = namespace
+        self.ttl = ttl
+        self._redis_cache = None
+
+    @property
+    async def redis_cache(self):
+        """
+        Get the Redis client holding the fragments.
+
+        :return: The Redis client.
+        :rtype: redis.asyncio.Redis
+        """
+
+        if self._redis_cache is None:
+            self._redis_cache = await init_async_redis()
+        return self._redis_cache
+
+    def version_key(self, id: int) -> str:
+        return f"{self.namespace}:{id}:version"
+
+    def fragment_key(self, id: int, version: int, variant: str) -> str:
+        return f"{self.namespace}:{id}:{version}:{variant}"
+
+    async def bump(self, id: int) -> int:
+        """
+        Invalidate the fragments of an object.
+
+        :param int id: The id of the changed object.
+        :return: The new version of the object.
+        :rtype: int
+        """
+
+        redis = await self.redis_cache
+        return await redis.incr(self.version_key(id))
+
+    async def bump_many(self, ids: Sequence[int]) -> None:
+        """
+        Invalidate the fragments of several objects in one Redis round trip.
+
+        :param ids: The ids of the changed objects.
+        :return: None
+        """
+
+        if not ids:
+            return
+        redis = await self.redis_cache
+        async with redis.pipeline(transaction=False) as pipe:
+            for id in ids:
+                pipe.incr(self.version_key(id))
+            await pipe.execute()
+
+    async def get_many(
+        self,
+        keys: Sequence[tuple[int, str]],
+        render: Callable[[int], Awaitable[str]],
+    ) -> list[Markup]:
+        """
+        Get the fragments of a page, rendering only the missing ones.
+
+        Versions are read before rendering, so a fragment rendered while its
+        object changes is stored under the old version and never served.
+        Missing fragments are rendered one after another, since renders may
+        share a database session.
+
+        :param keys: The id and variant of each fragment, e.g. whether the viewer owns the photo.
+        :param render: The coroutine function rendering the fragment at the given position.
+        :return: The fragments, in the order of ``keys``.
+        :rtype: list[Markup]
+        """
+
+        if not keys:
+            return []
+        redis = await self.redis_cache
+        versions = await redis.mget([self.version_key(id) for id, _ in keys])
+        fragment_keys = [
+            self.fragment_key(id, int(version or 0), variant)
+            for (id, variant), version in zip(keys, versions)
+        ]
+        fragments = await redis.mget(fragment_keys)
+
+        rendered = {}
+        for index, fragment in enumerate(fragments):
+            if fragment is None:
+                rendered[index] = await render(index)
+        if rendered:
+            async with redis.pipeline(transaction=False) as pipe:
+                for index, fragment in rendered.items():
+                    pipe.set(fragment_keys[index], fragment, ex=self.ttl)
+                await pipe.execute()
+
+        return [
+            Markup(rendered[index] if fragment is None else fragment.decode())
+            for index, fragment in enumerate(fragments)
+        ]
+
+
+photo_fragments = FragmentCache()
@@ -0,0 +1,110 @@
+import json
+from collections import defaultdict
+
+from fastapi import WebSocket
+
+from src.database.models import Comment
+from src.services.chat import ChatHub, ChatConnection
+from src.services.chat_broker import RedisBroker
+
+
+def photo_room(photo_id: int) -> str:
+    """
+    Get the room name of a photo.
+
+    :param int photo_id: The photo ID.
+    :return: The room name.
+    :rtype: str
+    """
+
+    return f"photo:{photo_id}"
+
+
+class RoomHub(ChatHub):
+    """
+    Hub delivering every event only to the clients of its room.
+
+    A client may watch several rooms through one websocket, e.g. every photo of
+    a gallery page. Events are JSON objects carrying the name of their ``room``;
+    they travel through the broker channel of the hub like chat messages, so
+    every worker delivers them to its own clients.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        connection = await photo_rooms.connect(websocket, {photo_room(1)})
+        ...
+        photo_rooms.notify(photo_room(1), "comment_deleted", {"id": 7})
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rooms: dict[str, set[ChatConnection]] = defaultdict(set)
+
+    async def connect(self, websocket: WebSocket, rooms: set[str]) -> ChatConnection:
+        """
+        Accept a websocket and add it to some rooms.
+
+        :param WebSocket websocket: The websocket to accept.
+        :param set[str] rooms: The rooms watched by the client.
+        :return: The connection of the client.
+        :rtype: ChatConnection
+        """
+
+        connection = await super().connect(websocket)
+        connection.rooms = set(rooms)
+        for room in connection.rooms:
+            self.rooms[room].add(connection)
+        return connection
+
+    def remove(self, connection: ChatConnection) -> None:
+        super().remove(connection)
+        for room in connection.rooms:
+            members = self.rooms.get(room)
+            if members is not None:
+                members.discard(connection)
+                if not members:
+                    del self.rooms[room]
+
+    def fan_out(self, messages: list[str]) -> None:
+        by_room = defaultdict(list)
+        for message in messages:
+            by_room[json.loads(message)["room"]].append(message)
+        for room, room_messages in by_room.items():
+            members = self.rooms.get(room)
+            if members:
+                self.deliver(members, room_messages)
+
+    def notify(self, room: str, event: str, data: dict) -> None:
+        """
+        Push an event to the clients of a room.
+
+        :param str room: The room name.
+        :param str event: The event type.
+        :param dict data: The event data.
+        :return: None
+        """
+
+        self.publish(json.dumps({"room": room, "event": event, "data": data}))
+
+
+def comment_event(comment: Comment, username: str | None = None) -> dict:
+    """
+    Get the data of a comment event.
+
+    :param Comment comment: The comment.
+    :param str | None username: The username of the author, if known.
+    :return: The event data.
+    :rtype: dict
+    """
+
+    return {
+        "id": comment.id,
+        "text": comment.text,
+        "username": username,
+        "updated": bool(comment.update_status),
+    }
+
+
+photo_rooms = RoomHub(RedisBroker(), channel="photo:events")
@@ -0,0 +1,138 @@
+import time
+import uuid
+
+from src.conf.config import init_async_redis
+from src.conf.constants import RATING_BATCH_STALE_AFTER
+
+
+class RatingBuffer:
+    """
+    Write-behind buffer of rating votes stored in a Redis hash.
+
+    During vote storms on popular photos, handlers only add the vote to the hash
+    and return; :func:`src.services.jobs.flush_ratings` inserts the buffered
+    votes in bulk every few hundred milliseconds. The first vote of a user on a
+    photo is kept, like the unique constraint of the ratings table does.
+
+    Every flush takes the buffer by renaming the hash to a batch key of its own,
+    so votes arriving during a flush go to a fresh hash and concurrent flushes of
+    several workers never share a batch. Taken batches are tracked in a sorted
+    set by the time they were taken, and a batch is only deleted once its votes
+    are committed. A batch left by a failed flush is taken again by a later
+    flush after ``stale_after`` seconds: the insert skips the votes already
+    stored.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        if not await rating_buffer.add(photo_id, user.id, rating):
+            ...  # already voted
+        batch, votes = await rating_buffer.take()
+        ...  # insert the votes
+        await rating_buffer.done(batch)
+
+    :param str key: The Redis hash holding the buffered votes.
+    :param float stale_after: How long a taken batch waits for its flush before it is taken again, in seconds.
+    """
+
+    def __init__(self, key: str = "ratings:buffer", stale_after: float = RATING_BATCH_STALE_AFTER):
+        self.key = key
+        self.batches_key = f"{key}:batches"
+        self.stale_after = stale_after
+        self._redis_cache = None
+
+    @property
+    async def redis_cache(self):
+        """
+        Get the Redis client holding the buffer.
+
+        :return: The Redis client.
+        :rtype: redis.asyncio.Redis
+        """
+
+        if self._redis_cache is None:
+            self._redis_cache = await init_async_redis()
+        return self._redis_cache
+
+    async def add(self, photo_id: int, user_id: int, rating: int) -> bool:
+        """
+        Buffer a vote.
+
+        :param int photo_id: The ID of the rated photo.
+        :param int user_id: The ID of the voter.
+        :param int rating: The rating value.
+        :return: False if the user already has a vote on the photo in the buffer.
+        :rtype: bool
+        """
+
+        redis = await self.redis_cache
+        return bool(await redis.hsetnx(self.key, f"{photo_id}:{user_id}", rating))
+
+    async def _move(self, source: str) -> str | None:
+        # Renaming and tracking the batch are one transaction; a failed RENAME
+        # leaves a tracked key that does not exist, which is dropped here
+        batch = f"{self.key}:batch:{uuid.uuid4().hex}"
+        redis = await self.redis_cache
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.rename(source, batch)
+            pipe.zadd(self.batches_key, {batch: time.time()})
+            pipe.zrem(self.batches_key, source)
+            renamed, *_ = await pipe.execute(raise_on_error=False)
+        if isinstance(renamed, Exception):
+            await redis.zrem(self.batches_key, batch)
+            return None
+        return batch
+
+    async def take(self) -> tuple[str | None, list[dict]]:
+        """
+        Take the buffered votes for a flush.
+
+        A batch left by a failed flush for ``stale_after`` seconds is taken
+        before the votes buffered since.
+
+        :return: The key of the taken batch, None if there was nothing to take, and its votes as ``rating``, ``user_id`` and ``photo_id`` dicts.
+        :rtype: tuple[str | None, list[dict]]
+        """
+
+        redis = await self.redis_cache
+        batch = None
+        stale = await redis.zrangebyscore(
+            self.batches_key, "-inf", time.time() - self.stale_after, start=0, num=1
+        )
+        if stale:
+            batch = await self._move(_decode(stale[0]))
+        if batch is None:
+            batch = await self._move(self.key)
+        if batch is None:
+            # Nothing was buffered since the last flush
+            return None, []
+
+        votes = []
+        for field, rating in (await redis.hgetall(batch)).items():
+            photo_id, user_id = _decode(field).split(":")
+            votes.append(
+                {"rating": int(rating), "user_id": int(user_id), "photo_id": int(photo_id)}
+            )
+        return batch, votes
+
+    async def done(self, batch: str) -> None:
+        """
+        Drop a taken batch once its votes are stored.
+
+        :param str batch: The key returned by :meth:`take`.
+        :return: None
+        """
+
+        redis = await self.redis_cache
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.delete(batch)
+            pipe.zrem(self.batches_key, batch)
+            await pipe.execute()
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+rating_buffer = RatingBuffer()
@@ -0,0 +1,166 @@
+import uuid
+
+from fastapi import HTTPException, status
+
+from src.conf.config import init_async_redis
+from src.conf.constants import REFRESH_TOKEN_LIFE_TIME
+from src.conf.messages import INVALID_TOKEN
+from src.services.auth import auth_service
+
+FAMILY_PREFIX = "refresh:family:"
+
+# KEYS[1] - family key, KEYS[2] - user key, ARGV[1] - presented jti, ARGV[2] - new jti, ARGV[3] - ttl.
+# Returns 1 when the token was rotated, 0 when the family does not exist
+# and -1 when an already rotated token was reused (the family is revoked).
+ROTATE_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'jti')
+if not current then
+    return 0
+end
+if current ~= ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return -1
+end
+redis.call('HSET', KEYS[1], 'jti', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return 1
+"""
+
+# KEYS[1] - user key, ARGV[1] - prefix of the family keys.
+# Deletes every family of the user and returns their number.
+REVOKE_SCRIPT = """
+local families = redis.call('SMEMBERS', KEYS[1])
+for _, family in ipairs(families) do
+    redis.call('DEL', ARGV[1] .. family)
+end
+redis.call('DEL', KEYS[1])
+return #families
+"""
+
+
+class RefreshTokenStore:
+    """
+    Redis store of refresh tokens grouped into rotation families.
+
+    Every login starts a new family. Each refresh token carries the family id (``fam``)
+    and its own id (``jti``); the family keeps only the id of the latest token.
+    Refreshing swaps that id atomically, and presenting any older token of the family
+    is treated as token theft: the whole family is revoked and its owner has to log in again.
+
+    The families of a user are indexed by their email, so that logging out, a ban or a
+    password reset revokes all of them at once.
+
+    Families expire together with their latest refresh token, so no cleanup is needed.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        refresh_token = await refresh_token_store.issue(user.email)
+        email, refresh_token = await refresh_token_store.rotate(refresh_token)
+        await refresh_token_store.revoke(user.email)
+
+    """
+
+    def __init__(self, ttl: int = REFRESH_TOKEN_LIFE_TIME):
+        self.ttl = ttl
+        self._redis_cache = None
+        self._rotate_script = None
+        self._revoke_script = None
+
+    @property
+    async def redis_cache(self):
+        """
+        Get the Redis client used to store refresh token families.
+
+        :return: The Redis client.
+        :rtype: redis.asyncio.Redis
+        """
+
+        if self._redis_cache is None:
+            self._redis_cache = await init_async_redis()
+        return self._redis_cache
+
+    @staticmethod
+    def family_key(family: str) -> str:
+        return f"{FAMILY_PREFIX}{family}"
+
+    @staticmethod
+    def user_key(email: str) -> str:
+        return f"refresh:user:{email}"
+
+    async def _create_token(self, email: str, family: str, jti: str) -> str:
+        return await auth_service.create_refresh_token(
+            data={"email": email, "fam": family, "jti": jti}, expires_delta=self.ttl
+        )
+
+    async def issue(self, email: str) -> str:
+        """
+        Start a new rotation family and return its first refresh token.
+
+        :param email: str: The email of the user logging in.
+        :return: The encoded refresh token.
+        :rtype: str
+        """
+
+        family, jti = uuid.uuid4().hex, uuid.uuid4().hex
+        redis = await self.redis_cache
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self.family_key(family), mapping={"email": email, "jti": jti})
+            pipe.expire(self.family_key(family), self.ttl)
+            pipe.sadd(self.user_key(email), family)
+            pipe.expire(self.user_key(email), self.ttl)
+            await pipe.execute()
+        return await self._create_token(email, family, jti)
+
+    async def rotate(self, token: str) -> tuple[str, str]:
+        """
+        Exchange a refresh token for the next token of its family.
+
+        :param token: str: The refresh token presented by the client.
+        :return: The email of the token owner and the new refresh token.
+        :rtype: tuple[str, str]
+        :raises HTTPException 401: If the token is invalid, revoked or was already used.
+        """
+
+        payload = await auth_service.decode_refresh_token(token)
+        family, jti = payload.get("fam"), payload.get("jti")
+        if not family or not jti:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
+            )
+
+        redis = await self.redis_cache
+        if self._rotate_script is None:
+            self._rotate_script = redis.register_script(ROTATE_SCRIPT)
+
+        email = payload["email"]
+        new_jti = uuid.uuid4().hex
+        rotated = await self._rotate_script(
+            keys=[self.family_key(family), self.user_key(email)],
+            args=[jti, new_jti, self.ttl],
+        )
+        if rotated != 1:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TOKEN
+            )
+
+        return email, await self._create_token(email, family, new_jti)
+
+    async def revoke(self, email: str) -> int:
+        """
+        Revoke every refresh token family of a user.
+
+        :param email: str: The email of the user.
+        :return: The number of revoked families.
+        :rtype: int
+        """
+
+        redis = await self.redis_cache
+        if self._revoke_script is None:
+            self._revoke_script = redis.register_script(REVOKE_SCRIPT)
+        return await self._revoke_script(keys=[self.user_key(email)], args=[FAMILY_PREFIX])
+
+
+refresh_token_store = RefreshTokenStore()
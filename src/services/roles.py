@@ -13,7 +13,7 @@ class RoleChecker:
     async def __call__(
         self,
         request: Request,
-        current_user: User = Depends(auth_service.get_authenticated_user),
+        current_user: User = Depends(auth_service.get_principal),
     ):
         if current_user.role not in self.allowed_roles:
             raise HTTPException(
@@ -0,0 +1,80 @@
+from collections.abc import Mapping
+from operator import attrgetter, itemgetter
+from typing import Any, Callable, Iterable
+
+from fastapi import status
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def reader(schema: type[BaseModel], row: Any) -> Callable[[Any], dict]:
+    """
+    Build a function reading the fields of a response schema from trusted rows.
+
+    Rows are read without validation. Only the fields of the schema are read,
+    so private columns are left out as with ``response_model``. Nested schemas
+    are not supported.
+
+    :param schema: The response schema.
+    :param row: A sample row: an ORM object, a model or a mapping.
+    :return: The function returning the field values of a row, ready for orjson.
+    :rtype: Callable[[Any], dict]
+    """
+
+    fields = tuple(schema.model_fields)
+    getter = itemgetter if isinstance(row, Mapping) else attrgetter
+    values = getter(*fields)
+    if len(fields) == 1:
+        return lambda row: {fields[0]: values(row)}
+    return lambda row: dict(zip(fields, values(row)))
+
+
+def dump(schema: type[BaseModel], row: Any) -> dict:
+    """
+    Read the fields of a response schema from one trusted row.
+
+    :param schema: The response schema.
+    :param row: An ORM object, a model or a mapping.
+    :return: The field values, ready for orjson.
+    :rtype: dict
+    """
+
+    return reader(schema, row)(row)
+
+
+def trusted_response(
+    schema: type[BaseModel],
+    data: Any | Iterable[Any],
+    many: bool = False,
+    status_code: int = status.HTTP_200_OK,
+) -> ORJSONResponse:
+    """
+    Serialize rows read from the database straight to JSON.
+
+    Returning a response skips the validation FastAPI runs against the
+    ``response_model`` of a route, which only repeats the checks of the
+    database schema for its own rows. The route keeps its ``response_model``
+    for the OpenAPI documentation.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        photos = await repository_photos.get_photos(skip, limit, db)
+        return trusted_response(PhotosDb, photos, many=True)
+
+    :param schema: The response schema.
+    :param data: The row, or the rows if ``many`` is set.
+    :param bool many: Whether ``data`` is a list of rows.
+    :param int status_code: The status code of the response.
+    :return: The JSON response.
+    :rtype: ORJSONResponse
+    """
+
+    if many:
+        rows = list(data)
+        read = reader(schema, rows[0]) if rows else None
+        content = [read(row) for row in rows]
+    else:
+        content = dump(schema, data)
+    return ORJSONResponse(content, status_code=status_code)
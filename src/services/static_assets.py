@@ -0,0 +1,181 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import time
+from pathlib import Path
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.types import Scope
+from uvicorn.config import logger
+
+from src.conf.config import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+
+COMPRESSIBLE = {".css", ".js", ".html", ".json", ".svg", ".txt"}
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# Encodings by order of preference, with the suffix of their files
+ENCODERS = {"gzip": (".gz", lambda data: gzip.compress(data, 9, mtime=0))}
+if brotli is not None:
+    brotli_encoder = (".br", lambda data: brotli.compress(data, quality=11))
+    ENCODERS = {"br": brotli_encoder} | ENCODERS
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """
+    Parse the codings accepted by a client.
+
+    :param str accept_encoding: The ``Accept-Encoding`` header.
+    :return: The codings not refused with ``q=0``.
+    :rtype: set[str]
+    """
+
+    codings = set()
+    for item in accept_encoding.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        refused = any(param.replace(" ", "") in ("q=0", "q=0.0") for param in params)
+        if coding and not refused:
+            codings.add(coding.lower())
+    return codings
+
+
+class StaticAssets(StaticFiles):
+    """
+    Static files served under content-hashed names, precompressed.
+
+    :meth:`build` copies each file of ``directory`` to ``build_dir`` under a
+    name holding a hash of its content, e.g. ``styles.3f2a1b9c0d4e.css``,
+    together with gzip and brotli variants of text files. Hashed names are
+    served with immutable cache headers and the smallest encoding the client
+    accepts. Original names are still served, but revalidated on every use.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        app.mount("/static", static_assets, name="static")
+        static_assets.build()  # at startup
+        static_assets.url("styles.css")  # "/static/styles.3f2a1b9c0d4e.css"
+
+    :param str directory: The folder of the source files.
+    :param str build_dir: The folder of the hashed and compressed files.
+    :param str prefix: The path the files are mounted at.
+    """
+
+    def __init__(
+        self,
+        directory: str = "static",
+        build_dir: str = settings.static_build_dir,
+        prefix: str = "/static",
+    ):
+        super().__init__(directory=directory)
+        self.build_dir = build_dir
+        self.prefix = prefix
+        self.manifest: dict[str, str] = {}
+        self.variants: dict[str, dict[str, str]] = {}
+        self.all_directories = [build_dir, directory]
+
+    def build(self) -> float:
+        """
+        Write the hashed and compressed files, and fill the manifest.
+
+        Files already built are kept, so restarts and other workers only pay
+        for hashing. Files are written under a temporary name and then renamed,
+        so concurrent workers never serve a partial file.
+
+        :return: The build time, in seconds.
+        :rtype: float
+        """
+
+        start = time.perf_counter()
+        source = Path(self.directory)
+        build_dir = Path(self.build_dir)
+        for path in sorted(source.rglob("*")):
+            if not path.is_file():
+                continue
+            content = path.read_bytes()
+            digest = hashlib.sha256(content).hexdigest()[:12]
+            name = path.relative_to(source)
+            hashed = name.with_name(f"{name.stem}.{digest}{name.suffix}")
+            target = build_dir / hashed
+            self._write(target, content)
+
+            variants = {}
+            if path.suffix in COMPRESSIBLE:
+                for coding, (suffix, compress) in ENCODERS.items():
+                    encoded = target.with_name(target.name + suffix)
+                    if not encoded.exists():
+                        self._write(encoded, compress(content))
+                    if encoded.stat().st_size < len(content):
+                        variants[coding] = os.path.realpath(encoded)
+
+            self.manifest[name.as_posix()] = hashed.as_posix()
+            self.variants[os.path.realpath(target)] = variants
+        elapsed = time.perf_counter() - start
+        count = len(self.manifest)
+        logger.info(f"--- Built {count} static assets in {elapsed * 1e3:.1f} ms ---")
+        return elapsed
+
+    @staticmethod
+    def _write(target: Path, content: bytes) -> None:
+        if target.exists():
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temporary = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+        temporary.write_bytes(content)
+        os.replace(temporary, target)
+
+    def url(self, name: str) -> str:
+        """
+        Get the URL of a static file, hashed once the assets are built.
+
+        :param str name: The path of the file in the static folder.
+        :return: The URL of the file.
+        :rtype: str
+        """
+
+        return f"{self.prefix}/{self.manifest.get(name, name)}"
+
+    def file_response(
+        self,
+        full_path: str,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        variants = self.variants.get(str(full_path))
+        if variants is None:
+            response = super().file_response(
+                full_path, stat_result, scope, status_code
+            )
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        coding = next(
+            (coding for coding in variants if coding in accepted), None
+        )
+        response = FileResponse(
+            variants[coding] if coding else full_path,
+            status_code=status_code,
+            media_type=mimetypes.guess_type(full_path)[0] or "text/plain",
+            method=scope["method"],
+        )
+        if coding:
+            response.headers["Content-Encoding"] = coding
+        if variants:
+            response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = IMMUTABLE
+        return response
+
+
+static_assets = StaticAssets()
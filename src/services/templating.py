@@ -0,0 +1,145 @@
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator
+
+from fastapi.responses import StreamingResponse
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from uvicorn.config import logger
+
+from src.conf.config import settings
+from src.services.documentation import rst_to_html
+from src.services.static_assets import static_assets
+
+
+def create_templates(
+    directory: str = "templates",
+    cache_dir: str | None = settings.template_cache_dir,
+    auto_reload: bool = settings.template_auto_reload,
+) -> Jinja2Templates:
+    """
+    Create the template renderer shared by the views.
+
+    Compiled templates are kept in a filesystem bytecode cache, so a new worker
+    process loads them instead of compiling them again. With ``auto_reload``
+    disabled, templates are never checked for changes once loaded.
+
+    :param str directory: The template folder.
+    :param str | None cache_dir: The folder of the bytecode cache, or None to disable it.
+    :param bool auto_reload: Whether changed templates are reloaded.
+    :return: The template renderer.
+    :rtype: Jinja2Templates
+    """
+
+    options = {"auto_reload": auto_reload}
+    if cache_dir:
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        options["bytecode_cache"] = FileSystemBytecodeCache(cache_dir)
+    renderer = Jinja2Templates(directory=directory, **options)
+    renderer.env.globals["rst_to_html"] = rst_to_html
+    renderer.env.globals["static_url"] = static_assets.url
+    return renderer
+
+
+def preload_templates(renderer: Jinja2Templates) -> float:
+    """
+    Load every template of the environment and report how long it took.
+
+    :param Jinja2Templates renderer: The template renderer to warm up.
+    :return: The loading time, in seconds.
+    :rtype: float
+    """
+
+    start = time.perf_counter()
+    names = renderer.env.list_templates()
+    for name in names:
+        renderer.env.get_template(name)
+    elapsed = time.perf_counter() - start
+    logger.info(f"--- Loaded {len(names)} templates in {elapsed * 1e3:.1f} ms ---")
+    return elapsed
+
+
+class StreamedLoop:
+    """
+    Sequence iterated by a template loop, filled while the page is streamed.
+
+    The loop sees a single unique placeholder. When the output of the template
+    reaches it, the batches are awaited and sent one by one, so only one batch
+    is held in memory. ``len()`` counts the streamed items, so a template may
+    use ``|length`` after the loop, e.g. for pagination.
+
+    :param batches: The async iterator of batches of rendered items.
+    """
+
+    def __init__(self, batches: AsyncIterable[list[str]]):
+        self.batches = batches
+        self.count = 0
+        self.placeholder = Markup(f"<!--{uuid.uuid4().hex}-->")
+
+    def __iter__(self):
+        yield self.placeholder
+
+    def __len__(self) -> int:
+        return self.count
+
+    async def stream(self, chunks) -> AsyncIterator[str]:
+        """
+        Send the output of a template, replacing the placeholder with the batches.
+
+        The template parts around the placeholder are joined, so each one is
+        sent in a single write.
+
+        :param chunks: The output of ``Template.generate()``.
+        :return: The async iterator of the page parts.
+        """
+
+        buffer = []
+        for chunk in chunks:
+            if chunk == self.placeholder:
+                yield "".join(buffer)
+                buffer.clear()
+                async for batch in self.batches:
+                    self.count += len(batch)
+                    yield "".join(batch)
+            else:
+                buffer.append(chunk)
+        yield "".join(buffer)
+
+
+def stream_template(
+    name: str,
+    context: dict,
+    loop: str,
+    batches: AsyncIterable[list[str]],
+    renderer: Jinja2Templates | None = None,
+) -> StreamingResponse:
+    """
+    Render a template as a stream, sending the items of one loop in batches.
+
+    The part of the page before the loop is sent before the first batch is
+    rendered, which lowers the time to first byte of long pages.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        return stream_template("database.html", context, "cards", card_batches)
+
+    :param str name: The template name.
+    :param dict context: The template context, with the request.
+    :param str loop: The context variable iterated by the streamed loop.
+    :param batches: The async iterator of batches of rendered items.
+    :param renderer: The template renderer, the shared one by default.
+    :return: The streamed HTML page.
+    :rtype: StreamingResponse
+    """
+
+    template = (renderer or templates).get_template(name)
+    items = StreamedLoop(batches)
+    chunks = template.generate({**context, loop: items})
+    return StreamingResponse(items.stream(chunks), media_type="text/html")
+
+
+templates = create_templates()
@@ -0,0 +1,495 @@
+import asyncio
+import json
+import math
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from uvicorn.config import logger
+
+from src.conf.config import init_async_redis
+from src.conf.constants import (
+    TIMELINE_CELEBRITY_FOLLOWERS,
+    TIMELINE_FANOUT_BATCH_SIZE,
+    TIMELINE_FANOUT_MAX_ATTEMPTS,
+    TIMELINE_FANOUT_WORKER_LEASE,
+    TIMELINE_SIZE,
+)
+from src.database.connect_db import sessionmanager
+from src.repository import follows as repository_follows
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def timeline_score(created_at: datetime) -> float:
+    """
+    Get the score of a photo in the timelines: its creation time in seconds.
+
+    :param datetime created_at: The creation time of the photo.
+    :return: The score.
+    :rtype: float
+    """
+
+    return (created_at.replace(tzinfo=None) - EPOCH).total_seconds()
+
+
+def timeline_time(score: float) -> datetime:
+    """
+    Get the creation time of a photo from its score in the timelines.
+
+    :param float score: The score.
+    :return: The creation time of the photo.
+    :rtype: datetime
+    """
+
+    return EPOCH + timedelta(seconds=score)
+
+
+def decode_cursor(cursor: str) -> float:
+    """
+    Get the score held by a timeline cursor.
+
+    :param str cursor: The cursor.
+    :return: The score.
+    :rtype: float
+    :raises ValueError: If the cursor is not a score of a representable time.
+    """
+
+    score = float(cursor)
+    if not math.isfinite(score):
+        raise ValueError(f"Cursor score out of range: {score}")
+    try:
+        timeline_time(score)
+    except OverflowError:
+        raise ValueError(f"Cursor score out of range: {score}")
+    return score
+
+
+class HomeTimelines:
+    """
+    Home timelines of the users, kept in capped Redis sorted sets.
+
+    A timeline holds the IDs of the latest photos of the users followed, scored
+    by creation time, and is trimmed to ``size`` photos. A page is one
+    ``ZREVRANGEBYSCORE`` costing O(log(size) + page size).
+
+    Photos of users with at least ``celebrity_followers`` followers are not
+    pushed to the timelines of their followers. :meth:`read` merges them from the
+    database instead, so an upload never costs more than ``celebrity_followers``
+    writes.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        await home_timelines.push(follower_ids, photo_id, timeline_score(created_at))
+        photo_ids, cursor = await home_timelines.read(user_id, None, 20, db)
+
+    :param str namespace: The prefix of the Redis keys.
+    :param int size: The maximum number of photos in a timeline.
+    :param int celebrity_followers: The number of followers from which photos are read instead of pushed.
+    """
+
+    def __init__(
+        self,
+        namespace: str = "timeline:home",
+        size: int = TIMELINE_SIZE,
+        celebrity_followers: int = TIMELINE_CELEBRITY_FOLLOWERS,
+    ):
+        self.namespace = namespace
+        self.size = size
+        self.celebrity_followers = celebrity_followers
+        self._redis_cache = None
+
+    @property
+    async def redis_cache(self):
+        """
+        Get the Redis client holding the timelines.
+
+        :return: The Redis client.
+        :rtype: redis.asyncio.Redis
+        """
+
+        if self._redis_cache is None:
+            self._redis_cache = await init_async_redis()
+        return self._redis_cache
+
+    def key(self, user_id: int) -> str:
+        return f"{self.namespace}:{user_id}"
+
+    async def push(self, user_ids: Iterable[int], photo_id: int, score: float) -> None:
+        """
+        Add a photo to the timelines of users, in a single Redis round trip.
+
+        :param user_ids: The IDs of the users.
+        :param int photo_id: The ID of the photo.
+        :param float score: The timeline score of the photo.
+        :return: None
+        """
+
+        redis = await self.redis_cache
+        async with redis.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.zadd(self.key(user_id), {photo_id: score})
+                pipe.zremrangebyrank(self.key(user_id), 0, -self.size - 1)
+            await pipe.execute()
+
+    async def add_photos(self, user_id: int, rows: list) -> None:
+        """
+        Add photos to the timeline of a user, e.g. those of a newly followed user.
+
+        :param int user_id: The ID of the user.
+        :param list rows: The id and created_at rows of the photos.
+        :return: None
+        """
+
+        if not rows:
+            return
+        redis = await self.redis_cache
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.zadd(
+                self.key(user_id), {row.id: timeline_score(row.created_at) for row in rows}
+            )
+            pipe.zremrangebyrank(self.key(user_id), 0, -self.size - 1)
+            await pipe.execute()
+
+    async def remove_photos(self, user_id: int, photo_ids: list[int]) -> None:
+        """
+        Remove photos from the timeline of a user, e.g. those of an unfollowed user.
+
+        :param int user_id: The ID of the user.
+        :param list[int] photo_ids: The IDs of the photos.
+        :return: None
+        """
+
+        if not photo_ids:
+            return
+        redis = await self.redis_cache
+        await redis.zrem(self.key(user_id), *photo_ids)
+
+    async def oldest(self, user_id: int) -> float | None:
+        """
+        Get the score of the oldest photo in the timeline of a user.
+
+        :param int user_id: The ID of the user.
+        :return: The score, or None if the timeline is empty.
+        :rtype: float | None
+        """
+
+        redis = await self.redis_cache
+        entries = await redis.zrange(self.key(user_id), 0, 0, withscores=True)
+        return entries[0][1] if entries else None
+
+    async def read(
+        self, user_id: int, cursor: str | None, limit: int, db: AsyncSession
+    ) -> tuple[list[int], str | None]:
+        """
+        Read a page of the home timeline of a user, latest photos first.
+
+        The page of the timeline is merged with the latest photos of the
+        celebrities the user follows. The cursor is the score of the last photo
+        of the previous page.
+
+        :param int user_id: The ID of the user.
+        :param cursor: The cursor returned with the previous page, or None for the first page.
+        :param int limit: The maximum number of photos in the page.
+        :param AsyncSession db: An asynchronous database session.
+        :return: The IDs of the photos, and the cursor of the next page or None after the last page.
+        :rtype: tuple[list[int], str | None]
+        :raises ValueError: If the cursor is not valid.
+        """
+
+        before = decode_cursor(cursor) if cursor is not None else None
+        redis = await self.redis_cache
+        entries = await redis.zrevrangebyscore(
+            self.key(user_id),
+            "+inf" if before is None else f"({before!r}",
+            "-inf",
+            start=0,
+            num=limit,
+            withscores=True,
+        )
+        scores = {int(member): score for member, score in entries}
+
+        celebrity_ids = await repository_follows.get_followed_celebrity_ids(
+            user_id, self.celebrity_followers, db
+        )
+        rows = []
+        if celebrity_ids:
+            # The bound is widened by a microsecond against float rounding
+            rows = await repository_follows.get_recent_photos(
+                celebrity_ids,
+                None if before is None else timeline_time(before) + timedelta(microseconds=1),
+                limit,
+                db,
+            )
+            for row in rows:
+                score = timeline_score(row.created_at)
+                if before is None or score < before:
+                    scores[row.id] = score
+
+        page = sorted(scores.items(), key=lambda entry: (entry[1], entry[0]), reverse=True)
+        more = len(scores) > limit or len(entries) == limit or len(rows) == limit
+        page = page[:limit]
+        if not more or not page:
+            return [photo_id for photo_id, _ in page], None
+        return [photo_id for photo_id, _ in page], repr(page[-1][1])
+
+
+class TimelineFanout:
+    """
+    Worker pushing new photos to the home timelines of the followers of their owner.
+
+    Uploads only queue the photo in a Redis list and return. The worker pushes
+    it to the timeline of the owner, then to those of their followers, in
+    batches of ``batch_size`` read by follower ID. Photos of celebrities are only
+    pushed to their own timeline.
+
+    Each worker moves the photo it fans out to a processing list of its own and
+    renews a lease between photos and after each batch of followers. The photos of a worker whose lease expired, or
+    that was stopped, are queued again. A photo whose fan-out fails is queued
+    again until ``max_attempts``, then moved to a dead-letter list. Pushing a
+    photo twice leaves the timelines unchanged.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        await timeline_fanout.enqueue(user.id, photo.id, photo.created_at)
+        timeline_fanout.start()
+        ...
+        await timeline_fanout.stop()
+
+    :param HomeTimelines timelines: The timelines to fill.
+    :param str queue: The Redis list of the photos to fan out.
+    :param int batch_size: The number of timelines updated per Redis round trip.
+    :param str consumer: The name of the worker, the host name and process ID by default.
+    :param int max_attempts: The number of fan-out attempts before a photo is dead-lettered.
+    :param float lease: How long a worker keeps its photos without a heartbeat, in seconds.
+    """
+
+    def __init__(
+        self,
+        timelines: HomeTimelines,
+        queue: str = "timeline:fanout",
+        batch_size: int = TIMELINE_FANOUT_BATCH_SIZE,
+        consumer: str | None = None,
+        max_attempts: int = TIMELINE_FANOUT_MAX_ATTEMPTS,
+        lease: float = TIMELINE_FANOUT_WORKER_LEASE,
+    ):
+        self.timelines = timelines
+        self.queue = queue
+        self.batch_size = batch_size
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.processing = self.processing_key(self.consumer)
+        self.workers_key = f"{queue}:workers"
+        self.dead = f"{queue}:dead"
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self._recovered_at = None
+        self._task = None
+
+    def processing_key(self, consumer: str) -> str:
+        return f"{self.queue}:processing:{consumer}"
+
+    def lease_key(self, consumer: str) -> str:
+        return f"{self.queue}:lease:{consumer}"
+
+    async def enqueue(self, user_id: int, photo_id: int, created_at: datetime) -> None:
+        """
+        Queue a new photo for fan-out.
+
+        :param int user_id: The ID of the owner of the photo.
+        :param int photo_id: The ID of the photo.
+        :param datetime created_at: The creation time of the photo.
+        :return: None
+        """
+
+        job = {"user_id": user_id, "photo_id": photo_id, "score": timeline_score(created_at)}
+        redis = await self.timelines.redis_cache
+        await redis.lpush(self.queue, json.dumps(job))
+
+    async def fan_out(self, user_id: int, photo_id: int, score: float) -> int:
+        """
+        Push a photo to the timelines of its owner and of their followers.
+
+        :param int user_id: The ID of the owner of the photo.
+        :param int photo_id: The ID of the photo.
+        :param float score: The timeline score of the photo.
+        :return: The number of followers whose timelines were updated.
+        :rtype: int
+        """
+
+        await self.timelines.push([user_id], photo_id, score)
+        async with sessionmanager.session() as db:
+            followers = await repository_follows.get_followers_count(user_id, db)
+        if followers >= self.timelines.celebrity_followers:
+            return 0
+
+        pushed, after_id = 0, 0
+        while True:
+            # One short session per batch, so the fan-out does not hold a connection
+            async with sessionmanager.session() as db:
+                follower_ids = await repository_follows.get_follower_ids(
+                    user_id, after_id, self.batch_size, db
+                )
+            if not follower_ids:
+                return pushed
+            await self.timelines.push(follower_ids, photo_id, score)
+            # A long fan-out must not let another worker take the photo back
+            await self.heartbeat()
+            pushed += len(follower_ids)
+            after_id = follower_ids[-1]
+
+    async def process(self, job: str) -> bool:
+        """
+        Fan out a queued photo and drop it from the processing list.
+
+        A failed photo is queued again with one more attempt, or moved to the
+        dead-letter list after ``max_attempts``.
+
+        :param str job: The queued photo.
+        :return: Whether the photo was fanned out.
+        :rtype: bool
+        """
+
+        fields = json.loads(job)
+        redis = await self.timelines.redis_cache
+        try:
+            await self.fan_out(fields["user_id"], fields["photo_id"], fields["score"])
+        except Exception as err:
+            attempts = fields.get("attempts", 0) + 1
+            if attempts >= self.max_attempts:
+                logger.error(f"Timeline fan-out of photo {fields['photo_id']} dropped: {err}")
+                target, retry = self.dead, job
+            else:
+                logger.warning(f"Timeline fan-out of photo {fields['photo_id']} failed: {err}")
+                target, retry = self.queue, json.dumps({**fields, "attempts": attempts})
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.lpush(target, retry)
+                pipe.lrem(self.processing, 1, job)
+                await pipe.execute()
+            return False
+
+        await redis.lrem(self.processing, 1, job)
+        return True
+
+    async def requeue(self, consumer: str) -> int:
+        """
+        Queue again the photos a worker was fanning out.
+
+        :param str consumer: The name of the worker.
+        :return: The number of queued photos.
+        :rtype: int
+        """
+
+        redis = await self.timelines.redis_cache
+        requeued = 0
+        while await redis.rpoplpush(self.processing_key(consumer), self.queue):
+            requeued += 1
+        return requeued
+
+    async def heartbeat(self) -> None:
+        """
+        Renew the lease of this worker.
+
+        :return: None
+        """
+
+        redis = await self.timelines.redis_cache
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.set(self.lease_key(self.consumer), 1, ex=int(self.lease))
+            pipe.sadd(self.workers_key, self.consumer)
+            await pipe.execute()
+
+    async def recover(self) -> int:
+        """
+        Queue again the photos of the workers whose lease expired.
+
+        :return: The number of queued photos.
+        :rtype: int
+        """
+
+        redis = await self.timelines.redis_cache
+        requeued = 0
+        for consumer in await redis.smembers(self.workers_key):
+            consumer = consumer.decode() if isinstance(consumer, bytes) else consumer
+            if consumer != self.consumer and not await redis.exists(self.lease_key(consumer)):
+                requeued += await self.requeue(consumer)
+                await redis.srem(self.workers_key, consumer)
+        if requeued:
+            logger.warning(f"Queued again {requeued} photos of stopped fan-out workers")
+        return requeued
+
+    async def run(self) -> None:
+        """
+        Fan out the queued photos until the worker is cancelled.
+
+        :return: None
+        """
+
+        started = False
+        while True:
+            try:
+                await self.heartbeat()
+                if not started:
+                    # Photos left by an earlier run under the same name
+                    await self.requeue(self.consumer)
+                    started = True
+                now = time.monotonic()
+                if self._recovered_at is None or now - self._recovered_at >= self.lease / 2:
+                    await self.recover()
+                    self._recovered_at = now
+
+                redis = await self.timelines.redis_cache
+                job = await redis.blmove(self.queue, self.processing, 1, "RIGHT", "LEFT")
+                if job is not None and not await self.process(job):
+                    await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                logger.error(f"Timeline fan-out failed: {err}")
+                await asyncio.sleep(1)
+
+    def start(self) -> asyncio.Task:
+        """
+        Start the worker on the running event loop.
+
+        :return: The task running the worker.
+        :rtype: asyncio.Task
+        """
+
+        self._task = asyncio.create_task(self.run(), name="timeline_fanout")
+        return self._task
+
+    async def stop(self) -> None:
+        """
+        Stop the worker. A photo being fanned out is queued again for the other workers.
+
+        :return: None
+        """
+
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except (asyncio.CancelledError, Exception):
+            pass
+        self._task = None
+        try:
+            await self.requeue(self.consumer)
+            redis = await self.timelines.redis_cache
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.delete(self.lease_key(self.consumer))
+                pipe.srem(self.workers_key, self.consumer)
+                await pipe.execute()
+        except Exception as err:
+            logger.error(f"Timeline fan-out worker not released: {err}")
+
+
+home_timelines = HomeTimelines()
+timeline_fanout = TimelineFanout(home_timelines)
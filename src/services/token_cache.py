@@ -0,0 +1,113 @@
+import hashlib
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+def token_digest(token: str) -> bytes:
+    """
+    Compute a fixed-width digest of a JWT.
+
+    The digest is used instead of the raw token wherever a token has to be
+    kept as a key, so lookups do not depend on the token length.
+
+    :param str token: The encoded JWT.
+    :return: The SHA-256 digest of the token.
+    :rtype: bytes
+    """
+
+    return hashlib.sha256(token.encode()).digest()
+
+
+class TokenCache:
+    """
+    In-process LRU cache of verified JWT claims.
+
+    Entries are keyed by the token digest and are kept only until the ``exp``
+    claim of the token, so a cached token never outlives its signature.
+
+    :param int maxsize: The maximum number of tokens kept in the cache.
+        A value of ``0`` disables caching.
+
+    **Example Usage:**
+
+    .. code-block:: python
+
+        cache = TokenCache(maxsize=1024)
+        claims = cache.get(token)
+        if claims is None:
+            claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            cache.set(token, claims)
+
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> dict | None:
+        """
+        Get the cached claims of a token.
+
+        :param str token: The encoded JWT.
+        :return: The decoded claims, or None if the token is not cached or has expired.
+        :rtype: dict | None
+        """
+
+        key = token_digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, claims = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def set(self, token: str, claims: dict) -> None:
+        """
+        Store the verified claims of a token until its expiration time.
+
+        Tokens without an ``exp`` claim are not cached.
+
+        :param str token: The encoded JWT.
+        :param dict claims: The claims returned by ``jwt.decode``.
+        :return: None
+        """
+
+        expires_at = claims.get("exp")
+        if not self.maxsize or expires_at is None or expires_at <= time.time():
+            return
+        key = token_digest(token)
+        with self._lock:
+            self._entries[key] = (float(expires_at), claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, token: str) -> None:
+        """
+        Remove a token from the cache, e.g. when it is blacklisted.
+
+        :param str token: The encoded JWT.
+        :return: None
+        """
+
+        with self._lock:
+            self._entries.pop(token_digest(token), None)
+
+    def clear(self) -> None:
+        """
+        Remove all tokens from the cache.
+
+        :return: None
+        """
+
+        with self._lock:
+            self._entries.clear()
@@ -7,9 +7,7 @@ from fastapi.security import (
     HTTPBearer,
 )
 
-from fastapi.templating import Jinja2Templates
-
-templates = Jinja2Templates(directory="templates")
+from src.services.templating import templates
 
 router = APIRouter(prefix="/auth", tags=["Authentication View"])
 security = HTTPBearer()
@@ -1,8 +1,9 @@
-from fastapi.templating import Jinja2Templates
-from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Query, Request, WebSocket, WebSocketDisconnect
+
+from src.services.chat import chat_hub
+from src.services.templating import templates
 
 router = APIRouter(tags=["Chat"])
-templates = Jinja2Templates(directory="templates")
 
 
 @router.get("/chat", name="chat", include_in_schema=False)
@@ -22,7 +23,28 @@ async def chat(request: Request):
     return templates.TemplateResponse("chat.html", {"request": request})
 
 
-active_connections = []
+@router.get("/chat/history", name="chat_history", include_in_schema=False)
+async def chat_history(
+    before: str | None = Query(None, pattern=r"^\d+(-\d+)?$"),
+    limit: int = Query(50, ge=1, le=200),
+) -> list[dict]:
+    """
+    Get Chat History
+
+
+    This endpoint returns a page of the chat history, oldest message first.
+    Without ``before`` it returns the latest messages; with the id of the oldest
+    message already shown it returns the messages preceding it.
+
+    :param before: The id of the oldest message already known.
+    :type before: str | None
+    :param limit: The maximum number of messages.
+    :type limit: int
+    :return: The messages, each with its ``id`` and ``text``.
+    :rtype: list[dict]
+    """
+
+    return await chat_hub.history_page(before, limit)
 
 
 @router.websocket("/ws")
@@ -32,18 +54,21 @@ async def websocket_endpoint(websocket: WebSocket):
 
 
     This WebSocket endpoint establishes a connection for real-time chat.
-    Clients can send and receive text messages.
+    Clients can send and receive text messages. On connect, a client first
+    receives the latest messages of the history. Messages are broadcast through
+    :data:`src.services.chat.chat_hub`, so receiving from this client never waits
+    on the other clients.
 
     :param websocket: WebSocket connection.
     :type websocket: WebSocket
     """
 
-    await websocket.accept()
-    active_connections.append(websocket)
+    connection = await chat_hub.connect(websocket)
     try:
         while True:
             data = await websocket.receive_text()
-            for connection in active_connections:
-                await connection.send_text(data)
+            chat_hub.publish(data)
     except WebSocketDisconnect:
-        active_connections.remove(websocket)
+        pass
+    finally:
+        await chat_hub.disconnect(connection)
@@ -4,20 +4,25 @@ from fastapi import (
     Request,
 )
 
-from fastapi.templating import Jinja2Templates
-
 from src.conf.info_dict import project_info
 
-from src.services.documentation import rst_to_html
+from src.services.page_cache import page_cache
+from src.services.templating import templates
 
-templates = Jinja2Templates(directory="templates")
-templates.env.globals["rst_to_html"] = rst_to_html
 router = APIRouter(tags=["Views"])
 
 
-@router.get("/list", tags=["Root"], include_in_schema=False)
-async def show_route_list(request: Request):
-    routes = [
+def route_list(request: Request) -> list[dict]:
+    """
+    List the documented routes of the application.
+
+    :param request: The HTTP request object, used for the base URL.
+    :type request: Request
+    :return: The path, name, methods and description of every documented route.
+    :rtype: list[dict]
+    """
+
+    return [
         {
             "path": str(request.base_url)[:-1] + route.path,
             "name": route.name,
@@ -27,9 +32,28 @@ async def show_route_list(request: Request):
         for route in request.app.routes
         if hasattr(route, "description") and route.description is not None
     ]
-    return templates.TemplateResponse(
-        "api_description.html", {"request": request, "routes": routes}
-    )
+
+
+@router.get("/list", tags=["Root"], include_in_schema=False)
+async def show_route_list(request: Request):
+    """
+    API Routes Page
+
+    This endpoint serves an HTML page listing the routes of the API. The page is
+    rendered once per base URL and answered with 304 when the client copy is fresh.
+
+    :param request: The HTTP request object.
+    :type request: Request
+    :return: The HTML page listing the routes.
+    :rtype: Response
+    """
+
+    async def render():
+        template = templates.get_template("api_description.html")
+        return template.render({"request": request, "routes": route_list(request)})
+
+    page = await page_cache.get(("show_route_list", str(request.base_url)), render)
+    return page.response(request)
 
 
 @router.get(
@@ -40,6 +64,8 @@ async def root(request: Request):
     Project Information Page
 
     This endpoint serves an HTML page displaying information about the project.
+    The page is rendered once per base URL and answered with 304 when the
+    client copy is fresh.
 
     :param request: The HTTP request object.
     :type request: Request
@@ -47,8 +73,13 @@ async def root(request: Request):
     :rtype: HTMLResponse
     """
 
-    str(request.base_url)[:-1]
-    project_info.update(
-        {"request": request, "current_base": str(request.base_url)[:-1]}
-    )
-    return templates.TemplateResponse("index.html", project_info)
+    async def render():
+        context = {
+            **project_info,
+            "request": request,
+            "current_base": str(request.base_url)[:-1],
+        }
+        return templates.get_template("index.html").render(context)
+
+    page = await page_cache.get(("dashboard", str(request.base_url)), render)
+    return page.response(request)
@@ -1,22 +1,109 @@
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, Query, Request, Cookie
+from typing import AsyncIterator
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Query,
+    Request,
+    Cookie,
+    HTTPException,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
 
-from fastapi.templating import Jinja2Templates
 from fastapi.responses import JSONResponse, RedirectResponse
+from markupsafe import Markup
 
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.connect_db import get_db
+from src.database.connect_db import get_db, sessionmanager
+from src.database.models import Photo, User
 from src.repository import photos as repository_photos
 from src.repository import search as repository_search
 from src.services.auth import auth_service
+from src.services.photo_fragments import photo_fragments
+from src.services.photo_rooms import photo_rooms, photo_room
+from src.services.templating import stream_template, templates
+from src.conf.constants import GALLERY_BATCH_SIZE, PHOTO_ROOMS_PER_CLIENT
 
 
-templates = Jinja2Templates(directory="templates")
 router = APIRouter(tags=["Views"])
 
 
+async def photo_cards(
+    request: Request, photos: list[Photo], current_user: User, db: AsyncSession
+) -> list[Markup]:
+    """
+    Render the gallery cards of photos, reusing the cached ones.
+
+    A card depends on whether the viewer owns the photo, which shows the edit
+    button, and on the base URL of its links. Only the cards of photos changed
+    since their last render are rendered again.
+
+    :param request: The HTTP request object.
+    :type request: Request
+    :param photos: The photos to show.
+    :type photos: list[Photo]
+    :param current_user: The viewing user.
+    :type current_user: User
+    :param db: The asynchronous database session.
+    :type db: AsyncSession
+    :return: The rendered cards, in the order of the photos.
+    :rtype: list[Markup]
+    """
+
+    base_url = str(request.base_url)
+    keys = [
+        (photo.id, f"{int(photo.user_id == current_user.id)}:{base_url}")
+        for photo in photos
+    ]
+    card = templates.get_template("photo_card.html")
+
+    async def render(index: int) -> str:
+        info = await repository_photos.get_photo_info(photos[index], db)
+        return card.render(
+            {
+                "request": request,
+                "photo": info,
+                "current_username": current_user.username,
+            }
+        )
+
+    return await photo_fragments.get_many(keys, render)
+
+
+async def photo_card_batches(
+    request: Request,
+    photos: list[Photo],
+    current_user: User,
+    db: AsyncSession,
+    batch_size: int = GALLERY_BATCH_SIZE,
+) -> AsyncIterator[list[Markup]]:
+    """
+    Render the gallery cards of photos in batches, for a streamed page.
+
+    :param request: The HTTP request object.
+    :type request: Request
+    :param photos: The photos to show.
+    :type photos: list[Photo]
+    :param current_user: The viewing user.
+    :type current_user: User
+    :param db: The asynchronous database session.
+    :type db: AsyncSession
+    :param int batch_size: The number of cards per batch.
+    :return: The async iterator of batches of rendered cards.
+    :rtype: AsyncIterator[list[Markup]]
+    """
+
+    for start in range(0, len(photos), batch_size):
+        yield await photo_cards(
+            request, photos[start : start + batch_size], current_user, db
+        )
+
+
 @router.get("/database", include_in_schema=False, name="view_all_photos")
 async def view_database(
     request: Request,
@@ -38,8 +125,8 @@ async def view_database(
     :type current_user: User
     :param db: The asynchronous database session (Dependency).
     :type db: AsyncSession
-    :return: A rendered HTML page displaying photos with additional information.
-    :rtype: templates.TemplateResponse
+    :return: A streamed HTML page displaying photos with additional information.
+    :rtype: StreamingResponse
     :raises HTTPException 500: Internal Server Error if there's a database issue.
 
     **Example Request:**
@@ -58,24 +145,22 @@ async def view_database(
         return RedirectResponse(url=request.url_for("login_page"))
 
     photos = await repository_photos.get_photos(skip, limit, db)
-    current_user = await auth_service.get_authenticated_user(access_token, db)
-
-    detailed_info = []
-
-    for photo in photos:
-        info = await repository_photos.get_photo_info(photo, db)
-        detailed_info.append(info)
+    current_user = await auth_service.get_principal(request, access_token, db)
 
     context = {
         "request": request,
-        "photos": detailed_info,
         "current_username": current_user.username,
         "skip": skip,
         "limit": limit,
         "access_token": access_token,
     }
 
-    return templates.TemplateResponse("database.html", context)
+    return stream_template(
+        "database.html",
+        context,
+        "cards",
+        photo_card_batches(request, photos, current_user, db),
+    )
 
 
 @router.get("/search", name="search_by_tag", include_in_schema=False)
@@ -94,7 +179,10 @@ async def search_by_tag(
 ):
     start_date = datetime.strptime(str(start_data), "%Y-%m-%d").date()
     end_date = datetime.strptime(str(end_data), "%Y-%m-%d").date()
-    current_user = await auth_service.get_authenticated_user(access_token, db)
+    if not access_token:
+        return RedirectResponse(url=request.url_for("login_page"))
+
+    current_user = await auth_service.get_principal(request, access_token, db)
 
     if search_type == "tag":
         photos = await repository_search.search_by_tag(
@@ -110,22 +198,67 @@ async def search_by_tag(
         # Обработка неверного значения search_type, например, бросить ошибку
         return JSONResponse(content={"error": "Invalid search_type"}, status_code=400)
 
-    if not access_token:
-        return RedirectResponse(url=request.url_for("login_page"))
-
-    detailed_info = []
-
-    for photo in photos:
-        info = await repository_photos.get_photo_info(photo, db)
-        detailed_info.append(info)
-
     context = {
         "request": request,
-        "photos": detailed_info,
         "current_username": current_user.username,
         "skip": 0,
         "limit": len(photos) + 1,
         "access_token": access_token,
     }
 
-    return templates.TemplateResponse("database.html", context)
+    return stream_template(
+        "database.html",
+        context,
+        "cards",
+        photo_card_batches(request, photos, current_user, db),
+    )
+
+
+@router.websocket("/ws/photos")
+async def photo_updates(
+    websocket: WebSocket,
+    photo_id: list[int] = Query(...),
+    access_token: str | None = Cookie(None),
+):
+    """
+    Photo Updates WebSocket
+
+    This WebSocket endpoint pushes the comments and ratings of the given photos
+    as they are published, so an open gallery page updates without reloading.
+    Each message is a JSON object with the ``room`` of the photo, the ``event``
+    type (``comment_created``, ``comment_updated``, ``comment_deleted`` or
+    ``rating_created``) and its ``data``.
+
+    The client is authenticated with the access token cookie. Anonymous clients
+    and clients watching more than ``PHOTO_ROOMS_PER_CLIENT`` photos are closed
+    with the policy violation code.
+
+    :param websocket: WebSocket connection.
+    :type websocket: WebSocket
+    :param photo_id: The IDs of the watched photos.
+    :type photo_id: list[int]
+    :param access_token: The access token cookie.
+    :type access_token: str | None
+    """
+
+    if len(photo_id) > PHOTO_ROOMS_PER_CLIENT:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    try:
+        # A short session, so the open websocket does not hold a connection
+        async with sessionmanager.session() as db:
+            await auth_service.get_authenticated_user(access_token, db)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    rooms = {photo_room(id) for id in photo_id}
+    connection = await photo_rooms.connect(websocket, rooms)
+    try:
+        while True:
+            # Clients only listen; incoming messages are ignored
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await photo_rooms.disconnect(connection)
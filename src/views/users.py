@@ -7,16 +7,14 @@ from fastapi import (
 )
 from fastapi.responses import RedirectResponse
 
-from fastapi.templating import Jinja2Templates
-
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.connect_db import get_db
+from src.database.connect_db import get_read_db
 from src.repository import users as repository_users
 from src.services.auth import auth_service
+from src.services.templating import templates
 
 
-templates = Jinja2Templates(directory="templates")
 router = APIRouter(tags=["Views"])
 
 
@@ -27,7 +25,7 @@ async def view_user_profile(
     username: str,
     request: Request,
     access_token: str = Cookie(None),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     View User Profile
@@ -48,7 +46,7 @@ async def view_user_profile(
         return RedirectResponse(url=request.url_for("login_page"))
 
     user = await repository_users.get_user_profile(username, db)
-    current_user = await auth_service.get_authenticated_user(access_token, db)
+    current_user = await auth_service.get_principal(request, access_token, db)
 
     context = {
         "request": request,
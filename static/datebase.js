@@ -138,3 +138,84 @@ updateButtons.forEach((button) => {
     $("#updateDescriptionModal").modal("show");
   });
 });
+
+// Live comments and ratings of the photos shown on the page
+function renderRating(container, average) {
+  container.innerHTML = "";
+  for (let i = 0; i < average; i++) {
+    const star = document.createElement("i");
+    star.className = "fas fa-star";
+    star.style.color = "orange";
+    container.appendChild(star);
+  }
+}
+
+function renderComment(item, comment) {
+  item.setAttribute("data-comment-id", comment.id);
+  item.innerHTML = "";
+  const id = document.createElement("span");
+  id.className = "comment-id";
+  id.textContent = `${comment.id}: `;
+  const text = document.createElement("span");
+  text.className = "comment-text";
+  text.textContent = comment.text;
+  item.appendChild(id);
+  item.appendChild(text);
+  if (comment.username) {
+    item.appendChild(document.createTextNode(` (by ${comment.username})`));
+  }
+}
+
+function addToCount(counter, delta) {
+  counter.textContent = Number(counter.textContent) + delta;
+}
+
+function applyPhotoEvent(message) {
+  const photoId = message.room.split(":")[1];
+  const row = document.querySelector(`tr[data-photo-id="${photoId}"]`);
+  if (!row) {
+    return;
+  }
+  const comments = row.querySelector(".photo-comments");
+  const data = message.data;
+  const existing = comments.querySelector(`li[data-comment-id="${data.id}"]`);
+
+  switch (message.event) {
+    case "comment_created":
+    case "comment_updated": {
+      const item = existing || document.createElement("li");
+      renderComment(item, data);
+      if (!existing) {
+        comments.appendChild(item);
+        if (message.event === "comment_created") {
+          addToCount(row.querySelector(".photo-comments-count"), 1);
+        }
+      }
+      break;
+    }
+    case "comment_deleted":
+      if (existing) {
+        existing.remove();
+        addToCount(row.querySelector(".photo-comments-count"), -1);
+      }
+      break;
+    case "rating_created":
+      renderRating(row.querySelector(".photo-rating"), data.average);
+      addToCount(row.querySelector(".photo-ratings-count"), 1);
+      break;
+  }
+}
+
+// The server refuses to watch more than PHOTO_ROOMS_PER_CLIENT photos
+const photoIds = Array.from(
+  document.querySelectorAll("tr[data-photo-id]"),
+  (row) => row.getAttribute("data-photo-id")
+).slice(0, 100);
+if (photoIds.length) {
+  const protocol = window.location.protocol === "https:" ? "wss://" : "ws://";
+  const query = photoIds.map((id) => `photo_id=${id}`).join("&");
+  const photoSocket = new WebSocket(
+    `${protocol}${window.location.host}/views/ws/photos?${query}`
+  );
+  photoSocket.onmessage = (event) => applyPhotoEvent(JSON.parse(event.data));
+}
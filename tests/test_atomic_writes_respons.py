@@ -0,0 +1,175 @@
+import unittest
+import sys
+import os
+import tempfile
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database.models import Base, Comment, Photo, Role, User
+from src.routes import auth as auth_routes
+from src.routes import comments as comments_routes
+from src.routes import photos as photos_routes
+from src.routes import users as users_routes
+
+
+class TestSingleStatementWrites(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.engine = create_async_engine(f"sqlite+aiosqlite:///{self.folder.name}/test.db")
+        async with self.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        session_maker = async_sessionmaker(self.engine, expire_on_commit=False)
+
+        async with session_maker() as db:
+            self.admin = User(
+                username="admin", email="admin@example.com", password="x", role=Role.admin
+            )
+            self.user = User(username="user", email="user@example.com", password="x")
+            db.add_all([self.admin, self.user])
+            await db.flush()
+            self.photo = Photo(url="url", cloud_public_id="id", user_id=self.user.id)
+            db.add(self.photo)
+            await db.flush()
+            self.comment = Comment(text="old", user_id=self.user.id, photo_id=self.photo.id)
+            db.add(self.comment)
+            await db.commit()
+
+        self.db = session_maker()
+        self.statements = []
+        event.listen(self.engine.sync_engine, "before_cursor_execute", self.capture)
+
+        self.photo_fragments = {}
+        for name in ("comments", "photos", "users"):
+            patcher = patch(f"src.routes.{name}.photo_fragments", AsyncMock())
+            self.photo_fragments[name] = patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch("src.routes.comments.photo_rooms", MagicMock())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch("src.routes.users.refresh_token_store", AsyncMock())
+        self.refresh_token_store = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        await self.engine.dispose()
+        self.folder.cleanup()
+
+    def capture(self, connection, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement.split()[0].upper())
+
+    def assertRoundTrips(self, *statements):
+        self.assertEqual(self.statements, list(statements))
+        self.statements.clear()
+
+    async def test_ban_and_activate(self):
+        response = await users_routes.ban_user("user@example.com", self.admin, self.db)
+
+        self.assertEqual(response, {"message": users_routes.USER_NOT_ACTIVE})
+        self.assertRoundTrips("UPDATE")
+        self.refresh_token_store.revoke.assert_awaited_once_with("user@example.com")
+
+        with self.assertRaises(HTTPException) as context:
+            await users_routes.ban_user("user@example.com", self.admin, self.db)
+        self.assertEqual(context.exception.status_code, 409)
+        self.assertRoundTrips("UPDATE", "SELECT")
+
+        await users_routes.activate_user("user@example.com", self.admin, self.db)
+        self.assertRoundTrips("UPDATE")
+
+    async def test_ban_self_refused(self):
+        with self.assertRaises(HTTPException) as context:
+            await users_routes.ban_user("admin@example.com", self.admin, self.db)
+
+        self.assertEqual(context.exception.status_code, 403)
+        self.assertTrue((await self.db.get(User, self.admin.id)).is_active)
+
+    @patch("src.repository.users.cloudinary")
+    @patch("src.repository.users.init_cloudinary")
+    async def test_rename_invalidates_cards(self, init_cloudinary, cloudinary):
+        cloudinary.CloudinaryImage.return_value.build_url.return_value = "avatar"
+        own = Photo(url="url", cloud_public_id="own", user_id=self.admin.id)
+        self.db.add(own)
+        await self.db.flush()
+        self.db.add(Comment(text="nice", user_id=self.admin.id, photo_id=self.photo.id))
+        await self.db.commit()
+        admin = await self.db.get(User, self.admin.id)
+        bump_many = self.photo_fragments["users"].bump_many
+
+        await users_routes.edit_my_profile(MagicMock(), None, None, admin, AsyncMock(), self.db)
+        bump_many.assert_not_awaited()
+
+        await users_routes.edit_my_profile(
+            MagicMock(), "About me", "boss", admin, AsyncMock(), self.db
+        )
+        self.assertEqual(sorted(bump_many.await_args.args[0]), [self.photo.id, own.id])
+
+    async def test_assign_role(self):
+        redis = AsyncMock()
+
+        response = await users_routes.assign_role(
+            "user@example.com", Role.moder, self.db, redis
+        )
+
+        self.assertIn(Role.moder.value, response["message"])
+        self.assertRoundTrips("UPDATE")
+
+        response = await users_routes.assign_role(
+            "user@example.com", Role.moder, self.db, redis
+        )
+        self.assertEqual(response, {"message": users_routes.USER_ROLE_IN_USE})
+
+    async def test_confirm_email(self):
+        with patch.object(
+            auth_routes.auth_service,
+            "get_email_from_token",
+            AsyncMock(return_value="user@example.com"),
+        ):
+            response = await auth_routes.confirmed_email("token", self.db)
+            self.assertEqual(response, {"message": auth_routes.EMAIL_CONFIRMED})
+            self.assertRoundTrips("UPDATE")
+
+            response = await auth_routes.confirmed_email("token", self.db)
+            self.assertEqual(
+                response, {"message": auth_routes.EMAIL_ALREADY_CONFIRMED}
+            )
+
+    async def test_update_photo(self):
+        photo = await photos_routes.patch_update_photo(
+            self.photo.id, "new description", self.user, self.db
+        )
+
+        self.assertEqual(photo.description, "new description")
+        self.assertEqual(photo.url, "url")
+        self.assertRoundTrips("UPDATE")
+
+        with self.assertRaises(HTTPException) as context:
+            await photos_routes.patch_update_photo(
+                self.photo.id, "stolen", self.admin, self.db
+            )
+        self.assertEqual(context.exception.status_code, 404)
+
+    async def test_update_comment(self):
+        comment = await comments_routes.change_comment(
+            self.comment.id, "new", self.user, self.db
+        )
+
+        self.assertEqual(comment.text, "new")
+        self.assertTrue(comment.update_status)
+        self.assertEqual(comment.photo_id, self.photo.id)
+        self.assertRoundTrips("UPDATE")
+
+        self.db.expunge_all()
+        with self.assertRaises(HTTPException) as context:
+            await comments_routes.change_comment(
+                self.comment.id, "stolen", self.admin, self.db
+            )
+        self.assertEqual(context.exception.status_code, 403)
+        self.assertRoundTrips("UPDATE", "SELECT")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,12 +2,15 @@ import unittest
 from unittest.mock import AsyncMock, MagicMock, patch
 import sys
 import os
-from fastapi import HTTPException, status
+from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi.testclient import TestClient
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from fastapi import HTTPException
-from src.database.models import User
-from src.services.auth import Auth
+from src.database.connect_db import get_db
+from src.database.models import User, Role
+from src.services.auth import Auth, auth_service
+from src.services.roles import Admin_Moder_User
 
 
 class TestAuth(unittest.IsolatedAsyncioTestCase):
@@ -128,5 +131,53 @@ class TestAuth(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(email, "test@example.com")
 
 
+class TestPrincipalResolver(unittest.TestCase):
+    def setUp(self):
+        app = FastAPI()
+
+        async def override_get_db():
+            yield None
+
+        @app.get("/private", dependencies=[Depends(Admin_Moder_User)])
+        async def private(
+            request: Request,
+            current_user: User = Depends(auth_service.get_principal),
+            db=Depends(get_db),
+        ):
+            view_user = await auth_service.get_principal(request, None, db)
+            return {"username": current_user.username, "same": view_user is current_user}
+
+        app.dependency_overrides[get_db] = override_get_db
+        self.client = TestClient(app)
+        self.user = User(id=1, username="test_user", role=Role.user)
+
+    def test_bearer_token_authenticates_once(self):
+        with patch.object(
+            auth_service, "get_authenticated_user", AsyncMock(return_value=self.user)
+        ) as lookup:
+            response = self.client.get(
+                "/private", headers={"Authorization": "Bearer header_token"}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"username": "test_user", "same": True})
+        lookup.assert_awaited_once_with("header_token", None)
+
+    def test_cookie_token_authenticates_once(self):
+        with patch.object(
+            auth_service, "get_authenticated_user", AsyncMock(return_value=self.user)
+        ) as lookup:
+            self.client.cookies.set("access_token", "cookie_token")
+            response = self.client.get("/private")
+
+        self.assertEqual(response.status_code, 200)
+        lookup.assert_awaited_once_with("cookie_token", None)
+
+    def test_missing_token(self):
+        response = self.client.get("/private")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
 if __name__ == "__main__":
     unittest.main()
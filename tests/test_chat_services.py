@@ -0,0 +1,244 @@
+import unittest
+import asyncio
+import sys
+import os
+from unittest.mock import AsyncMock, patch
+
+from fastapi import FastAPI, status
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.chat import ChatHub
+from src.services.chat_broker import InMemoryBroker, RedisBroker
+from src.services.chat_history import MemoryHistory, RedisHistory
+from src.views.chat import router as chat_router
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.received = []
+        self.closed_with = None
+        self.accept = AsyncMock()
+
+    async def send_text(self, message):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received.append(message)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+class TestChatHub(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.hub = ChatHub(queue_size=3, send_timeout=0.05, tick=0)
+
+    async def asyncTearDown(self):
+        await self.hub.stop()
+
+    async def test_publish_reaches_every_client(self):
+        websockets = [FakeWebSocket() for _ in range(3)]
+        for websocket in websockets:
+            await self.hub.connect(websocket)
+            websocket.accept.assert_awaited_once()
+
+        self.hub.publish("hello")
+        self.hub.publish("world")
+        await settle()
+
+        for websocket in websockets:
+            self.assertEqual(websocket.received, ["hello", "world"])
+
+    async def test_publish_does_not_wait_for_clients(self):
+        await self.hub.connect(FakeWebSocket(delay=10))
+
+        self.hub.publish("hello")
+
+        self.assertEqual(self.hub.inbox.qsize(), 1)
+
+    async def test_publish_drops_messages_when_inbox_full(self):
+        broker = InMemoryBroker()
+        hub = ChatHub(broker, tick=0, inbox_size=2)
+        with patch.object(broker, "subscribe", AsyncMock(side_effect=ConnectionError)):
+            published = [hub.publish(str(i)) for i in range(3)]
+
+            self.assertEqual(published, [True, True, False])
+            self.assertEqual(hub.inbox.qsize(), 2)
+            await hub.stop()
+
+    async def test_slow_client_dropped_when_queue_full(self):
+        fast = FakeWebSocket()
+        slow = FakeWebSocket(delay=10)
+        await self.hub.connect(fast)
+        slow_connection = await self.hub.connect(slow)
+
+        for i in range(10):
+            self.hub.publish(str(i))
+            await settle()
+
+        self.assertEqual(fast.received, [str(i) for i in range(10)])
+        self.assertNotIn(slow_connection, self.hub.connections)
+        self.assertEqual(slow.closed_with, status.WS_1013_TRY_AGAIN_LATER)
+
+    async def test_client_dropped_when_send_times_out(self):
+        stuck = FakeWebSocket(delay=1)
+        connection = await self.hub.connect(stuck)
+
+        self.hub.publish("hello")
+        await asyncio.sleep(0.1)
+
+        self.assertNotIn(connection, self.hub.connections)
+        self.assertEqual(stuck.closed_with, status.WS_1011_INTERNAL_ERROR)
+
+    async def test_disconnect_removes_client(self):
+        websocket = FakeWebSocket()
+        connection = await self.hub.connect(websocket)
+
+        await self.hub.disconnect(connection)
+        self.hub.publish("hello")
+        await settle()
+
+        self.assertEqual(websocket.received, [])
+        self.assertEqual(websocket.closed_with, status.WS_1000_NORMAL_CLOSURE)
+
+
+class TestChatBroker(unittest.IsolatedAsyncioTestCase):
+    async def test_hubs_sharing_broker_reach_each_other(self):
+        broker = InMemoryBroker()
+        first_worker = ChatHub(broker, tick=0)
+        second_worker = ChatHub(broker, tick=0)
+        first_client = FakeWebSocket()
+        second_client = FakeWebSocket()
+        await first_worker.connect(first_client)
+        await second_worker.connect(second_client)
+
+        first_worker.publish("hello")
+        await settle()
+
+        self.assertEqual(first_client.received, ["hello"])
+        self.assertEqual(second_client.received, ["hello"])
+        await first_worker.stop()
+        await second_worker.stop()
+        self.assertEqual(broker.subscribers[first_worker.channel], set())
+
+    async def test_messages_batched_per_tick(self):
+        broker = InMemoryBroker()
+        hub = ChatHub(broker, tick=0.01)
+        client = FakeWebSocket()
+        await hub.connect(client)
+
+        with patch.object(broker, "publish", wraps=broker.publish) as publish:
+            for i in range(5):
+                hub.publish(str(i))
+            await asyncio.sleep(0.05)
+
+        publish.assert_awaited_once_with(hub.channel, [str(i) for i in range(5)])
+        self.assertEqual(client.received, [str(i) for i in range(5)])
+        await hub.stop()
+
+    async def test_redis_broker_publishes_batch_as_json(self):
+        broker = RedisBroker()
+        broker._redis_cache = AsyncMock()
+
+        await broker.publish("chat:room", ["hello", "world"])
+
+        broker._redis_cache.publish.assert_awaited_once_with(
+            "chat:room", '["hello", "world"]'
+        )
+
+
+class TestChatHistory(unittest.IsolatedAsyncioTestCase):
+    async def test_memory_history_is_bounded_and_pageable(self):
+        history = MemoryHistory(maxlen=5)
+        await history.append("room", [str(i) for i in range(8)])
+
+        recent = await history.recent("room", 3)
+        self.assertEqual([entry["text"] for entry in recent], ["5", "6", "7"])
+
+        older = await history.before("room", recent[0]["id"], 10)
+        self.assertEqual([entry["text"] for entry in older], ["3", "4"])
+
+    async def test_redis_history_pages_before_id(self):
+        history = RedisHistory()
+        history._redis_cache = AsyncMock()
+        history._redis_cache.xrevrange.return_value = [
+            (b"3-0", {b"text": b"c"}),
+            (b"2-0", {b"text": b"b"}),
+        ]
+
+        page = await history.before("chat:room", "4-0", 2)
+
+        history._redis_cache.xrevrange.assert_awaited_once_with(
+            "chat:room:history", max="(4-0", count=2
+        )
+        self.assertEqual(page, [{"id": "2-0", "text": "b"}, {"id": "3-0", "text": "c"}])
+
+    async def test_new_client_receives_recent_messages(self):
+        history = MemoryHistory()
+        await history.append("chat:room", ["old", "older", "latest"])
+        hub = ChatHub(tick=0, history=history, history_on_connect=2)
+        client = FakeWebSocket()
+
+        await hub.connect(client)
+        await settle()
+
+        self.assertEqual(client.received, ["older", "latest"])
+        await hub.stop()
+
+    async def test_published_messages_are_saved(self):
+        history = MemoryHistory()
+        hub = ChatHub(tick=0, history=history)
+        await hub.connect(FakeWebSocket())
+
+        hub.publish("hello")
+        hub.publish("world")
+        await settle()
+
+        page = await hub.history_page(None, 10)
+        self.assertEqual([entry["text"] for entry in page], ["hello", "world"])
+        await hub.stop()
+
+
+class TestChatEndpoint(unittest.TestCase):
+    def setUp(self):
+        app = FastAPI()
+        app.include_router(chat_router, prefix="/views")
+        self.client = TestClient(app)
+
+    def test_message_broadcast_to_connected_clients(self):
+        with patch("src.views.chat.chat_hub", ChatHub(InMemoryBroker())):
+            with self.client.websocket_connect("/views/ws") as first:
+                with self.client.websocket_connect("/views/ws") as second:
+                    first.send_text("hello")
+                    self.assertEqual(first.receive_text(), "hello")
+                    self.assertEqual(second.receive_text(), "hello")
+
+    def test_history_page(self):
+        history = MemoryHistory()
+        with patch("src.views.chat.chat_hub", ChatHub(history=history)):
+            with self.client.websocket_connect("/views/ws") as websocket:
+                websocket.send_text("hello")
+                self.assertEqual(websocket.receive_text(), "hello")
+
+            response = self.client.get("/views/chat/history", params={"limit": 10})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([entry["text"] for entry in response.json()], ["hello"])
+
+            response = self.client.get(
+                "/views/chat/history", params={"before": response.json()[0]["id"]}
+            )
+            self.assertEqual(response.json(), [])
+
+            response = self.client.get("/views/chat/history", params={"before": "x"})
+            self.assertEqual(response.status_code, 422)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+import asyncio
+import gzip
+import sys
+import os
+import zlib
+
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.compression import CompressionMiddleware
+
+ROWS = [{"id": id, "url": f"https://example.com/{id}.jpg"} for id in range(100)]
+CHUNKS = [b"<header>", b"<li>card</li>" * 200, b"<footer>"]
+
+
+def create_app():
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/rows")
+    async def rows():
+        return ROWS
+
+    @app.get("/small")
+    async def small():
+        return {"id": 1}
+
+    @app.get("/encoded")
+    async def encoded():
+        body = gzip.compress(b"x" * 1000)
+        return Response(body, headers={"Content-Encoding": "gzip"})
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for chunk in CHUNKS:
+                yield chunk
+
+        return StreamingResponse(chunks(), media_type="text/html")
+
+    return app
+
+
+class TestCompressionMiddleware(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(create_app())
+
+    def test_large_response_gzipped(self):
+        response = self.client.get("/rows", headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.headers["vary"], "Accept-Encoding")
+        self.assertEqual(response.json(), ROWS)
+        self.assertLess(
+            int(response.headers["content-length"]), len(response.content) // 2
+        )
+
+    def test_small_response_sent_as_is(self):
+        response = self.client.get("/small", headers={"Accept-Encoding": "gzip"})
+
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.json(), {"id": 1})
+
+    def test_client_without_gzip_gets_identity(self):
+        response = self.client.get("/rows", headers={"Accept-Encoding": "identity"})
+
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.json(), ROWS)
+
+    def test_encoded_response_not_compressed_again(self):
+        response = self.client.get("/encoded", headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual(response.content, b"x" * 1000)
+
+
+class TestStreamedCompression(unittest.IsolatedAsyncioTestCase):
+    async def test_every_chunk_flushed(self):
+        app = create_app()
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/stream",
+            "raw_path": b"/stream",
+            "root_path": "",
+            "scheme": "http",
+            "query_string": b"",
+            "headers": [(b"accept-encoding", b"gzip")],
+            "server": ("testserver", 80),
+            "client": ("testclient", 50000),
+            "http_version": "1.1",
+        }
+        messages = []
+        requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            # The client stays connected until the response is sent
+            await asyncio.Event().wait()
+
+        async def send(message):
+            messages.append(message)
+
+        await app(scope, receive, send)
+
+        start = messages[0]
+        headers = dict(start["headers"])
+        self.assertEqual(headers[b"content-encoding"], b"gzip")
+        self.assertNotIn(b"content-length", headers)
+
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        parts = [
+            decompressor.decompress(message["body"])
+            for message in messages[1:]
+            if message.get("body")
+        ]
+        # Each chunk is readable as soon as it is sent
+        self.assertEqual(parts[: len(CHUNKS)], CHUNKS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+import sys
+import os
+import tempfile
+import asyncio
+from unittest.mock import patch
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database.models import Base, Photo, User
+from src.repository.comments import create_comment, delete_comment
+from src.repository.counters import add_to_counters, reconcile_counters
+from src.repository.ratings import (
+    create_rating,
+    delete_all_ratings,
+    get_rating,
+    insert_ratings,
+)
+from src.repository.users import get_user_profile
+from src.services.jobs import reconcile_counters as reconcile_counters_job
+
+
+class TestCounters(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.engine = create_async_engine(f"sqlite+aiosqlite:///{self.folder.name}/test.db")
+        async with self.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        self.session_maker = async_sessionmaker(self.engine, expire_on_commit=False)
+
+        async with self.session_maker() as db:
+            self.owner = User(username="owner", email="owner@example.com", password="x")
+            self.viewer = User(username="viewer", email="viewer@example.com", password="x")
+            db.add_all([self.owner, self.viewer])
+            await db.flush()
+            self.photo = Photo(url="url", cloud_public_id="id", user_id=self.owner.id)
+            db.add(self.photo)
+            await add_to_counters(User, self.owner.id, db, photos_count=1)
+            await db.commit()
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+        self.folder.cleanup()
+
+    async def counters(self):
+        async with self.session_maker() as db:
+            owner = await db.get(User, self.owner.id)
+            viewer = await db.get(User, self.viewer.id)
+            photo = await db.get(Photo, self.photo.id)
+            return (
+                owner.photos_count,
+                viewer.comments_count,
+                photo.comments_count,
+                photo.ratings_count,
+                photo.ratings_sum,
+            )
+
+    async def test_writes_keep_counters(self):
+        async with self.session_maker() as db:
+            first = await create_comment("first", self.viewer, self.photo.id, db)
+            await create_comment("second", self.viewer, self.photo.id, db)
+            await create_rating(4, self.photo.id, self.viewer, db)
+        self.assertEqual(await self.counters(), (1, 2, 2, 1, 4))
+
+        async with self.session_maker() as db:
+            await delete_comment(first.id, db)
+            await delete_all_ratings(self.photo.id, self.viewer.id, db)
+        self.assertEqual(await self.counters(), (1, 1, 1, 0, 0))
+
+    async def test_concurrent_votes_count_once(self):
+        async def vote(rating):
+            async with self.session_maker() as db:
+                return await create_rating(rating, self.photo.id, self.viewer, db)
+
+        results = await asyncio.gather(vote(4), vote(2), return_exceptions=True)
+
+        self.assertEqual(sum(isinstance(r, HTTPException) for r in results), 1)
+        self.assertEqual((await self.counters())[3], 1)
+
+    async def test_bulk_votes_skip_invalid_ones(self):
+        votes = [
+            {"rating": 4, "user_id": self.viewer.id, "photo_id": self.photo.id},
+            {"rating": 1, "user_id": self.viewer.id, "photo_id": self.photo.id},
+            {"rating": 5, "user_id": self.owner.id, "photo_id": self.photo.id},
+            {"rating": 5, "user_id": self.viewer.id, "photo_id": 999},
+        ]
+
+        for _ in range(2):
+            async with self.session_maker() as db:
+                photo_ids = await insert_ratings(votes, db)
+
+        self.assertEqual(photo_ids, {self.photo.id, 999})
+        self.assertEqual(await self.counters(), (1, 0, 0, 1, 4))
+
+    async def test_reads_are_single_row_lookups(self):
+        async with self.session_maker() as db:
+            await create_comment("nice", self.viewer, self.photo.id, db)
+            await create_rating(5, self.photo.id, self.viewer, db)
+
+        async with self.session_maker() as db:
+            profile = await get_user_profile("viewer", db)
+            rating = await get_rating(self.photo.id, db)
+
+        self.assertEqual(profile.comments_count, 1)
+        self.assertEqual(profile.photos_count, 0)
+        self.assertEqual(rating, 5)
+
+    async def test_reconciliation_corrects_drift(self):
+        async with self.session_maker() as db:
+            await create_comment("nice", self.viewer, self.photo.id, db)
+            await db.execute(update(User).values(photos_count=7, comments_count=0))
+            await db.execute(update(Photo).values(ratings_sum=3))
+            await db.commit()
+
+            self.assertEqual(await reconcile_counters(db), 3)
+            self.assertEqual(await reconcile_counters(db), 0)
+
+        self.assertEqual(await self.counters(), (1, 1, 1, 0, 0))
+
+    async def test_reconciliation_job(self):
+        async with self.session_maker() as db:
+            await db.execute(update(Photo).values(comments_count=2))
+            await db.commit()
+
+        with patch("src.services.jobs.sessionmanager.session", self.session_maker), patch(
+            "src.services.jobs.logger"
+        ) as logger:
+            corrected = await reconcile_counters_job()
+
+        self.assertEqual(corrected, 1)
+        logger.warning.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
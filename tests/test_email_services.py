@@ -1,56 +1,191 @@
 import unittest
+import asyncio
+import socket
 import sys
 import os
-from unittest.mock import AsyncMock, patch, MagicMock
+import json
+from unittest.mock import AsyncMock, patch
+
+from aiosmtpd.controller import Controller
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.services.email import send_email, reset_password_by_email
+from src.services.email import (
+    conf,
+    email_outbox,
+    send_email,
+    reset_password_by_email,
+)
+from src.services.email_worker import EmailWorker, SMTPPool, TemplateRenderer
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 Message accepted for delivery"
+
+
+def queued(recipient="user@example.com", attempts=0):
+    return {
+        "recipient": recipient,
+        "subject": "Confirm your email ",
+        "template": "example_email.html",
+        "body": json.dumps(
+            {"host": "http://example.com/", "username": "testuser", "token": "token"}
+        ),
+        "attempts": str(attempts),
+    }
 
 
 class TestEmailFunctions(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
-        self.auth_service = MagicMock()
-        self.fm = AsyncMock()
+        self.redis = AsyncMock()
+        self.redis.xadd.return_value = "1-0"
+        email_outbox._redis_cache = self.redis
 
     def tearDown(self):
-        self.auth_service = None
-        self.fm = None
+        email_outbox._redis_cache = None
 
-    @patch("src.services.email.FastMail")
-    async def test_send_email(self, mock_fastmail):
+    async def test_send_email(self):
         email = "user@example.com"
         username = "testuser"
         host = "example.com"
 
-        fm = mock_fastmail.return_value
-
-        fm.send_message.side_effect = ConnectionError(
-            "Connection lost, check your credentials or email service configuration"
-        )
+        entry_id = await send_email(email, username, host)
 
-        with self.assertRaises(ConnectionError):
-            await send_email(email, username, host)
+        self.assertEqual(entry_id, "1-0")
+        self.redis.xadd.assert_awaited_once()
+        stream, fields = self.redis.xadd.call_args.args
+        self.assertEqual(stream, email_outbox.stream)
+        self.assertEqual(fields["recipient"], email)
+        self.assertEqual(fields["template"], "example_email.html")
+        self.assertEqual(json.loads(fields["body"])["username"], username)
 
-        fm.send_message.assert_called_once()
-
-    @patch("src.services.email.FastMail")
-    async def test_reset_password_by_email(self, mock_fastmail):
+    async def test_reset_password_by_email(self):
         email = "user@example.com"
         username = "testuser"
         reset_token = "reset_token"
         host = "example.com"
 
-        fm = mock_fastmail.return_value
+        await reset_password_by_email(email, username, reset_token, host)
 
-        fm.send_message.side_effect = ConnectionError(
-            "Connection lost, check your credentials or email service configuration"
-        )
+        self.redis.xadd.assert_awaited_once()
+        _, fields = self.redis.xadd.call_args.args
+        self.assertEqual(fields["template"], "reset_password.html")
+        self.assertEqual(json.loads(fields["body"])["token"], reset_token)
 
-        with self.assertRaises(ConnectionError):
-            await reset_password_by_email(email, username, reset_token, host)
 
-        fm.send_message.assert_called_once()
+class TestEmailWorker(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.handler = RecordingHandler()
+        self.port = free_port()
+        self.controller = Controller(self.handler, hostname="127.0.0.1", port=self.port)
+        self.controller.start()
+        self.outbox = AsyncMock()
+
+    def tearDown(self):
+        self.controller.stop()
+
+    def make_worker(self, port=None, pool_size=2) -> EmailWorker:
+        pool = SMTPPool(
+            pool_size,
+            hostname="127.0.0.1",
+            port=port or self.port,
+            start_tls=False,
+            timeout=5,
+        )
+        return EmailWorker(
+            self.outbox,
+            pool,
+            TemplateRenderer(conf.TEMPLATE_FOLDER),
+            consumer="test",
+            base_delay=1,
+        )
+
+    async def test_templates_compiled_once(self):
+        renderer = TemplateRenderer(conf.TEMPLATE_FOLDER)
+
+        self.assertIn("example_email.html", renderer.templates)
+        self.assertIn("reset_password.html", renderer.templates)
+        with patch.object(renderer.env, "get_template") as get_template:
+            html = renderer.render(
+                "example_email.html",
+                {"host": "http://example.com/", "username": "testuser", "token": "t"},
+            )
+        get_template.assert_not_called()
+        self.assertIn("testuser", html)
+
+    async def test_process_batch_reuses_connections(self):
+        worker = self.make_worker(pool_size=2)
+        batch = [(f"{i}-0", queued(f"user{i}@example.com")) for i in range(10)]
+
+        sent = await worker.process(batch)
+        await worker.pool.close()
+
+        self.assertEqual(sent, 10)
+        self.assertEqual(len(self.handler.messages), 10)
+        self.assertLessEqual(worker.pool.connections, 2)
+        self.assertEqual(
+            sorted(m.rcpt_tos[0] for m in self.handler.messages),
+            sorted(f"user{i}@example.com" for i in range(10)),
+        )
+        self.outbox.ack.assert_awaited_once_with([entry_id for entry_id, _ in batch])
+        self.outbox.schedule_retry.assert_not_called()
+
+    async def test_failed_delivery_is_retried_with_backoff(self):
+        worker = self.make_worker(port=free_port())
+
+        sent = await worker.process([("1-0", queued(attempts=2))])
+
+        self.assertEqual(sent, 0)
+        self.outbox.schedule_retry.assert_awaited_once()
+        fields, due = self.outbox.schedule_retry.call_args.args
+        self.assertEqual(fields["attempts"], 3)
+        self.assertEqual(worker.retry_delay(3), 4)
+        self.outbox.ack.assert_awaited_once_with(["1-0"])
+
+    async def test_failed_delivery_dropped_after_max_attempts(self):
+        worker = self.make_worker(port=free_port())
+
+        await worker.process([("1-0", queued(attempts=worker.max_attempts - 1))])
+
+        self.outbox.schedule_retry.assert_not_called()
+        self.outbox.ack.assert_awaited_once_with(["1-0"])
+
+    async def test_consumer_name_per_process(self):
+        worker = EmailWorker(self.outbox, SMTPPool(1), TemplateRenderer(conf.TEMPLATE_FOLDER))
+
+        self.assertEqual(worker.consumer, f"{socket.gethostname()}-{os.getpid()}")
+
+    async def test_run_survives_startup_failure_and_claims_stale(self):
+        worker = self.make_worker()
+        worker.base_delay = 0.01
+        self.outbox.ensure_group.side_effect = [ConnectionError("down"), None]
+        self.outbox.read.return_value = []
+        self.outbox.claim.side_effect = [("7-0", [("5-0", queued())])] + [("0-0", [])] * 100
+
+        task = asyncio.create_task(worker.run())
+        while self.outbox.claim.await_count < 2:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        await worker.pool.close()
+
+        self.assertEqual(self.outbox.ensure_group.await_count, 2)
+        self.outbox.claim.assert_any_await("test", 300_000, worker.batch_size, "0-0")
+        self.outbox.claim.assert_any_await("test", 300_000, worker.batch_size, "7-0")
+        self.outbox.ack.assert_any_await(["5-0"])
+        self.assertEqual(len(self.handler.messages), 1)
 
 
 if __name__ == "__main__":
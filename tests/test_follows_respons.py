@@ -0,0 +1,173 @@
+import unittest
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+from fastapi import HTTPException
+from sqlalchemy import event, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database.models import Base, Photo, User
+from src.repository.counters import reconcile_counters
+from src.routes import users as users_routes
+from src.services.timelines import timeline_score
+from src.repository.follows import (
+    follow_user,
+    get_followed_celebrity_ids,
+    get_follower_ids,
+    get_followers_count,
+    get_recent_photos,
+    unfollow_user,
+)
+
+
+class TestFollows(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.engine = create_async_engine(f"sqlite+aiosqlite:///{self.folder.name}/test.db")
+        async with self.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        self.session_maker = async_sessionmaker(self.engine, expire_on_commit=False)
+
+        async with self.session_maker() as db:
+            self.users = [
+                User(username=f"user{i}", email=f"user{i}@example.com", password="x")
+                for i in range(6)
+            ]
+            db.add_all(self.users)
+            await db.commit()
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+        self.folder.cleanup()
+
+    async def counts(self, user):
+        async with self.session_maker() as db:
+            user = await db.get(User, user.id)
+            return user.followers_count, user.following_count
+
+    async def test_follow_and_unfollow(self):
+        first, second = self.users[:2]
+        async with self.session_maker() as db:
+            self.assertEqual(await follow_user(first, "user1", db), second.id)
+            self.assertIsNone(await follow_user(first, "user1", db))
+        self.assertEqual(await self.counts(first), (0, 1))
+        self.assertEqual(await self.counts(second), (1, 0))
+
+        async with self.session_maker() as db:
+            self.assertEqual(await unfollow_user(first, "user1", db), second.id)
+            self.assertIsNone(await unfollow_user(first, "user1", db))
+        self.assertEqual(await self.counts(first), (0, 0))
+        self.assertEqual(await self.counts(second), (0, 0))
+
+    async def test_mutual_follow_updates_counters_once(self):
+        first, second = self.users[:2]
+        updates = []
+        event.listen(
+            self.engine.sync_engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: updates.append(statement)
+            if statement.startswith("UPDATE")
+            else None,
+        )
+        async with self.session_maker() as db:
+            await follow_user(first, second.username, db)
+            await follow_user(second, first.username, db)
+
+        # Both counters of a follow are written by one statement
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(await self.counts(first), (1, 1))
+        self.assertEqual(await self.counts(second), (1, 1))
+
+    async def test_follow_refused(self):
+        async with self.session_maker() as db:
+            for username, status_code in (("user0", 400), ("nobody", 404)):
+                with self.assertRaises(HTTPException) as context:
+                    await follow_user(self.users[0], username, db)
+                self.assertEqual(context.exception.status_code, status_code)
+        self.assertEqual(await self.counts(self.users[0]), (0, 0))
+
+    async def test_followers_in_batches(self):
+        star = self.users[0]
+        async with self.session_maker() as db:
+            for follower in self.users[1:]:
+                await follow_user(follower, star.username, db)
+
+            batches, after_id = [], 0
+            while follower_ids := await get_follower_ids(star.id, after_id, 2, db):
+                batches.append(follower_ids)
+                after_id = follower_ids[-1]
+
+            self.assertEqual(await get_followers_count(star.id, db), 5)
+            self.assertEqual(await get_followed_celebrity_ids(self.users[1].id, 5, db), [star.id])
+            self.assertEqual(await get_followed_celebrity_ids(self.users[1].id, 6, db), [])
+
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual(sum(batches, []), [user.id for user in self.users[1:]])
+
+    async def test_recent_photos(self):
+        now = datetime(2023, 10, 1)
+        async with self.session_maker() as db:
+            db.add_all(
+                Photo(
+                    url="url",
+                    cloud_public_id=f"id{i}",
+                    user_id=self.users[i % 3].id,
+                    created_at=now - timedelta(hours=i),
+                )
+                for i in range(9)
+            )
+            await db.commit()
+
+            rows = await get_recent_photos(
+                [self.users[0].id, self.users[1].id], now - timedelta(hours=2), 3, db
+            )
+
+        self.assertEqual(
+            [row.created_at for row in rows],
+            [now - timedelta(hours=h) for h in (3, 4, 6)],
+        )
+
+    async def test_unfollow_clears_timeline(self):
+        now = datetime(2023, 10, 1)
+        follower, star = self.users[:2]
+        async with self.session_maker() as db:
+            await follow_user(follower, star.username, db)
+            photos = [
+                Photo(
+                    url="url",
+                    cloud_public_id=f"id{i}",
+                    user_id=star.id,
+                    created_at=now - timedelta(hours=i),
+                )
+                for i in range(30)
+            ]
+            db.add_all(photos)
+            await db.commit()
+
+            # The timeline reaches back to the 25th latest photo of the star
+            timelines = AsyncMock(size=800)
+            timelines.oldest.return_value = timeline_score(photos[24].created_at)
+            with patch.object(users_routes, "home_timelines", timelines):
+                await users_routes.unfollow_user(star.username, follower, db)
+
+        timelines.oldest.assert_awaited_once_with(follower.id)
+        removed = timelines.remove_photos.await_args.args[1]
+        self.assertCountEqual(removed, [photo.id for photo in photos[:25]])
+
+    async def test_reconciliation_corrects_follow_counters(self):
+        async with self.session_maker() as db:
+            await follow_user(self.users[1], "user0", db)
+            await db.execute(update(User).values(followers_count=3))
+            await db.commit()
+
+            await reconcile_counters(db)
+
+        self.assertEqual(await self.counts(self.users[0]), (1, 0))
+        self.assertEqual(await self.counts(self.users[1]), (0, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+import unittest
+import sys
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from sqlalchemy import event, exc, insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database.models import (
+    Base,
+    Comment,
+    Photo,
+    QR_code,
+    Rating,
+    Tag,
+    User,
+    follows,
+    photo_m2m_tags,
+)
+from src.repository import comments as repository_comments
+from src.repository import follows as repository_follows
+from src.repository import photos as repository_photos
+from src.repository import ratings as repository_ratings
+from src.repository import search as repository_search
+from src.repository import users as repository_users
+
+USERS = 20
+PHOTOS_PER_USER = 10
+TAGS = 30
+HOT_TABLES = ("photos", "comments", "ratings", "photo_m2m_tags", "Qr_codes", "follows")
+
+
+def seed_rows() -> list[tuple]:
+    now = datetime(2023, 10, 1)
+    photos = [
+        {
+            "id": id,
+            "url": f"https://example.com/{id}.jpg",
+            "description": f"photo {id}",
+            "user_id": id % USERS + 1,
+            "created_at": now - timedelta(days=id),
+            "cloud_public_id": f"photos/{id}",
+        }
+        for id in range(1, USERS * PHOTOS_PER_USER + 1)
+    ]
+    return [
+        (
+            User,
+            [
+                {"id": id, "username": f"user{id}", "email": f"user{id}@example.com", "password": "x"}
+                for id in range(1, USERS + 1)
+            ],
+        ),
+        (Photo, photos),
+        (Tag, [{"id": id, "name": f"tag{id}"} for id in range(1, TAGS + 1)]),
+        (
+            photo_m2m_tags,
+            [
+                {"photo_id": photo["id"], "tag_id": (photo["id"] * k) % TAGS + 1}
+                for photo in photos
+                for k in (1, 2)
+            ],
+        ),
+        (
+            Comment,
+            [
+                {"text": "nice", "user_id": (photo["id"] + k) % USERS + 1, "photo_id": photo["id"]}
+                for photo in photos
+                for k in range(3)
+            ],
+        ),
+        (
+            Rating,
+            [
+                {"rating": k + 1, "user_id": (photo["id"] + k + 1) % USERS + 1, "photo_id": photo["id"]}
+                for photo in photos
+                for k in range(3)
+            ],
+        ),
+        (
+            follows,
+            [
+                {"follower_id": follower_id, "followed_id": followed_id}
+                for follower_id in range(1, USERS + 1)
+                for followed_id in range(1, USERS + 1)
+                if (follower_id + followed_id) % 3 == 0 and follower_id != followed_id
+            ],
+        ),
+        (
+            QR_code,
+            [
+                {"url": f"https://example.com/qr/{photo['id']}.png", "photo_id": photo["id"]}
+                for photo in photos
+            ],
+        ),
+    ]
+
+
+class TestIndexUsage(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.engine = create_async_engine(f"sqlite+aiosqlite:///{self.folder.name}/test.db")
+        async with self.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            for model, rows in seed_rows():
+                await connection.execute(insert(model), rows)
+            await connection.exec_driver_sql("ANALYZE")
+
+        self.statements = []
+        event.listen(self.engine.sync_engine, "before_cursor_execute", self.capture)
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+        self.folder.cleanup()
+
+    def capture(self, connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append((statement, parameters))
+
+    async def plans(self, query) -> list[str]:
+        self.statements.clear()
+        async with AsyncSession(self.engine, expire_on_commit=False) as db:
+            await query(db)
+        statements = list(self.statements)
+        self.assertTrue(statements)
+
+        details = []
+        async with self.engine.connect() as connection:
+            for statement, parameters in statements:
+                result = await connection.exec_driver_sql(
+                    f"EXPLAIN QUERY PLAN {statement}", parameters
+                )
+                details.extend(row.detail for row in result)
+        return details
+
+    def assertNoTableScan(self, details: list[str]):
+        for detail in details:
+            words = detail.split()
+            if words[0] == "SCAN" and "INDEX" not in words:
+                table = words[2] if words[1] == "TABLE" else words[1]
+                # Aliased tables are named like photo_m2m_tags_1
+                self.assertNotIn(table.rstrip("_0123456789"), HOT_TABLES, detail)
+
+    async def test_repository_queries_use_indexes(self):
+        user = User(id=3, username="user3")
+        queries = {
+            "my photos": lambda db: repository_photos.get_my_photos(0, 10, user, db),
+            "photo tags": lambda db: repository_photos.get_photo_tags(42, db),
+            "photo QR code": lambda db: repository_photos.get_URL_QR(42, db),
+            "photo comments": lambda db: repository_comments.get_photo_comments(0, 10, 42, db),
+            "user comments": lambda db: repository_comments.get_user_comments(0, 10, 3, db),
+            "photo rating": lambda db: repository_ratings.get_rating(42, db),
+            "photo ratings": lambda db: repository_ratings.get_all_ratings(42, db),
+            "user rating": lambda db: repository_ratings.delete_all_ratings(42, 999, db),
+            "vote check": lambda db: repository_ratings.check_vote(42, User(id=999), db),
+            "user profile": lambda db: repository_users.get_user_profile("user3", db),
+            "leaderboard page": lambda db: repository_photos.get_photos_by_ids([5, 3, 9], db),
+            "leaderboard rebuild batch": lambda db: repository_photos.get_score_counters_batch(
+                50, 10, db
+            ),
+            "followers batch": lambda db: repository_follows.get_follower_ids(3, 4, 100, db),
+            "followed celebrities": lambda db: repository_follows.get_followed_celebrity_ids(
+                3, 5, db
+            ),
+            "celebrity photos": lambda db: repository_follows.get_recent_photos(
+                [3, 4], datetime(2023, 9, 1), 10, db
+            ),
+            "admin search": lambda db: repository_search.search_admin(
+                3, "", 3, 5, date(2023, 8, 1), date(2023, 9, 1), db
+            ),
+        }
+
+        for name, query in queries.items():
+            with self.subTest(name):
+                details = await self.plans(query)
+                self.assertNoTableScan(details)
+                # SEARCH plans go through an index or the primary key
+                self.assertTrue(any(d.startswith("SEARCH") for d in details), details)
+
+    async def test_rating_pair_unique(self):
+        async with AsyncSession(self.engine) as db:
+            db.add(Rating(rating=5, user_id=3, photo_id=1))
+            with self.assertRaises(exc.IntegrityError):
+                await db.commit()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import asyncio
+import sys
+import os
+from unittest.mock import AsyncMock, patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.jobs import JobLeases, run_periodically
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = (value, px)
+        return True
+
+
+class TestJobLeases(unittest.IsolatedAsyncioTestCase):
+    async def test_one_worker_takes_the_lease(self):
+        redis = FakeRedis()
+        workers = [JobLeases(), JobLeases()]
+        for leases in workers:
+            leases._redis_cache = redis
+
+        taken = [await leases.acquire("reconcile_counters", 21600) for leases in workers]
+
+        self.assertEqual(taken, [True, False])
+        self.assertEqual(redis.data["job:lease:reconcile_counters"], (1, 21_600_000))
+
+
+class TestRunPeriodically(unittest.IsolatedAsyncioTestCase):
+    async def run_for(self, job, exclusive, sleeps):
+        sleep = AsyncMock(side_effect=[None] * (sleeps - 1) + [asyncio.CancelledError()])
+        with patch("src.services.jobs.asyncio.sleep", sleep), patch(
+            "src.services.jobs.random.uniform", return_value=42
+        ):
+            with self.assertRaises(asyncio.CancelledError):
+                await run_periodically(job, 100, exclusive)
+        return sleep
+
+    async def test_first_run_waits(self):
+        job = AsyncMock()
+
+        sleep = await self.run_for(job, False, sleeps=3)
+
+        self.assertEqual([c.args[0] for c in sleep.await_args_list], [42, 100, 100])
+        self.assertEqual(job.await_count, 2)
+
+    async def test_exclusive_job_runs_with_the_lease(self):
+        job = AsyncMock()
+        job.__name__ = "job"
+        with patch("src.services.jobs.job_leases") as leases:
+            leases.acquire = AsyncMock(side_effect=[True, False, True])
+
+            await self.run_for(job, True, sleeps=4)
+
+        leases.acquire.assert_awaited_with("job", 100)
+        self.assertEqual(job.await_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,253 @@
+import unittest
+import sys
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.leaderboards import PhotoLeaderboards, TRENDING_EPOCH
+from src.services.jobs import rebuild_leaderboards
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        return [
+            await getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.commands
+        ]
+
+
+class FakeRedis:
+    """Sorted sets ordered like Redis: by score, then by member bytes."""
+
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def ranked(self, key):
+        entries = sorted(self.data.get(key, {}).items(), key=lambda e: (e[1], e[0]))
+        return entries[::-1]
+
+    async def zadd(self, key, mapping):
+        self.data.setdefault(key, {}).update(
+            {str(member).encode(): float(score) for member, score in mapping.items()}
+        )
+
+    async def zrem(self, key, *members):
+        for member in members:
+            self.data.get(key, {}).pop(str(member).encode(), None)
+
+    async def zrangebyscore(self, key, min, max):
+        return [m for m, score in self.ranked(key)[::-1] if float(min) <= score <= float(max)]
+
+    async def zremrangebyscore(self, key, min, max):
+        assert min == "-inf" and max.startswith("(")
+        for member, score in list(self.data.get(key, {}).items()):
+            if score < float(max[1:]):
+                del self.data[key][member]
+
+    async def zscore(self, key, member):
+        return self.data.get(key, {}).get(str(member).encode())
+
+    async def zrevrank(self, key, member):
+        members = [m for m, _ in self.ranked(key)]
+        member = str(member).encode()
+        return members.index(member) if member in members else None
+
+    async def zrevrange(self, key, start, end, withscores=False):
+        self.round_trips += 1
+        return self.ranked(key)[start : end + 1]
+
+    async def zrevrangebyscore(self, key, max, min, start, num, withscores=False):
+        self.round_trips += 1
+        assert max.startswith("(") and min == "-inf"
+        below = [e for e in self.ranked(key) if e[1] < float(max[1:])]
+        return below[start : start + num]
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def rename(self, key, new_key):
+        self.data[new_key] = self.data.pop(key)
+
+
+def counters(id, ratings=(), comments=0, age=timedelta(0), now=datetime(2023, 10, 1)):
+    return SimpleNamespace(
+        id=id,
+        created_at=now - age,
+        ratings_count=len(ratings),
+        ratings_sum=sum(ratings),
+        comments_count=comments,
+    )
+
+
+class TestScores(unittest.TestCase):
+    def setUp(self):
+        self.boards = PhotoLeaderboards(prior_mean=3, prior_weight=5, half_life=3600)
+
+    def test_bayesian_average(self):
+        unrated = self.boards.scores(counters(1))["top"]
+        lucky = self.boards.scores(counters(2, ratings=[5]))["top"]
+        popular = self.boards.scores(counters(3, ratings=[4] * 100))["top"]
+
+        self.assertEqual(unrated, 3)
+        self.assertLess(lucky, popular)
+
+    def test_trending_decays_with_age(self):
+        fresh = self.boards.scores(counters(1, ratings=[5], comments=2))["trending"]
+        older = self.boards.scores(
+            counters(2, ratings=[5] * 3, comments=4, age=timedelta(hours=1))
+        )["trending"]
+
+        # Twice the ratings and comments an hour later rank the same
+        self.assertAlmostEqual(fresh, older)
+        self.assertLess(
+            self.boards.scores(counters(3, comments=3, age=timedelta(hours=1)))["trending"],
+            fresh,
+        )
+
+    def test_trending_scores_stay_small(self):
+        row = counters(1, ratings=[5] * 1000, now=TRENDING_EPOCH + timedelta(days=3650))
+
+        self.assertLess(self.boards.scores(row)["trending"], 1e6)
+
+
+class TestLeaderboards(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.boards = PhotoLeaderboards(prior_mean=3, prior_weight=5, half_life=3600)
+        self.boards._redis_cache = self.redis
+
+    async def pages(self, board, limit):
+        photo_ids, cursor = await self.boards.page(board, None, limit)
+        pages = [photo_ids]
+        while cursor is not None:
+            photo_ids, cursor = await self.boards.page(board, cursor, limit)
+            pages.append(photo_ids)
+        return pages
+
+    async def test_update_is_one_round_trip(self):
+        await self.boards.update([counters(id, ratings=[id % 5 + 1]) for id in range(1, 50)])
+
+        self.assertEqual(self.redis.round_trips, 1)
+        self.assertEqual(len(self.redis.data["leaderboard:photos:top"]), 49)
+        self.assertEqual(len(self.redis.data["leaderboard:photos:trending"]), 49)
+
+    async def test_cursor_pages_through_ties(self):
+        # Every unrated photo ties at the prior mean
+        await self.boards.update(
+            [counters(id, ratings=[5] * 3 if id == 7 else []) for id in range(1, 13)]
+        )
+
+        pages = await self.pages("top", 5)
+
+        self.assertEqual(pages[0][0], 7)
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        self.assertCountEqual(sum(pages, []), range(1, 13))
+
+    async def test_cursor_survives_rescoring(self):
+        await self.boards.update([counters(id, ratings=[id % 5 + 1]) for id in range(1, 11)])
+        first, cursor = await self.boards.page("top", None, 4)
+
+        # The last photo of the first page is rated again before the next page
+        await self.boards.update([counters(first[-1], ratings=[5] * 10)])
+        second, _ = await self.boards.page("top", cursor, 4)
+
+        self.assertFalse(set(first) & set(second))
+        self.assertEqual(len(second), 4)
+
+    async def test_bad_cursor(self):
+        for cursor in ("", "top", "4.5:x", "nan:1", "inf:1", "-inf:1", "1e999:1"):
+            with self.assertRaises(ValueError):
+                await self.boards.page("top", cursor, 4)
+
+    async def test_remove(self):
+        await self.boards.update([counters(1), counters(2)])
+        await self.boards.remove(1)
+
+        self.assertEqual(await self.boards.page("trending", None, 10), ([2], None))
+
+    async def test_rebuild_replaces_boards(self):
+        await self.boards.update([counters(99, ratings=[5] * 10)])
+
+        async def batches():
+            yield [counters(1, ratings=[2]), counters(2, ratings=[5])]
+            yield [counters(3)]
+
+        self.assertEqual(await self.boards.rebuild(batches()), 3)
+        self.assertEqual(await self.boards.page("top", None, 10), ([2, 3, 1], None))
+        self.assertFalse([key for key in self.redis.data if ":rebuild" in key])
+
+    async def test_rebuild_replays_concurrent_writes(self):
+        await self.boards.update([counters(1), counters(2), counters(3)])
+        rated = counters(1, ratings=[5] * 10)
+
+        async def batches():
+            yield [counters(1), counters(2), counters(3)]
+            # Photo 1 is rated and photo 3 deleted while the rebuild runs
+            await self.boards.update([rated])
+            await self.boards.remove(3)
+
+        with patch(
+            "src.services.leaderboards.repository_photos.get_score_counters",
+            AsyncMock(return_value=[rated, counters(2)]),
+        ) as get_score_counters:
+            await self.boards.rebuild(batches(), db=AsyncMock())
+
+        self.assertCountEqual(get_score_counters.await_args.args[0], [1, 2, 3])
+        self.assertEqual(await self.boards.page("top", None, 10), ([1, 2], None))
+
+    async def test_failed_rebuild_keeps_boards(self):
+        await self.boards.update([counters(1)])
+
+        async def batches():
+            yield [counters(2)]
+            raise RuntimeError("database down")
+
+        with self.assertRaises(RuntimeError):
+            await self.boards.rebuild(batches())
+
+        self.assertEqual(await self.boards.page("top", None, 10), ([1], None))
+        self.assertFalse([key for key in self.redis.data if ":rebuild" in key])
+
+    async def test_rebuild_job_reads_batches(self):
+        rows = [counters(id) for id in range(1, 8)]
+
+        async def get_batch(after_id, limit, db):
+            return [row for row in rows if row.id > after_id][:limit]
+
+        with patch("src.services.jobs.photo_leaderboards", self.boards), patch(
+            "src.services.jobs.sessionmanager"
+        ), patch(
+            "src.services.jobs.repository_photos.get_score_counters_batch",
+            AsyncMock(side_effect=get_batch),
+        ) as get_score_counters_batch:
+            scored = await rebuild_leaderboards(batch_size=3)
+
+        self.assertEqual(scored, 7)
+        self.assertEqual(get_score_counters_batch.await_count, 4)
+        self.assertEqual(len(self.redis.data["leaderboard:photos:trending"]), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import asyncio
+import sys
+import os
+from unittest.mock import AsyncMock, MagicMock
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from src.conf.info_dict import project_info
+from src.services.page_cache import PageCache, page_cache
+
+
+def make_request(headers=None):
+    request = MagicMock()
+    request.headers = headers or {}
+    return request
+
+
+class TestPageCache(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_requests_render_once(self):
+        cache = PageCache()
+
+        async def slow_render():
+            await asyncio.sleep(0.01)
+            return "<p>page</p>"
+
+        render = AsyncMock(side_effect=slow_render)
+
+        pages = await asyncio.gather(*(cache.get("key", render) for _ in range(10)))
+
+        render.assert_awaited_once()
+        self.assertTrue(all(page is pages[0] for page in pages))
+        self.assertEqual(pages[0].body, b"<p>page</p>")
+
+    async def test_conditional_requests_get_304(self):
+        cache = PageCache()
+        page = await cache.get("key", AsyncMock(return_value="<p>page</p>"))
+
+        response = page.response(make_request())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["etag"], page.etag)
+
+        response = page.response(make_request({"if-none-match": page.etag}))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.body, b"")
+
+        response = page.response(make_request({"if-none-match": '"stale"'}))
+        self.assertEqual(response.status_code, 200)
+
+        response = page.response(make_request({"if-modified-since": page.last_modified}))
+        self.assertEqual(response.status_code, 304)
+
+    async def test_least_recently_used_page_evicted(self):
+        cache = PageCache(maxsize=2)
+        render = AsyncMock(return_value="page")
+
+        await cache.get("first", render)
+        await cache.get("second", render)
+        await cache.get("first", render)
+        await cache.get("third", render)
+        await cache.get("first", render)
+
+        self.assertEqual(render.await_count, 3)
+        self.assertEqual(list(cache._pages), ["third", "first"])
+
+
+class TestCachedViews(unittest.TestCase):
+    def setUp(self):
+        page_cache.clear()
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        page_cache.clear()
+
+    def test_dashboard_revalidates_with_etag(self):
+        response = self.client.get("/views/dashboard")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(project_info["name"], response.text)
+        self.assertNotIn("request", project_info)
+
+        response = self.client.get(
+            "/views/dashboard", headers={"If-None-Match": response.headers["etag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_pages_cached_per_base_url(self):
+        first = self.client.get("/list")
+        second = self.client.get("/list", headers={"Host": "example.org"})
+
+        self.assertTrue(first.json()[0]["path"].startswith("http://testserver/"))
+        self.assertTrue(second.json()[0]["path"].startswith("http://example.org/"))
+        self.assertNotEqual(first.headers["etag"], second.headers["etag"])
+
+
+if __name__ == "__main__":
+    unittest.main()
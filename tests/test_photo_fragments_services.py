@@ -0,0 +1,161 @@
+import unittest
+import sys
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database.models import Photo, User
+from src.services.photo_fragments import FragmentCache
+from src.views.photos import photo_cards
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    def set(self, key, value, ex=None):
+        self.redis.ttls[key] = ex
+        self.commands.append(self.redis.set(key, value))
+
+    def incr(self, key):
+        self.commands.append(self.redis.incr(key))
+
+    async def execute(self):
+        return [await command for command in self.commands]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+        self.round_trips = 0
+
+    async def set(self, key, value):
+        self.data[key] = value.encode() if isinstance(value, str) else value
+
+    async def mget(self, keys):
+        self.round_trips += 1
+        return [self.data.get(key) for key in keys]
+
+    async def incr(self, key):
+        value = int(self.data.get(key, 0)) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+    def pipeline(self, transaction=True):
+        self.round_trips += 1
+        return FakePipeline(self)
+
+
+class TestFragmentCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.cache = FragmentCache(ttl=60)
+        self.cache._redis_cache = self.redis
+        self.keys = [(1, "viewer"), (2, "viewer"), (3, "viewer")]
+        self.render = AsyncMock(side_effect=lambda index: f"<tr>{index}</tr>")
+
+    async def test_only_missing_fragments_rendered(self):
+        first = await self.cache.get_many(self.keys, self.render)
+        second = await self.cache.get_many(self.keys, self.render)
+
+        self.assertEqual(self.render.await_count, 3)
+        self.assertEqual(first, ["<tr>0</tr>", "<tr>1</tr>", "<tr>2</tr>"])
+        self.assertEqual(second, first)
+        self.assertEqual(set(self.redis.ttls.values()), {60})
+        # Two lookups per page, plus one write for the first page
+        self.assertEqual(self.redis.round_trips, 5)
+
+    async def test_bump_rerenders_changed_fragment(self):
+        await self.cache.get_many(self.keys, self.render)
+        self.render.reset_mock()
+
+        await self.cache.bump(2)
+        await self.cache.get_many(self.keys, self.render)
+
+        self.render.assert_awaited_once_with(1)
+
+    async def test_bump_many_in_one_round_trip(self):
+        await self.cache.get_many(self.keys, self.render)
+        self.render.reset_mock()
+        round_trips = self.redis.round_trips
+
+        await self.cache.bump_many([1, 3])
+        await self.cache.bump_many([])
+
+        self.assertEqual(self.redis.round_trips, round_trips + 1)
+        await self.cache.get_many(self.keys, self.render)
+        self.assertEqual([c.args for c in self.render.await_args_list], [(0,), (2,)])
+
+    async def test_variants_cached_separately(self):
+        await self.cache.get_many([(1, "owner")], self.render)
+        await self.cache.get_many([(1, "viewer")], self.render)
+
+        self.assertEqual(self.render.await_count, 2)
+
+
+class TestPhotoCards(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.cache = FragmentCache()
+        self.cache._redis_cache = self.redis
+        self.request = MagicMock()
+        self.request.base_url = "http://testserver/"
+        self.request.url_for = lambda name, **params: f"/{name}/{params['username']}"
+        self.info = {
+            "id": 7,
+            "url": "https://example.com/photo.jpg",
+            "QR": "https://example.com/qr.png",
+            "description": "Sunset",
+            "username": "owner",
+            "created_at": "2023-10-01 12:00:00",
+            "comments": [],
+            "tags": ["sky"],
+            "rating": 4,
+        }
+
+    async def cards(self, user):
+        photo = Photo(id=7, user_id=1)
+        with patch("src.views.photos.photo_fragments", self.cache), patch(
+            "src.views.photos.repository_photos.get_photo_info",
+            AsyncMock(return_value=self.info),
+        ) as get_photo_info:
+            cards = await photo_cards(self.request, [photo], user, AsyncMock())
+        return cards, get_photo_info
+
+    async def test_cards_reused_until_photo_changes(self):
+        owner = User(id=1, username="owner")
+
+        cards, get_photo_info = await self.cards(owner)
+        self.assertIn("Sunset", cards[0])
+        self.assertIn("update-description-btn", cards[0])
+        get_photo_info.assert_awaited_once()
+
+        self.info["description"] = "Sunrise"
+        cards, get_photo_info = await self.cards(owner)
+        self.assertIn("Sunset", cards[0])
+        get_photo_info.assert_not_awaited()
+
+        await self.cache.bump(7)
+        cards, get_photo_info = await self.cards(owner)
+        self.assertIn("Sunrise", cards[0])
+        get_photo_info.assert_awaited_once()
+
+    async def test_edit_button_only_for_owner(self):
+        await self.cards(User(id=1, username="owner"))
+
+        cards, _ = await self.cards(User(id=2, username="guest"))
+
+        self.assertNotIn("update-description-btn", cards[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
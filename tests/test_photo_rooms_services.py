@@ -0,0 +1,178 @@
+import unittest
+import asyncio
+import json
+import sys
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi import FastAPI, HTTPException, status
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database.models import Comment, User
+from src.routes.comments import post_comment, remove_comment
+from src.services.chat_broker import InMemoryBroker
+from src.services.photo_rooms import RoomHub, photo_room
+from src.views.photos import router as photo_views_router
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.received = []
+        self.accept = AsyncMock()
+
+    async def send_text(self, message):
+        self.received.append(json.loads(message))
+
+    async def close(self, code=1000):
+        pass
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+class TestRoomHub(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.hub = RoomHub(InMemoryBroker(), tick=0)
+
+    async def asyncTearDown(self):
+        await self.hub.stop()
+
+    async def test_events_reach_only_room_members(self):
+        first = FakeWebSocket()
+        second = FakeWebSocket()
+        gallery = FakeWebSocket()
+        await self.hub.connect(first, {photo_room(1)})
+        await self.hub.connect(second, {photo_room(2)})
+        await self.hub.connect(gallery, {photo_room(1), photo_room(2)})
+
+        self.hub.notify(photo_room(1), "comment_deleted", {"id": 7})
+        await settle()
+
+        event = {"room": "photo:1", "event": "comment_deleted", "data": {"id": 7}}
+        self.assertEqual(first.received, [event])
+        self.assertEqual(second.received, [])
+        self.assertEqual(gallery.received, [event])
+
+    async def test_disconnect_leaves_rooms(self):
+        connection = await self.hub.connect(FakeWebSocket(), {photo_room(1)})
+
+        await self.hub.disconnect(connection)
+
+        self.assertNotIn(photo_room(1), self.hub.rooms)
+
+
+class TestCommentEvents(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.user = User(id=1, username="author")
+        self.session = AsyncMock()
+        self.photo_rooms = MagicMock()
+        patcher = patch("src.routes.comments.photo_fragments", AsyncMock())
+        self.photo_fragments = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch("src.routes.comments.photo_leaderboards", AsyncMock())
+        self.photo_leaderboards = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_post_comment_pushes_event(self):
+        comment = Comment(id=5, text="Nice", photo_id=3, update_status=False)
+
+        with patch("src.routes.comments.photo_rooms", self.photo_rooms), patch(
+            "src.routes.comments.reposytory_comments.create_comment",
+            AsyncMock(return_value=comment),
+        ):
+            await post_comment(3, "Nice", self.user, self.session)
+
+        self.photo_rooms.notify.assert_called_once_with(
+            "photo:3",
+            "comment_created",
+            {"id": 5, "text": "Nice", "username": "author", "updated": False},
+        )
+        self.photo_fragments.bump.assert_awaited_once_with(3)
+        self.photo_leaderboards.refresh.assert_awaited_once_with([3], self.session)
+
+    async def test_remove_comment_pushes_event(self):
+        comment = Comment(id=5, text="Nice", photo_id=3, user_id=1)
+
+        with patch("src.routes.comments.photo_rooms", self.photo_rooms), patch(
+            "src.routes.comments.reposytory_comments.get_comment",
+            AsyncMock(return_value=comment),
+        ), patch(
+            "src.routes.comments.reposytory_comments.delete_comment", AsyncMock()
+        ):
+            await remove_comment(5, self.user, self.session)
+
+        self.photo_rooms.notify.assert_called_once_with(
+            "photo:3", "comment_deleted", {"id": 5}
+        )
+        self.photo_fragments.bump.assert_awaited_once_with(3)
+
+
+class TestPhotoUpdatesEndpoint(unittest.TestCase):
+    def setUp(self):
+        app = FastAPI()
+        app.include_router(photo_views_router, prefix="/views")
+        self.client = TestClient(app)
+        self.client.cookies.set("access_token", "token")
+        patcher = patch("src.views.photos.sessionmanager", MagicMock())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch(
+            "src.views.photos.auth_service.get_authenticated_user",
+            AsyncMock(return_value=User(id=1)),
+        )
+        self.get_authenticated_user = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertRefused(self, url):
+        hub = RoomHub(InMemoryBroker())
+        with patch("src.views.photos.photo_rooms", hub):
+            with self.assertRaises(WebSocketDisconnect) as context:
+                with self.client.websocket_connect(url) as websocket:
+                    websocket.receive_json()
+        self.assertEqual(context.exception.code, status.WS_1008_POLICY_VIOLATION)
+        self.assertEqual(hub.rooms, {})
+
+    def test_anonymous_client_refused(self):
+        self.get_authenticated_user.side_effect = HTTPException(status_code=401)
+
+        self.assertRefused("/views/ws/photos?photo_id=1")
+
+    def test_too_many_photos_refused(self):
+        query = "&".join(f"photo_id={id}" for id in range(101))
+
+        self.assertRefused(f"/views/ws/photos?{query}")
+        self.get_authenticated_user.assert_not_awaited()
+
+    def test_client_receives_events_of_watched_photos(self):
+        hub = RoomHub(InMemoryBroker())
+        with patch("src.views.photos.photo_rooms", hub):
+            with self.client.websocket_connect(
+                "/views/ws/photos?photo_id=1&photo_id=2"
+            ) as websocket:
+                self.assertEqual(set(hub.rooms), {"photo:1", "photo:2"})
+                self.assertEqual(self.get_authenticated_user.await_args.args[0], "token")
+                # notify() runs on the event loop of the application
+                websocket.portal.call(
+                    hub.notify, photo_room(3), "comment_deleted", {"id": 1}
+                )
+                websocket.portal.call(
+                    hub.notify, photo_room(2), "rating_created", {"rating": 5, "average": 5}
+                )
+
+                self.assertEqual(
+                    websocket.receive_json(),
+                    {
+                        "room": "photo:2",
+                        "event": "rating_created",
+                        "data": {"rating": 5, "average": 5},
+                    },
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -84,11 +84,12 @@ class TestAsyncMethod(unittest.IsolatedAsyncioTestCase):
 
     
     @patch("src.repository.photos.get_URL_QR")
-    @patch("src.repository.ratings.get_rating")
-    async def test_get_photo_info(self, mock_get_rating, mock_get_URL_QR):
+    async def test_get_photo_info(self, mock_get_URL_QR):
         mock_query = MagicMock()
         # Підготовка моків та їх поверненням значень
-        mock_get_rating.return_value = 4.5
+        self.photo.comments_count = 0
+        self.photo.ratings_count = 2
+        self.photo.ratings_sum = 9
         mock_get_URL_QR.return_value = {"qr_code_url": "qr_url"}
         mock_query.scalar_one.return_value = self.photo
         self.session.execute.return_value = mock_query
@@ -106,7 +107,9 @@ class TestAsyncMethod(unittest.IsolatedAsyncioTestCase):
             "created_at": "2023-09-07 12:00:00",
             "comments": [],
             "tags": ["nature", "scenic"],
-            "rating": 4.5,
+            "rating": 4,
+            "comments_count": 0,
+            "ratings_count": 2,
         }
 
         self.assertEqual(result, expected_result)
@@ -251,8 +254,8 @@ class TestAsyncMethod(unittest.IsolatedAsyncioTestCase):
 
     async def test_update_photo(self):
         mock_query = MagicMock()
-        photo = Photo(id=1, url="photo_url", user_id=1, description="old_description")
-        mock_query.scalar.return_value = photo
+        photo = Photo(id=1, url="photo_url", user_id=1, description="new_description")
+        mock_query.scalar_one_or_none.return_value = photo
         self.session.execute.return_value = mock_query
 
         current_user = User(id=1, username="user1")
@@ -270,6 +273,8 @@ class TestAsyncMethod(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(result.url, expected_result.url)
         self.assertEqual(result.user_id, expected_result.user_id)
         self.assertEqual(result.description, expected_result.description)
+        self.session.execute.assert_called_once()
+        self.session.refresh.assert_not_called()
 
     async def test_get_URL_Qr(self):
         mock_query = MagicMock()
@@ -0,0 +1,174 @@
+import unittest
+import sys
+import os
+import time
+from unittest.mock import AsyncMock, patch
+from redis.exceptions import ResponseError
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.rating_buffer import RatingBuffer
+from src.services.jobs import flush_ratings
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    async def execute(self, raise_on_error=True):
+        results = []
+        for name, args, kwargs in self.commands:
+            try:
+                results.append(await getattr(self.redis, name)(*args, **kwargs))
+            except ResponseError as err:
+                if raise_on_error:
+                    raise
+                results.append(err)
+        return results
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def zadd(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    async def zrem(self, key, *members):
+        for member in members:
+            self.data.get(key, {}).pop(member, None)
+        if key in self.data and not self.data[key]:
+            del self.data[key]
+
+    async def zrangebyscore(self, key, min, max, start, num):
+        entries = sorted(self.data.get(key, {}).items(), key=lambda e: e[1])
+        return [m.encode() for m, score in entries if score <= max][start : start + num]
+
+    async def hsetnx(self, key, field, value):
+        hash = self.data.setdefault(key, {})
+        if field.encode() in hash:
+            return 0
+        hash[field.encode()] = str(value).encode()
+        return 1
+
+    async def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    async def rename(self, key, new_key):
+        if key not in self.data:
+            raise ResponseError("no such key")
+        self.data[new_key] = self.data.pop(key)
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+
+class TestRatingBuffer(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.buffer = RatingBuffer()
+        self.buffer._redis_cache = self.redis
+
+    async def test_first_vote_wins(self):
+        self.assertTrue(await self.buffer.add(1, 2, 5))
+        self.assertFalse(await self.buffer.add(1, 2, 1))
+        self.assertTrue(await self.buffer.add(1, 3, 4))
+
+        _, votes = await self.buffer.take()
+
+        self.assertCountEqual(
+            votes,
+            [
+                {"rating": 5, "user_id": 2, "photo_id": 1},
+                {"rating": 4, "user_id": 3, "photo_id": 1},
+            ],
+        )
+
+    async def test_take_empty(self):
+        self.assertEqual(await self.buffer.take(), (None, []))
+
+    async def test_concurrent_flushes_take_separate_batches(self):
+        other = RatingBuffer()
+        other._redis_cache = self.redis
+        await self.buffer.add(1, 2, 5)
+        first, votes = await self.buffer.take()
+        await self.buffer.add(1, 3, 4)
+        second, other_votes = await other.take()
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(other_votes, [{"rating": 4, "user_id": 3, "photo_id": 1}])
+        # Dropping one batch leaves the other
+        await other.done(second)
+        self.assertEqual(await self.redis.hgetall(first), {b"1:2": b"5"})
+        self.assertEqual(await self.buffer.take(), (None, []))
+
+    async def test_failed_flush_is_taken_again(self):
+        await self.buffer.add(1, 2, 5)
+        batch, taken = await self.buffer.take()
+        await self.buffer.add(1, 3, 4)
+
+        # The batch of the failed flush is only taken again once stale
+        self.redis.data[self.buffer.batches_key][batch] = time.time() - 61
+        batch, votes = await self.buffer.take()
+        self.assertEqual(votes, taken)
+        await self.buffer.done(batch)
+        _, votes = await self.buffer.take()
+        self.assertEqual(votes, [{"rating": 4, "user_id": 3, "photo_id": 1}])
+
+    async def test_flush_job(self):
+        await self.buffer.add(1, 2, 5)
+        await self.buffer.add(4, 2, 3)
+
+        with patch("src.services.jobs.rating_buffer", self.buffer), patch(
+            "src.services.jobs.sessionmanager"
+        ), patch(
+            "src.services.jobs.repository_ratings.insert_ratings",
+            AsyncMock(return_value={1, 4}),
+        ) as insert_ratings, patch(
+            "src.services.jobs.photo_fragments"
+        ) as photo_fragments, patch(
+            "src.services.jobs.photo_leaderboards"
+        ) as photo_leaderboards:
+            photo_fragments.bump_many = AsyncMock()
+            photo_leaderboards.refresh = AsyncMock()
+            flushed = await flush_ratings()
+
+            self.assertEqual(flushed, 2)
+            insert_ratings.assert_awaited_once()
+            photo_fragments.bump_many.assert_awaited_once_with({1, 4})
+            photo_leaderboards.refresh.assert_awaited_once()
+            self.assertEqual(self.redis.data, {})
+            self.assertEqual(await flush_ratings(), 0)
+
+    async def test_flush_failure_keeps_votes(self):
+        await self.buffer.add(1, 2, 5)
+
+        with patch("src.services.jobs.rating_buffer", self.buffer), patch(
+            "src.services.jobs.sessionmanager"
+        ), patch(
+            "src.services.jobs.repository_ratings.insert_ratings",
+            AsyncMock(side_effect=RuntimeError("database down")),
+        ):
+            with self.assertRaises(RuntimeError):
+                await flush_ratings()
+
+        self.buffer.stale_after = 0
+        _, votes = await self.buffer.take()
+        self.assertEqual(votes, [{"rating": 5, "user_id": 2, "photo_id": 1}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,7 +8,7 @@ from fastapi import HTTPException
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.database.models import Rating,User,Photo
-from src.repository.ratings import get_rating, get_all_ratings, delete_all_ratings,create_rating,NO_PHOTO_BY_ID, YOUR_PHOTO, ALREADY_LIKE
+from src.repository.ratings import get_rating, get_all_ratings, delete_all_ratings,create_rating,check_vote,NO_PHOTO_BY_ID, YOUR_PHOTO, ALREADY_LIKE
 
 
 class TestAsyncMethod(unittest.IsolatedAsyncioTestCase):
@@ -19,10 +19,8 @@ class TestAsyncMethod(unittest.IsolatedAsyncioTestCase):
         del self.session
 
     async def test_get_rating(self):
-        fake_ratings = [Rating(rating=4), Rating(rating=5), Rating(rating=3)]
-
         mock_todos = MagicMock()
-        mock_todos.scalars.return_value.all.return_value = fake_ratings
+        mock_todos.one_or_none.return_value = MagicMock(ratings_count=3, ratings_sum=12)
         self.session.execute.return_value = mock_todos
 
         average_rating = await get_rating(1, self.session)
@@ -30,10 +28,8 @@ class TestAsyncMethod(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(average_rating, 4.0)
 
     async def test_get_rating_no_ratings(self):
-        fake_ratings = []
-
         mock_todos = MagicMock()
-        mock_todos.scalars.return_value.all.return_value = fake_ratings
+        mock_todos.one_or_none.return_value = MagicMock(ratings_count=0, ratings_sum=0)
         self.session.execute.return_value = mock_todos
         average_rating = await get_rating(1, self.session)
 
@@ -76,13 +72,11 @@ class TestAsyncMethod(unittest.IsolatedAsyncioTestCase):
         user_mock = User(id=1)  # По вашому вибору
         photo_mock = Photo(id=photo_id, user_id=2)  # По вашому вибору
 
-        mock_photo_1=MagicMock()
-        mock_photo_1.scalar_one_or_none.return_value=photo_mock
-        mock_photo_2=MagicMock()
-        mock_photo_2.scalar_one_or_none.return_value=None
+        mock_insert=MagicMock()
+        mock_insert.scalar_one_or_none.return_value=7
 
-        db_mock.execute.side_effect = [mock_photo_1,
-                                       mock_photo_2]
+        db_mock.execute.side_effect = [mock_insert,
+                                       MagicMock()]
 
         created_rating = await create_rating(rating_value, photo_id, user_mock, db_mock)
 
@@ -90,6 +84,26 @@ class TestAsyncMethod(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(created_rating.rating, rating_value)
         self.assertEqual(created_rating.user_id, user_mock.id)
         self.assertEqual(created_rating.photo_id, photo_id)
+        self.assertEqual(created_rating.id, 7)
+        self.assertEqual(db_mock.execute.await_count, 2)
+        db_mock.commit.assert_awaited_once()
+
+    async def test_create_rating_refused(self):
+        db_mock = AsyncMock()
+        user_mock = User(id=1)
+
+        for owner_id, detail in ((1, YOUR_PHOTO), (2, ALREADY_LIKE)):
+            mock_insert = MagicMock()
+            mock_insert.scalar_one_or_none.return_value = None
+            mock_owner = MagicMock()
+            mock_owner.scalar_one_or_none.return_value = owner_id
+            db_mock.execute.side_effect = [mock_insert, mock_owner]
+
+            with self.assertRaises(HTTPException) as context:
+                await create_rating(4, 1, user_mock, db_mock)
+
+            self.assertEqual(context.exception.status_code, 400)
+            self.assertEqual(context.exception.detail, detail)
 
     async def test_create_rating_invalid_value(self):
         # Підготовка даних для створення рейтингу з недійсним значенням
@@ -122,5 +136,29 @@ class TestAsyncMethod(unittest.IsolatedAsyncioTestCase):
 
         self.assertEqual(context.exception.status_code, 404)
 
+    async def test_check_vote(self):
+        db_mock = AsyncMock()
+        user_mock = User(id=1)
+
+        cases = (
+            (None, 404, NO_PHOTO_BY_ID),
+            ((1, None), 400, YOUR_PHOTO),
+            ((2, 7), 400, ALREADY_LIKE),
+        )
+        for vote, status_code, detail in cases:
+            result_mock = MagicMock()
+            result_mock.one_or_none.return_value = vote
+            db_mock.execute.return_value = result_mock
+
+            with self.assertRaises(HTTPException) as context:
+                await check_vote(1, user_mock, db_mock)
+
+            self.assertEqual(context.exception.status_code, status_code)
+            self.assertEqual(context.exception.detail, detail)
+
+        result_mock.one_or_none.return_value = (2, None)
+        await check_vote(1, user_mock, db_mock)
+        db_mock.commit.assert_not_awaited()
+
 if __name__ == "__main__":
     unittest.main()
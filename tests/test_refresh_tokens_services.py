@@ -0,0 +1,101 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException, status
+from jose import jwt
+
+from src.services.auth import auth_service
+from src.services.refresh_tokens import FAMILY_PREFIX, ROTATE_SCRIPT, RefreshTokenStore
+
+
+def claims(token: str) -> dict:
+    return jwt.decode(token, auth_service.SECRET_KEY, algorithms=[auth_service.ALGORITHM])
+
+
+class TestRefreshTokenStore(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.store = RefreshTokenStore(ttl=3600)
+        self.pipe = MagicMock()
+        self.pipe.execute = AsyncMock()
+        redis = MagicMock()
+        redis.pipeline.return_value.__aenter__.return_value = self.pipe
+        self.script = AsyncMock(return_value=1)
+        self.revoke_script = AsyncMock(return_value=2)
+        redis.register_script.side_effect = lambda script: (
+            self.script if script == ROTATE_SCRIPT else self.revoke_script
+        )
+        self.store._redis_cache = redis
+
+    async def test_issue_starts_family(self):
+        token = await self.store.issue("test@example.com")
+        payload = claims(token)
+
+        self.assertEqual(payload["scope"], "refresh_token")
+        self.assertEqual(payload["email"], "test@example.com")
+        self.pipe.hset.assert_called_once_with(
+            self.store.family_key(payload["fam"]),
+            mapping={"email": "test@example.com", "jti": payload["jti"]},
+        )
+        self.pipe.expire.assert_any_call(self.store.family_key(payload["fam"]), 3600)
+        self.pipe.sadd.assert_called_once_with(
+            self.store.user_key("test@example.com"), payload["fam"]
+        )
+        self.pipe.expire.assert_any_call(self.store.user_key("test@example.com"), 3600)
+        self.pipe.execute.assert_awaited_once()
+
+    async def test_rotate_keeps_family(self):
+        token = await self.store.issue("test@example.com")
+        old = claims(token)
+
+        email, new_token = await self.store.rotate(token)
+        new = claims(new_token)
+
+        self.assertEqual(email, "test@example.com")
+        self.assertEqual(new["fam"], old["fam"])
+        self.assertNotEqual(new["jti"], old["jti"])
+        self.script.assert_awaited_once_with(
+            keys=[
+                self.store.family_key(old["fam"]),
+                self.store.user_key("test@example.com"),
+            ],
+            args=[old["jti"], new["jti"], 3600],
+        )
+
+    async def test_rotate_reused_token(self):
+        token = await self.store.issue("test@example.com")
+        self.script.return_value = -1
+
+        with self.assertRaises(HTTPException) as context:
+            await self.store.rotate(token)
+
+        self.assertEqual(context.exception.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_rotate_token_without_family(self):
+        token = await auth_service.create_refresh_token({"email": "test@example.com"})
+
+        with self.assertRaises(HTTPException):
+            await self.store.rotate(token)
+
+        self.script.assert_not_awaited()
+
+    async def test_rotate_access_token(self):
+        token = await auth_service.create_access_token({"email": "test@example.com"})
+
+        with self.assertRaises(HTTPException):
+            await self.store.rotate(token)
+
+    async def test_revoke_all_families(self):
+        revoked = await self.store.revoke("test@example.com")
+
+        self.assertEqual(revoked, 2)
+        self.revoke_script.assert_awaited_once_with(
+            keys=[self.store.user_key("test@example.com")], args=[FAMILY_PREFIX]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
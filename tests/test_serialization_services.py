@@ -0,0 +1,76 @@
+import unittest
+import json
+import sys
+import os
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database.models import Photo, Role, User
+from src.schemas import PhotosDb, UserDb, UserProfileSchema
+from src.services.serialization import dump, trusted_response
+
+
+class TestTrustedResponse(unittest.TestCase):
+    def setUp(self):
+        self.created_at = datetime(2023, 10, 1, 12, 30, 15)
+        self.photos = [
+            Photo(
+                id=id,
+                url=f"https://example.com/{id}.jpg",
+                description=None if id % 2 else "Sunset",
+                user_id=1,
+                created_at=self.created_at,
+            )
+            for id in range(1, 4)
+        ]
+
+    def test_matches_response_model_output(self):
+        response = trusted_response(PhotosDb, self.photos, many=True)
+
+        expected = [
+            PhotosDb.model_validate(photo, from_attributes=True).model_dump(mode="json")
+            for photo in self.photos
+        ]
+        self.assertEqual(response.media_type, "application/json")
+        self.assertEqual(json.loads(response.body), expected)
+
+    def test_only_schema_fields_serialized(self):
+        user = User(
+            id=1,
+            username="author",
+            email="author@example.com",
+            password="hash",
+            role=Role.moder,
+            created_at=self.created_at,
+        )
+
+        content = json.loads(trusted_response(UserDb, user).body)
+
+        self.assertNotIn("password", content)
+        self.assertEqual(content["role"], Role.moder.value)
+        self.assertEqual(content["created_at"], "2023-10-01T12:30:15")
+
+    def test_models_and_mappings_dumped(self):
+        profile = {
+            "id": 1,
+            "username": "author",
+            "email": "author@example.com",
+            "role": Role.user,
+            "avatar": None,
+            "photos_count": 2,
+            "comments_count": 0,
+            "followers_count": 5,
+            "following_count": 1,
+            "is_active": True,
+            "created_at": self.created_at,
+        }
+
+        self.assertEqual(dump(UserProfileSchema, profile), profile)
+        self.assertEqual(
+            dump(UserProfileSchema, UserProfileSchema(**profile)), profile
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
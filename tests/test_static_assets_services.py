@@ -0,0 +1,114 @@
+import unittest
+import gzip
+import sys
+import os
+import tempfile
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services import static_assets as static_assets_module
+from src.services.static_assets import StaticAssets, accepted_encodings
+from src.services.templating import templates
+
+STYLES = b"body { color: black; }\n" * 100
+
+
+class TestStaticAssets(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.folder.name, "static")
+        os.makedirs(os.path.join(self.source, "images"))
+        with open(os.path.join(self.source, "styles.css"), "wb") as file:
+            file.write(STYLES)
+        with open(os.path.join(self.source, "images", "avatar.jpg"), "wb") as file:
+            file.write(b"\xff\xd8\xff")
+
+        self.assets = StaticAssets(
+            directory=self.source, build_dir=os.path.join(self.folder.name, "build")
+        )
+        self.assets.build()
+        app = FastAPI()
+        app.mount("/static", self.assets, name="static")
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_urls_hold_content_hash(self):
+        url = self.assets.url("styles.css")
+
+        self.assertRegex(url, r"^/static/styles\.[0-9a-f]{12}\.css$")
+        self.assertRegex(
+            self.assets.url("images/avatar.jpg"),
+            r"^/static/images/avatar\.[0-9a-f]{12}\.jpg$",
+        )
+        self.assertEqual(self.assets.url("missing.js"), "/static/missing.js")
+
+    def test_gzip_negotiated_with_immutable_headers(self):
+        response = self.client.get(
+            self.assets.url("styles.css"), headers={"Accept-Encoding": "gzip"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.headers["content-type"], "text/css; charset=utf-8")
+        self.assertEqual(response.headers["vary"], "Accept-Encoding")
+        self.assertIn("immutable", response.headers["cache-control"])
+        self.assertLess(int(response.headers["content-length"]), len(STYLES))
+        self.assertEqual(response.content, STYLES)
+
+    def test_identity_served_without_encoding(self):
+        response = self.client.get(
+            self.assets.url("styles.css"), headers={"Accept-Encoding": "gzip;q=0"}
+        )
+
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.content, STYLES)
+
+    @unittest.skipIf(static_assets_module.brotli is None, "brotli is not installed")
+    def test_brotli_preferred(self):
+        response = self.client.get(
+            self.assets.url("styles.css"), headers={"Accept-Encoding": "gzip, br"}
+        )
+
+        self.assertEqual(response.headers["content-encoding"], "br")
+
+    def test_images_not_compressed(self):
+        response = self.client.get(
+            self.assets.url("images/avatar.jpg"), headers={"Accept-Encoding": "gzip"}
+        )
+
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertNotIn("vary", response.headers)
+        self.assertIn("immutable", response.headers["cache-control"])
+
+    def test_original_names_revalidated(self):
+        response = self.client.get("/static/styles.css")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["cache-control"], "no-cache")
+
+    def test_rebuild_keeps_built_files(self):
+        path = os.path.join(self.assets.build_dir, self.assets.manifest["styles.css"])
+        modified = os.stat(path + ".gz").st_mtime_ns
+
+        self.assets.build()
+
+        self.assertEqual(os.stat(path + ".gz").st_mtime_ns, modified)
+        with open(path + ".gz", "rb") as file:
+            self.assertEqual(gzip.decompress(file.read()), STYLES)
+
+    def test_accepted_encodings(self):
+        self.assertEqual(
+            accepted_encodings("gzip, deflate;q=0.5, br;q=0"), {"gzip", "deflate"}
+        )
+
+    def test_templates_use_static_url(self):
+        self.assertIn("static_url", templates.env.globals)
+
+
+if __name__ == "__main__":
+    unittest.main()
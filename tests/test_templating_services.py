@@ -0,0 +1,99 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.templating import (
+    create_templates,
+    preload_templates,
+    stream_template,
+    templates,
+)
+
+
+class TestTemplating(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def test_views_share_one_environment(self):
+        from src.views import auth, chat, dashboard, photos, users
+
+        for module in (auth, chat, dashboard, photos, users):
+            self.assertIs(module.templates, templates)
+        self.assertIn("rst_to_html", templates.env.globals)
+
+    def test_preload_fills_bytecode_cache(self):
+        renderer = create_templates(cache_dir=self.cache_dir.name, auto_reload=False)
+
+        elapsed = preload_templates(renderer)
+
+        self.assertGreater(elapsed, 0)
+        self.assertFalse(renderer.env.auto_reload)
+        self.assertEqual(
+            len(os.listdir(self.cache_dir.name)), len(renderer.env.list_templates())
+        )
+
+    def test_bytecode_cache_reused_by_new_environment(self):
+        preload_templates(create_templates(cache_dir=self.cache_dir.name))
+        renderer = create_templates(cache_dir=self.cache_dir.name)
+        cache = renderer.env.bytecode_cache
+        loaded = []
+        load_bytecode = cache.load_bytecode
+
+        def spy(bucket):
+            load_bytecode(bucket)
+            loaded.append(bucket.code is not None)
+
+        cache.load_bytecode = spy
+        preload_templates(renderer)
+
+        self.assertTrue(loaded)
+        self.assertTrue(all(loaded))
+
+
+class TestStreamTemplate(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.folder.name, "page.html"), "w") as file:
+            file.write(
+                "<h1>{{ title }}</h1>"
+                "{% for item in items %}{{ item }}{% endfor %}"
+                "<p>{{ items|length }}</p>"
+            )
+        self.renderer = create_templates(directory=self.folder.name, cache_dir=None)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    async def test_header_sent_before_batches(self):
+        rendered = []
+
+        async def batches():
+            for batch in (["<li>1</li>", "<li>2</li>"], ["<li>3</li>"]):
+                rendered.append(batch)
+                yield batch
+
+        response = stream_template(
+            "page.html", {"title": "Photos"}, "items", batches(), self.renderer
+        )
+        parts = []
+        async for part in response.body_iterator:
+            parts.append((part, len(rendered)))
+
+        self.assertEqual(response.media_type, "text/html")
+        self.assertEqual(parts[0], ("<h1>Photos</h1>", 0))
+        self.assertIn(("<li>1</li><li>2</li>", 1), parts)
+        self.assertIn(("<li>3</li>", 2), parts)
+        self.assertEqual(
+            "".join(part for part, _ in parts),
+            "<h1>Photos</h1><li>1</li><li>2</li><li>3</li><p>3</p>",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,299 @@
+import unittest
+import asyncio
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.timelines import HomeTimelines, TimelineFanout, timeline_score
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        return [
+            await getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.commands
+        ]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def ranked(self, key):
+        entries = sorted(self.data.get(key, {}).items(), key=lambda e: (e[1], e[0]))
+        return entries[::-1]
+
+    async def zadd(self, key, mapping):
+        self.data.setdefault(key, {}).update(
+            {str(member).encode(): float(score) for member, score in mapping.items()}
+        )
+
+    async def zremrangebyrank(self, key, start, end):
+        ranked = self.ranked(key)[::-1]
+        end = len(ranked) + end if end < 0 else end
+        for member, _ in ranked[start : max(end + 1, 0)]:
+            del self.data[key][member]
+
+    async def zrange(self, key, start, end, withscores=False):
+        return self.ranked(key)[::-1][start : end + 1]
+
+    async def zrem(self, key, *members):
+        for member in members:
+            self.data.get(key, {}).pop(str(member).encode(), None)
+
+    async def zrevrangebyscore(self, key, max, min, start, num, withscores=False):
+        self.round_trips += 1
+        bound = float("inf") if max == "+inf" else float(max[1:])
+        below = [e for e in self.ranked(key) if e[1] < bound]
+        return below[start : start + num]
+
+    async def lpush(self, key, value):
+        self.data.setdefault(key, []).insert(0, value)
+
+    async def rpoplpush(self, source, destination):
+        if not self.data.get(source):
+            return None
+        value = self.data[source].pop()
+        self.data.setdefault(destination, []).insert(0, value)
+        return value
+
+    async def blmove(self, source, destination, timeout, src, dest):
+        return await self.rpoplpush(source, destination)
+
+    async def lrem(self, key, count, value):
+        self.data[key].remove(value)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def sadd(self, key, member):
+        self.data.setdefault(key, set()).add(member.encode())
+
+    async def srem(self, key, member):
+        self.data.get(key, set()).discard(member.encode())
+
+    async def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+
+NOW = datetime(2023, 10, 1)
+
+
+def photo(id, hours_ago):
+    return SimpleNamespace(id=id, created_at=NOW - timedelta(hours=hours_ago))
+
+
+class TestHomeTimelines(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.timelines = HomeTimelines(size=5, celebrity_followers=3)
+        self.timelines._redis_cache = self.redis
+        self.celebrities = patch(
+            "src.services.timelines.repository_follows.get_followed_celebrity_ids",
+            AsyncMock(return_value=[]),
+        )
+        self.get_celebrity_ids = self.celebrities.start()
+        self.addCleanup(self.celebrities.stop)
+        patcher = patch(
+            "src.services.timelines.repository_follows.get_recent_photos",
+            AsyncMock(return_value=[]),
+        )
+        self.get_recent_photos = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def pages(self, limit):
+        photo_ids, cursor = await self.timelines.read(1, None, limit, None)
+        pages = [photo_ids]
+        while cursor is not None:
+            photo_ids, cursor = await self.timelines.read(1, cursor, limit, None)
+            pages.append(photo_ids)
+        return pages
+
+    async def test_push_is_one_round_trip_and_capped(self):
+        for id in range(1, 9):
+            await self.timelines.push([1, 2, 3], id, timeline_score(photo(id, -id).created_at))
+
+        self.assertEqual(self.redis.round_trips, 8)
+        for user_id in (1, 2, 3):
+            self.assertEqual(len(self.redis.data[f"timeline:home:{user_id}"]), 5)
+        self.assertEqual(await self.pages(2), [[8, 7], [6, 5], [4]])
+
+    async def test_celebrity_photos_are_merged(self):
+        await self.timelines.add_photos(1, [photo(1, 1), photo(3, 3), photo(5, 5)])
+        self.get_celebrity_ids.return_value = [42]
+
+        async def recent(user_ids, before, limit, db):
+            rows = [photo(id, id) for id in (2, 4, 6)]
+            if before is not None:
+                rows = [row for row in rows if row.created_at < before]
+            return rows[:limit]
+
+        self.get_recent_photos.side_effect = recent
+
+        self.assertEqual(await self.pages(4), [[1, 2, 3, 4], [5, 6]])
+        self.get_celebrity_ids.assert_awaited_with(1, 3, None)
+
+    async def test_remove_photos(self):
+        await self.timelines.add_photos(1, [photo(1, 1), photo(2, 2)])
+        await self.timelines.remove_photos(1, [1])
+
+        self.assertEqual(await self.timelines.read(1, None, 10, None), ([2], None))
+
+    async def test_oldest(self):
+        self.assertIsNone(await self.timelines.oldest(1))
+        await self.timelines.add_photos(1, [photo(1, 1), photo(2, 2)])
+
+        self.assertEqual(await self.timelines.oldest(1), timeline_score(photo(2, 2).created_at))
+
+    async def test_bad_cursor(self):
+        for cursor in ("yesterday", "nan", "inf", "-inf", "1e300", "-1e300"):
+            with self.assertRaises(ValueError):
+                await self.timelines.read(1, cursor, 10, None)
+        self.assertEqual(self.redis.round_trips, 0)
+
+
+class TestTimelineFanout(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.timelines = HomeTimelines(size=5, celebrity_followers=1000)
+        self.timelines._redis_cache = self.redis
+        self.fanout = TimelineFanout(self.timelines, batch_size=100, consumer="a", max_attempts=2)
+        patcher = patch("src.services.timelines.sessionmanager", MagicMock())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def followers(self, count):
+        follower_ids = list(range(2, count + 2))
+
+        async def get_follower_ids(user_id, after_id, limit, db):
+            return [id for id in follower_ids if id > after_id][:limit]
+
+        return patch.multiple(
+            "src.services.timelines.repository_follows",
+            get_followers_count=AsyncMock(return_value=count),
+            get_follower_ids=AsyncMock(side_effect=get_follower_ids),
+        )
+
+    async def test_fan_out_in_batches(self):
+        with self.followers(250):
+            pushed = await self.fanout.fan_out(1, 7, 100.0)
+
+        self.assertEqual(pushed, 250)
+        # The owner, then three batches of followers, each followed by a heartbeat
+        self.assertEqual(self.redis.round_trips, 7)
+        self.assertIn(self.fanout.lease_key("a"), self.redis.data)
+        self.assertEqual(len([key for key in self.redis.data if key.startswith("timeline:home")]), 251)
+
+    async def test_celebrities_are_not_fanned_out(self):
+        with self.followers(1000):
+            pushed = await self.fanout.fan_out(1, 7, 100.0)
+
+        self.assertEqual(pushed, 0)
+        self.assertEqual(list(self.redis.data), ["timeline:home:1"])
+
+    async def test_queued_photo_is_processed_once(self):
+        await self.fanout.enqueue(1, 7, NOW)
+        job = await self.redis.blmove(
+            self.fanout.queue, self.fanout.processing, 1, "RIGHT", "LEFT"
+        )
+
+        with self.followers(2):
+            await self.fanout.process(job)
+
+        self.assertEqual(
+            json.loads(job), {"user_id": 1, "photo_id": 7, "score": timeline_score(NOW)}
+        )
+        self.assertEqual(self.redis.data[self.fanout.processing], [])
+        self.assertEqual(self.redis.data["timeline:home:3"], {b"7": timeline_score(NOW)})
+
+    async def test_failed_photo_retried_then_dead_lettered(self):
+        await self.fanout.enqueue(1, 7, NOW)
+        with self.followers(2), patch.object(
+            self.timelines, "push", AsyncMock(side_effect=ConnectionError("down"))
+        ):
+            for attempts in (1, 2):
+                job = await self.redis.blmove(
+                    self.fanout.queue, self.fanout.processing, 1, "RIGHT", "LEFT"
+                )
+                self.assertFalse(await self.fanout.process(job))
+
+        self.assertEqual(json.loads(job)["attempts"], 1)
+        self.assertEqual(self.redis.data[self.fanout.queue], [])
+        self.assertEqual(self.redis.data[self.fanout.processing], [])
+        self.assertEqual(self.redis.data[self.fanout.dead], [job])
+
+    async def test_photos_of_expired_workers_requeued(self):
+        others = {
+            name: TimelineFanout(self.timelines, consumer=name) for name in ("b", "c")
+        }
+        for name, worker in others.items():
+            await worker.heartbeat()
+            await worker.enqueue(1, 7, NOW)
+            await self.redis.blmove(worker.queue, worker.processing, 1, "RIGHT", "LEFT")
+        # Worker b stopped renewing its lease
+        del self.redis.data[others["b"].lease_key("b")]
+
+        self.assertEqual(await self.fanout.recover(), 1)
+        self.assertEqual(len(self.redis.data[self.fanout.queue]), 1)
+        self.assertEqual(self.redis.data[others["b"].processing], [])
+        self.assertEqual(len(self.redis.data[others["c"].processing]), 1)
+        self.assertEqual(self.redis.data[self.fanout.workers_key], {b"c"})
+
+    async def test_run_survives_redis_errors(self):
+        await self.fanout.enqueue(1, 7, NOW)
+        heartbeat = AsyncMock(side_effect=[ConnectionError("down")] + [None] * 100)
+        pause, sleep = asyncio.sleep, AsyncMock()
+        blmove = self.redis.blmove
+
+        async def blocking_blmove(*args):
+            # An empty queue blocks on Redis, letting the test run
+            await pause(0)
+            return await blmove(*args)
+
+        self.redis.blmove = blocking_blmove
+        with self.followers(2), patch.object(self.fanout, "heartbeat", heartbeat), patch(
+            "src.services.timelines.asyncio.sleep", sleep
+        ):
+            task = asyncio.create_task(self.fanout.run())
+            while "timeline:home:3" not in self.redis.data:
+                await pause(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        sleep.assert_awaited_once_with(1)
+        self.assertEqual(self.redis.data[self.fanout.processing], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
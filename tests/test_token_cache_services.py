@@ -0,0 +1,85 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jose import JWTError, jwt
+from src.services.auth import Auth
+from src.services.token_cache import TokenCache
+
+
+class TestTokenCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = TokenCache(maxsize=2)
+
+    def test_set_and_get(self):
+        claims = {"email": "test@example.com", "exp": time.time() + 60}
+        self.cache.set("token", claims)
+        self.assertEqual(self.cache.get("token"), claims)
+
+    def test_expired_token_is_dropped(self):
+        self.cache.set("token", {"exp": time.time() + 60})
+        with patch("src.services.token_cache.time.time", return_value=time.time() + 120):
+            self.assertIsNone(self.cache.get("token"))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_token_without_exp_is_not_cached(self):
+        self.cache.set("token", {"email": "test@example.com"})
+        self.assertIsNone(self.cache.get("token"))
+
+    def test_least_recently_used_is_evicted(self):
+        exp = time.time() + 60
+        self.cache.set("first", {"exp": exp})
+        self.cache.set("second", {"exp": exp})
+        self.cache.get("first")
+        self.cache.set("third", {"exp": exp})
+
+        self.assertIsNotNone(self.cache.get("first"))
+        self.assertIsNone(self.cache.get("second"))
+        self.assertIsNotNone(self.cache.get("third"))
+
+    def test_discard(self):
+        self.cache.set("token", {"exp": time.time() + 60})
+        self.cache.discard("token")
+        self.assertIsNone(self.cache.get("token"))
+
+    def test_zero_size_disables_cache(self):
+        cache = TokenCache(maxsize=0)
+        cache.set("token", {"exp": time.time() + 60})
+        self.assertIsNone(cache.get("token"))
+
+
+class TestAuthTokenCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.auth = Auth()
+
+    async def test_decode_access_token_verifies_once(self):
+        token = await self.auth.create_access_token({"email": "test@example.com"})
+
+        with patch("src.services.auth.jwt.decode", wraps=jwt.decode) as mock_decode:
+            first = self.auth.decode_access_token(token)
+            second = self.auth.decode_access_token(token)
+
+        mock_decode.assert_called_once()
+        self.assertEqual(first, second)
+        self.assertEqual(first["email"], "test@example.com")
+
+    async def test_forget_token(self):
+        token = await self.auth.create_access_token({"email": "test@example.com"})
+        self.auth.decode_access_token(token)
+
+        self.auth.forget_token(token)
+
+        self.assertIsNone(self.auth.token_cache.get(token))
+
+    def test_invalid_token_is_not_cached(self):
+        with self.assertRaises(JWTError):
+            self.auth.decode_access_token("invalid_token")
+        self.assertEqual(len(self.auth.token_cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, MagicMock
 from sqlalchemy.ext.asyncio import AsyncSession
 import sys
 import os
@@ -33,16 +33,20 @@ class TestAsyncMethod(unittest.IsolatedAsyncioTestCase):
         comment_id = 1
         new_comment_text = "Updated comment text"
         mock_comment = Comment(
-            id=comment_id, text="Original comment text", update_status=False
+            id=comment_id, text=new_comment_text, update_status=True
         )
-        self.session.get.return_value = mock_comment
+        mock_result = MagicMock()
+        mock_result.scalar_one_or_none.return_value = mock_comment
+        self.session.execute.return_value = mock_result
 
         result = await update_comment(new_comment_text, comment_id, self.session)
 
         self.assertEqual(result.text, new_comment_text)
         self.assertEqual(result.update_status, True)
+        self.session.execute.assert_called_once()
         self.session.commit.assert_called_once()
-        self.session.refresh.assert_called_once_with(mock_comment)
+        self.session.get.assert_not_called()
+        self.session.refresh.assert_not_called()
 
     async def test_delete_comment(self):
         comment_id = 1